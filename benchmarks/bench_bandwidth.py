@@ -0,0 +1,77 @@
+"""
+下载限速基准测试
+
+用本地静态服务器发布一个合成版本，分别在不限速、全局限速、
+游戏运行时的后台下载三种情况下通过文件清单更新下载，比较实际速度与设定的限速。
+
+用法:
+    python benchmarks/bench_bandwidth.py [全局限速 KiB/s] [后台最低速度 KiB/s]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bandwidth import get_transfer_scheduler  # noqa: E402
+from git_handler import GitProgressMonitor  # noqa: E402
+from manifest_updater import generate_manifest, update_from_manifest  # noqa: E402
+from static_server import StaticServer  # noqa: E402
+
+FILES = 16
+FILE_SIZE = 512 * 1024
+
+
+def timed_download(url: str, game: str, background: bool) -> float:
+    """下载一次完整版本，返回速度(KiB/s)"""
+    shutil.rmtree(game, ignore_errors=True)
+    monitor = GitProgressMonitor()
+    monitor.low_priority = background
+    start = time.perf_counter()
+    result = update_from_manifest(url, game, monitor, 4)
+    elapsed = time.perf_counter() - start
+    return result["downloaded_bytes"] / 1024 / elapsed
+
+
+def main():
+    global_limit = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    background_floor = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    work = tempfile.mkdtemp(prefix="bandwidth-bench-")
+    game_process = None
+    try:
+        source = os.path.join(work, "source")
+        os.makedirs(source)
+        for i in range(FILES):
+            with open(os.path.join(source, f"file{i}.bin"), "wb") as f:
+                f.write(os.urandom(FILE_SIZE))
+        site = os.path.join(work, "site")
+        generate_manifest(source, site, "1.0.0")
+        game = os.path.join(work, "game")
+        scheduler = get_transfer_scheduler()
+
+        with StaticServer(site) as server:
+            url = server.url + "manifest.json"
+
+            scheduler.configure(0, 0, background_floor * 1024)
+            print(f"不限速: {timed_download(url, game, False):.0f} KiB/s")
+
+            scheduler.configure(global_limit * 1024, 0, background_floor * 1024)
+            print(f"全局限速 {global_limit} KiB/s: {timed_download(url, game, False):.0f} KiB/s")
+
+            scheduler.configure(0, 0, background_floor * 1024)
+            game_process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+            scheduler.set_game_process(game_process)
+            print(f"游戏运行时后台下载 (最低 {background_floor} KiB/s): "
+                  f"{timed_download(url, game, True):.0f} KiB/s")
+    finally:
+        if game_process is not None:
+            game_process.kill()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
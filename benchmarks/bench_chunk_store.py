@@ -0,0 +1,167 @@
+"""
+大文件分块存储基准测试
+
+生成合成的 jar 和资源包版本历史（每个版本修改、增加、删除少量条目后重新打包），
+比较每次更新整文件下载、固定大小分块和内容定义分块需要下载的字节数，
+以及发布端保存全部版本所需的空间；最后用本地静态服务器按清单逐个版本更新，
+检查实际下载量、复用量和最终文件内容。
+
+用法:
+    python benchmarks/bench_chunk_store.py [版本数]
+"""
+import filecmp
+import hashlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chunk_store import AVG_CHUNK_SIZE, iter_chunks  # noqa: E402
+from git_handler import GitProgressMonitor  # noqa: E402
+from manifest_updater import generate_manifest, update_from_manifest  # noqa: E402
+from static_server import StaticServer  # noqa: E402
+
+# 条目数量、每个版本修改/增加/删除的比例
+JAR_ENTRIES = 1500
+RESOURCE_ENTRIES = 400
+CHANGED_RATIO = 0.03
+ADDED_RATIO = 0.01
+REMOVED_RATIO = 0.01
+WORDS = [f"sym{i}" for i in range(4000)]
+ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+
+def class_entry(rng: random.Random) -> bytes:
+    """可压缩的类文件内容"""
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(300, 4000))).encode()
+
+
+def texture_entry(rng: random.Random) -> bytes:
+    """不可压缩的贴图内容"""
+    return rng.randbytes(rng.randint(8 * 1024, 64 * 1024))
+
+
+class Archive:
+    """一个不断演进的 zip 文件（jar 或资源包）"""
+
+    def __init__(self, name: str, entries: int, make_entry, compression: int, seed: int):
+        self.name = name
+        self.make_entry = make_entry
+        self.compression = compression
+        self.rng = random.Random(seed)
+        self.entries = {f"{name}/e{i:05d}": make_entry(self.rng) for i in range(entries)}
+        self.next_id = entries
+
+    def evolve(self):
+        """修改、增加、删除少量条目"""
+        names = sorted(self.entries)
+        for name in self.rng.sample(names, int(len(names) * CHANGED_RATIO)):
+            self.entries[name] = self.make_entry(self.rng)
+        for name in self.rng.sample(names, int(len(names) * REMOVED_RATIO)):
+            del self.entries[name]
+        for _ in range(int(len(names) * ADDED_RATIO)):
+            # 新条目插在中间，后面的内容整体后移
+            self.entries[f"{self.name}/e{self.rng.randrange(self.next_id):05d}x{self.next_id}"] = \
+                self.make_entry(self.rng)
+            self.next_id += 1
+
+    def pack(self) -> bytes:
+        """按名称顺序打包，时间戳固定，内容相同时输出相同"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name in sorted(self.entries):
+                archive.writestr(zipfile.ZipInfo(name, ZIP_DATE), self.entries[name], self.compression)
+        return buffer.getvalue()
+
+
+def cdc_chunks(data: bytes):
+    """内容定义分块，返回 {哈希: 大小}"""
+    return {hashlib.sha256(chunk).digest(): len(chunk) for chunk in iter_chunks(io.BytesIO(data))}
+
+
+def fixed_chunks(data: bytes):
+    """固定大小分块，返回 {哈希: 大小}"""
+    return {hashlib.sha256(data[i:i + AVG_CHUNK_SIZE]).digest(): len(data[i:i + AVG_CHUNK_SIZE])
+            for i in range(0, len(data), AVG_CHUNK_SIZE)}
+
+
+def same_file(expected: str, actual: str) -> bool:
+    return filecmp.cmp(expected, actual, shallow=False)
+
+
+def main():
+    versions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    archives = [
+        Archive("mod", JAR_ENTRIES, class_entry, zipfile.ZIP_DEFLATED, 1),
+        Archive("pack", RESOURCE_ENTRIES, texture_entry, zipfile.ZIP_STORED, 2),
+    ]
+    work = tempfile.mkdtemp(prefix="chunk-bench-")
+    try:
+        site = os.path.join(work, "site")
+        game = os.path.join(work, "game")
+        totals = {"whole": 0, "fixed": 0, "cdc": 0}
+        stored_whole = 0
+        stored_chunks = {}
+        previous = [None] * len(archives)
+        chunk_time = chunk_bytes = 0.0
+        print(f"{'版本':<6}{'整文件':>12}{'固定分块':>12}{'内容分块':>12}")
+
+        with StaticServer(site) as server:
+            for version in range(versions + 1):
+                source = os.path.join(work, f"v{version}")
+                os.makedirs(source)
+                row = {"whole": 0, "fixed": 0, "cdc": 0}
+                for index, archive in enumerate(archives):
+                    if version:
+                        archive.evolve()
+                    data = archive.pack()
+                    with open(os.path.join(source, f"{archive.name}.jar"), "wb") as f:
+                        f.write(data)
+
+                    start = time.perf_counter()
+                    cdc = cdc_chunks(data)
+                    chunk_time += time.perf_counter() - start
+                    chunk_bytes += len(data)
+                    fixed = fixed_chunks(data)
+                    stored_whole += len(data)
+                    stored_chunks.update(cdc)
+                    # 客户端只有上一个版本的文件
+                    old_cdc, old_fixed = previous[index] or ({}, {})
+                    row["whole"] += len(data)
+                    row["fixed"] += sum(size for key, size in fixed.items() if key not in old_fixed)
+                    row["cdc"] += sum(size for key, size in cdc.items() if key not in old_cdc)
+                    previous[index] = (cdc, fixed)
+
+                generate_manifest(source, site, f"1.{version}.0")
+                result = update_from_manifest(server.url + "manifest.json", game, GitProgressMonitor())
+                assert result is not None, "按清单更新失败"
+                for archive in archives:
+                    name = f"{archive.name}.jar"
+                    assert same_file(os.path.join(source, name), os.path.join(game, name)), f"{name} 内容不一致"
+                if version:
+                    assert result["downloaded_bytes"] == row["cdc"], (result, row)
+                    for key in totals:
+                        totals[key] += row[key]
+                print(f"v{version:<5}{row['whole'] / 2**20:>10.2f} M{row['fixed'] / 2**20:>10.2f} M"
+                      f"{row['cdc'] / 2**20:>10.2f} M   实际下载 {result['downloaded_bytes'] / 2**20:.2f} M，"
+                      f"复用 {result['reused_bytes'] / 2**20:.2f} M")
+
+        print(f"增量更新合计: 整文件 {totals['whole'] / 2**20:.2f} MiB，固定分块 {totals['fixed'] / 2**20:.2f} MiB，"
+              f"内容分块 {totals['cdc'] / 2**20:.2f} MiB（{totals['cdc'] / totals['whole']:.1%}）")
+        print(f"发布端存储: 整文件 {stored_whole / 2**20:.2f} MiB，分块去重后 "
+              f"{sum(stored_chunks.values()) / 2**20:.2f} MiB")
+        print(f"分块速度: {chunk_bytes / 2**20 / chunk_time:.1f} MiB/s")
+        print("文件内容校验通过")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+配置存储基准测试和崩溃一致性检查
+
+1. 连续快速修改：分别用旧的写法（每次修改直接重写文件）、每次修改立即原子写入（save_delay=0）
+   和延迟合并写入（默认）完成同样次数的 set，比较耗时和写文件次数。
+2. 并发修改：多个线程同时 set 不同的键，写入完成后检查文件中包含所有修改。
+3. 崩溃一致性：子进程不停修改配置，在随机时刻用 SIGKILL 结束，检查配置文件总能完整解析；
+   旧的写法作为对照。
+
+用法:
+    python benchmarks/bench_config_store.py [修改次数] [崩溃次数]
+"""
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend'))
+
+from config import Config  # noqa: E402
+
+THREADS = 8
+# 崩溃测试中配置的大小，文件越大，写入途中被结束的机会越多
+PAYLOAD_SIZE = 256 * 1024
+
+
+class LegacyConfig(Config):
+    """旧的写法：每次修改直接以 'w' 方式重写配置文件"""
+
+    def set(self, key, value, flush: bool = False):
+        self._snapshot[key] = value
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(self._snapshot, f, indent=4, ensure_ascii=False)
+        self.save_count += 1
+        return True
+
+
+def make_store(mode: str, path: str) -> Config:
+    if mode == "legacy":
+        return LegacyConfig(path)
+    return Config(path, save_delay=0 if mode == "atomic" else 0.5)
+
+
+def bench_burst(work: str, count: int):
+    print(f"连续 {count} 次 set")
+    print(f"{'方式':<12}{'耗时(s)':>10}{'每次(ms)':>10}{'写文件次数':>12}")
+    for mode in ("legacy", "atomic", "write-behind"):
+        path = os.path.join(work, f"burst-{mode}.json")
+        store = make_store(mode, path)
+        store.set("game", {"game_path": "/games/minecraft"})
+        store.flush()
+        store.save_count = 0
+        started = time.perf_counter()
+        for i in range(count):
+            store.set("version", {"current_version": f"1.0.{i}", "last_check_time": time.time()})
+        elapsed = time.perf_counter() - started
+        store.flush()
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f)["version"]["current_version"] == f"1.0.{count - 1}", "最后一次修改未写入"
+        print(f"{mode:<12}{elapsed:>10.3f}{elapsed / count * 1000:>10.3f}{store.save_count:>12}")
+
+
+def bench_concurrent(work: str, count: int):
+    path = os.path.join(work, "concurrent.json")
+    store = Config(path)
+    per_thread = count // THREADS
+
+    def worker(index: int):
+        for i in range(per_thread):
+            store.set(f"thread{index}", {"count": i + 1})
+            store.get(f"thread{(index + 1) % THREADS}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    store.flush()
+    with open(path, encoding='utf-8') as f:
+        saved = json.load(f)
+    lost = [i for i in range(THREADS) if saved.get(f"thread{i}", {}).get("count") != per_thread]
+    assert not lost, f"线程 {lost} 的修改丢失"
+    print(f"\n{THREADS} 个线程并发 set 共 {per_thread * THREADS} 次: {elapsed:.3f}s，"
+          f"写文件 {store.save_count} 次，所有修改都已写入")
+
+
+def crash_worker(mode: str, path: str):
+    """不停修改配置，直到被结束"""
+    store = make_store(mode, path)
+    if mode == "write-behind":
+        store.save_delay = 0.01
+    payload = "x" * PAYLOAD_SIZE
+    i = 0
+    while True:
+        i += 1
+        store.set("counter", i)
+        store.set("payload", payload)
+        if i == 1:
+            store.flush()
+            print("ready", flush=True)
+
+
+def bench_crash(work: str, crashes: int):
+    rng = random.Random(1)
+    print(f"\n写入过程中用 SIGKILL 结束 {crashes} 次")
+    print(f"{'方式':<12}{'损坏次数':>10}")
+    for mode in ("legacy", "write-behind"):
+        corrupted = 0
+        for attempt in range(crashes):
+            path = os.path.join(work, f"crash-{mode}.json")
+            if os.path.exists(path):
+                os.remove(path)
+            proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--crash-worker", mode, path],
+                                    stdout=subprocess.PIPE, text=True)
+            proc.stdout.readline()
+            time.sleep(rng.uniform(0.01, 0.2))
+            proc.send_signal(signal.SIGKILL)
+            proc.wait()
+            proc.stdout.close()
+            try:
+                with open(path, encoding='utf-8') as f:
+                    saved = json.load(f)
+                assert saved["counter"] >= 1 and len(saved["payload"]) == PAYLOAD_SIZE
+            except (ValueError, KeyError, AssertionError):
+                corrupted += 1
+        print(f"{mode:<12}{corrupted:>10}")
+        if mode != "legacy":
+            assert corrupted == 0, "原子写入后配置文件损坏"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    crashes = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    work = tempfile.mkdtemp(prefix="config-bench-")
+    try:
+        bench_burst(work, count)
+        bench_concurrent(work, count)
+        bench_crash(work, crashes)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--crash-worker":
+        crash_worker(sys.argv[2], sys.argv[3])
+    else:
+        main()
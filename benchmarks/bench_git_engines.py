@@ -0,0 +1,163 @@
+"""
+Git 后端基准测试
+
+用本地裸仓库（file:// 协议，允许部分克隆）作为服务器，分别用 GitPython 和 git 命令行后端
+完成一次克隆、一次更新和多次状态查询（启动器界面轮询时的操作），
+比较耗时、CPU 时间（本进程和 git 子进程）和内存峰值。
+每次测试在新的 Python 进程中进行，导入模块的耗时也计算在内。
+
+用法:
+    python benchmarks/bench_git_engines.py [文件数] [重复次数]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend')
+ENGINES = ("gitpython", "cli")
+# 更新时修改和新增的文件比例
+CHANGED_RATIO = 0.05
+# 状态查询次数
+STATUS_QUERIES = 200
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def make_fixture(work: str, files: int) -> str:
+    """
+    创建裸仓库，main 分支为 v1，refs/bench/v1 和 refs/bench/v2 分别指向两个版本
+
+    返回:
+        裸仓库的 file:// 地址
+    """
+    rng = random.Random(1)
+    source = os.path.join(work, "source")
+    os.makedirs(source)
+    git("init", "-q", "-b", "main", cwd=source)
+    for i in range(files):
+        path = os.path.join(source, f"mods/d{i % 20:02d}/f{i:05d}.txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(rng.randint(256, 16 * 1024)))
+    git("add", "-A", cwd=source)
+    git("-c", "user.name=bench", "-c", "user.email=bench@example.com", "commit", "-qm", "v1", cwd=source)
+    for i in rng.sample(range(files), int(files * CHANGED_RATIO)):
+        with open(os.path.join(source, f"mods/d{i % 20:02d}/f{i:05d}.txt"), "wb") as f:
+            f.write(rng.randbytes(rng.randint(256, 16 * 1024)))
+    for i in range(int(files * CHANGED_RATIO)):
+        with open(os.path.join(source, f"mods/new{i:05d}.txt"), "wb") as f:
+            f.write(rng.randbytes(rng.randint(256, 16 * 1024)))
+    git("add", "-A", cwd=source)
+    git("-c", "user.name=bench", "-c", "user.email=bench@example.com", "commit", "-qm", "v2", cwd=source)
+
+    bare = os.path.join(work, "server.git")
+    git("clone", "-q", "--bare", source, bare)
+    git("config", "uploadpack.allowFilter", "true", cwd=bare)
+    git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=bare)
+    git("update-ref", "refs/bench/v1", "main~1", cwd=bare)
+    git("update-ref", "refs/bench/v2", "main", cwd=bare)
+    return "file://" + bare
+
+
+def usage() -> dict:
+    """当前的墙钟时间、CPU 时间和内存峰值"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "wall": time.perf_counter(),
+        "cpu": own.ru_utime + own.ru_stime,
+        "child_cpu": children.ru_utime + children.ru_stime,
+        # Linux 上单位为 KiB
+        "rss": own.ru_maxrss,
+    }
+
+
+def measure(start: dict) -> dict:
+    end = usage()
+    return {
+        "seconds": end["wall"] - start["wall"],
+        "cpu": end["cpu"] - start["cpu"],
+        "child_cpu": end["child_cpu"] - start["child_cpu"],
+        "rss_kib": end["rss"],
+    }
+
+
+def worker(engine: str, url: str, game: str):
+    """在新进程中运行一次测试，结果以 JSON 输出"""
+    results = {}
+    start = usage()
+    sys.path.insert(0, BACKEND_DIR)
+    from git_handler import GitConfig, GitProgressMonitor, clone_git_repo, has_staged_update, open_repo, \
+        set_git_engine, update_git_repo
+    results["import"] = measure(start)
+
+    set_git_engine(engine)
+    bare = url[len("file://"):]
+    git("update-ref", "refs/heads/main", "refs/bench/v1", cwd=bare)
+    config = GitConfig(url, "main", game)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = usage()
+        assert clone_git_repo(config, GitProgressMonitor()), "克隆失败"
+        results["clone"] = measure(start)
+
+        git("update-ref", "refs/heads/main", "refs/bench/v2", cwd=bare)
+        start = usage()
+        assert update_git_repo(config, GitProgressMonitor()), "更新失败"
+        results["update"] = measure(start)
+
+        start = usage()
+        for _ in range(STATUS_QUERIES):
+            has_staged_update(game)
+            open_repo(game).head.commit.hexsha
+        results["status"] = measure(start)
+    assert git("rev-parse", "HEAD", cwd=game) == git("rev-parse", "refs/bench/v2", cwd=bare), "更新后版本不正确"
+    assert not git("status", "--porcelain", cwd=game), "工作目录与版本不一致"
+    print(json.dumps(results))
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    work = tempfile.mkdtemp(prefix="git-engine-bench-")
+    try:
+        url = make_fixture(work, files)
+        runs = {engine: [] for engine in ENGINES}
+        for attempt in range(repeats):
+            # 交替运行，减少缓存等因素对某一后端的偏向
+            for engine in ENGINES:
+                game = os.path.join(work, f"game-{engine}-{attempt}")
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", engine, url, game],
+                                        check=True, capture_output=True, text=True).stdout
+                runs[engine].append(json.loads(output.strip().splitlines()[-1]))
+                shutil.rmtree(game, ignore_errors=True)
+
+        print(f"{files} 个文件，每项取 {repeats} 次的中位数；状态查询为 {STATUS_QUERIES} 次合计")
+        print(f"{'后端':<11}{'阶段':<8}{'耗时(s)':>10}{'CPU(s)':>10}{'git CPU(s)':>12}{'内存峰值(MiB)':>16}")
+        for engine in ENGINES:
+            for phase in ("import", "clone", "update", "status"):
+                samples = [run[phase] for run in runs[engine]]
+
+                def median(key):
+                    return statistics.median(sample[key] for sample in samples)
+                print(f"{engine:<11}{phase:<8}{median('seconds'):>10.3f}{median('cpu'):>10.3f}"
+                      f"{median('child_cpu'):>12.3f}{median('rss_kib') / 1024:>16.1f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(*sys.argv[2:5])
+    else:
+        main()
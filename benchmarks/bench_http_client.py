@@ -0,0 +1,193 @@
+"""
+共享 HTTP 客户端基准测试和行为检查
+
+用一个支持 keep-alive 的本地服务器（可设置响应延迟，统计连接数和请求数）比较：
+1. 连续小请求：每次 requests.get（每次新建连接）与共享客户端（复用连接）的耗时和连接数；
+2. 检查更新后紧接着安装：旧的写法每一步都重新请求版本号，缓存后只请求一次；
+3. 缓存过期后的条件请求：服务器返回 304，不重新传输内容；
+4. 并发的相同请求：多个线程同时请求只发送一次；
+5. 服务器返回 503 时自动重试，服务器不可用时返回缓存的内容。
+
+用法:
+    python benchmarks/bench_http_client.py [请求次数] [响应延迟(ms)]
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend'))
+
+from http_client import HttpClient  # noqa: E402
+
+THREADS = 16
+VERSION = b"1.2.0\n"
+
+
+class CountingServer:
+    """HTTP/1.1 服务器，/version.txt 支持 ETag 条件请求，/flaky 前两次返回 503"""
+
+    def __init__(self, delay: float = 0):
+        self.connections = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.flaky_failures = 2
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和内容分两次写入，不关闭 Nagle 算法时复用的连接上每次请求都要等待延迟确认
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                time.sleep(delay)
+                if self.path == "/flaky":
+                    with server.lock:
+                        failed = server.flaky_failures > 0
+                        server.flaky_failures -= 1
+                    if failed:
+                        self._send(503, b"")
+                        return
+                etag = '"%s"' % hashlib.sha256(VERSION).hexdigest()[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    with server.lock:
+                        server.not_modified += 1
+                    self._send(304, b"", {"ETag": etag})
+                    return
+                self._send(200, VERSION, {"ETag": etag, "Content-Type": "text/plain"})
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def reset(self):
+        with self.lock:
+            self.connections = self.requests = self.not_modified = 0
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def bench_keep_alive(server: CountingServer, client: HttpClient, count: int):
+    print(f"连续 {count} 次请求版本号")
+    print(f"{'方式':<14}{'耗时(s)':>10}{'连接数':>8}")
+    for name, get in (("requests.get", requests.get), ("shared client", client.get)):
+        server.reset()
+        started = time.perf_counter()
+        for _ in range(count):
+            assert get(server.url + "version.txt", timeout=10).content == VERSION
+        print(f"{name:<14}{time.perf_counter() - started:>10.3f}{server.connections:>8}")
+
+
+def bench_check_then_install(server: CountingServer, client: HttpClient):
+    """检查更新、开始安装、安装完成各读取一次版本号"""
+    url = server.url + "version.txt"
+    server.reset()
+    started = time.perf_counter()
+    for _ in range(3):
+        requests.get(url, timeout=10)
+    legacy = (time.perf_counter() - started, server.requests)
+    server.reset()
+    started = time.perf_counter()
+    for _ in range(3):
+        client.get_cached(url, ttl=60)
+    cached = (time.perf_counter() - started, server.requests)
+    assert cached[1] == 1, "缓存未命中"
+    print(f"\n检查更新后安装（读取 3 次版本号）: 旧的写法 {legacy[0] * 1000:.1f} ms / {legacy[1]} 次请求，"
+          f"缓存 {cached[0] * 1000:.1f} ms / {cached[1]} 次请求")
+
+
+def check_revalidate(server: CountingServer, client: HttpClient):
+    url = server.url + "version.txt?revalidate"
+    client.get_cached(url, ttl=0)
+    server.reset()
+    response = client.get_cached(url, ttl=0)
+    assert response.content == VERSION and response.from_cache and server.not_modified == 1, "条件请求未返回 304"
+    print(f"缓存过期后条件请求: {server.requests} 次请求，{server.not_modified} 次 304")
+
+
+def check_single_flight(server: CountingServer, client: HttpClient, delay: float):
+    url = server.url + "version.txt?single-flight"
+    server.reset()
+    barrier = threading.Barrier(THREADS)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(client.get_cached(url, ttl=60).content)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    assert results == [VERSION] * THREADS and server.requests == 1, f"发送了 {server.requests} 次请求"
+    print(f"{THREADS} 个线程同时请求（服务器延迟 {delay * 1000:.0f} ms）: {server.requests} 次请求，"
+          f"耗时 {elapsed * 1000:.1f} ms")
+
+
+def check_retry(server: CountingServer, client: HttpClient):
+    server.reset()
+    response = client.get(server.url + "flaky")
+    assert response.status_code == 200 and server.requests == 3, "503 未重试"
+    print(f"服务器两次返回 503: 重试后成功，共 {server.requests} 次请求")
+
+
+def check_stale_if_error(url: str, client: HttpClient):
+    response = client.get_cached(url, ttl=0, timeout=1)
+    assert response.content == VERSION and response.from_cache, "服务器不可用时未返回缓存"
+    print("服务器不可用: 返回缓存的内容")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.2
+    work = tempfile.mkdtemp(prefix="http-bench-")
+    try:
+        client = HttpClient(cache_dir=os.path.join(work, "cache"))
+        with CountingServer() as server:
+            bench_keep_alive(server, client, count)
+            bench_check_then_install(server, client)
+            check_revalidate(server, client)
+            check_retry(server, client)
+        check_stale_if_error(server.url + "version.txt?revalidate", client)
+        with CountingServer(delay) as slow:
+            check_single_flight(slow, client, delay)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+文件清单更新基准测试
+
+生成两个合成版本（大量小文件加若干大文件，第二个版本修改一部分文件），
+用本地静态服务器发布，测量首次安装和增量更新的耗时与下载量，
+并检查断点续传和最终文件内容。
+
+用法:
+    python benchmarks/bench_manifest_update.py [下载并发数]
+"""
+import filecmp
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from git_handler import GitProgressMonitor  # noqa: E402
+from manifest_updater import STAGING_DIR, STATE_DIR, generate_manifest, update_from_manifest  # noqa: E402
+from static_server import StaticServer  # noqa: E402
+
+SMALL_FILES = 400
+SMALL_SIZE = 16 * 1024
+LARGE_FILES = 4
+LARGE_SIZE = 8 * 1024 * 1024
+CHANGED_RATIO = 0.1
+
+
+def make_version(path: str, seed: int, base: str = ""):
+    """生成一个版本的游戏目录，提供 base 时只修改其中一部分文件"""
+    rng = random.Random(seed)
+    if base:
+        shutil.copytree(base, path)
+    else:
+        os.makedirs(path)
+    names = [f"mods/mod{i}.jar" for i in range(SMALL_FILES)] + [f"libs/big{i}.bin" for i in range(LARGE_FILES)]
+    for name in names:
+        # 第一个大文件总是修改，用于验证断点续传
+        if base and name != "libs/big0.bin" and rng.random() > CHANGED_RATIO:
+            continue
+        full_path = os.path.join(path, name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        size = LARGE_SIZE if name.startswith("libs/") else SMALL_SIZE
+        with open(full_path, "wb") as f:
+            f.write(rng.randbytes(size))
+    if base:
+        os.remove(os.path.join(path, "mods/mod0.jar"))
+
+
+def same_tree(expected: str, actual: str) -> bool:
+    """比较两个目录的文件（忽略客户端状态目录）"""
+    comparison = filecmp.dircmp(expected, actual, ignore=[STATE_DIR])
+    pending = [comparison]
+    while pending:
+        item = pending.pop()
+        if item.left_only or item.right_only or item.diff_files or item.funny_files:
+            return False
+        _, mismatch, errors = filecmp.cmpfiles(item.left, item.right, item.common_files, shallow=False)
+        if mismatch or errors:
+            return False
+        pending.extend(item.subdirs.values())
+    return True
+
+
+def timed_update(url: str, game: str, workers: int):
+    """执行一次更新并返回 (结果, 耗时)"""
+    start = time.perf_counter()
+    result = update_from_manifest(url, game, GitProgressMonitor(), workers)
+    return result, time.perf_counter() - start
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    work = tempfile.mkdtemp(prefix="manifest-bench-")
+    try:
+        v1, v2 = os.path.join(work, "v1"), os.path.join(work, "v2")
+        make_version(v1, 1)
+        make_version(v2, 2, base=v1)
+        site1, site2 = os.path.join(work, "site1"), os.path.join(work, "site2")
+        # 大文件每个版本都是随机内容，不分块，测量整文件下载和续传
+        generate_manifest(v1, site1, "1.0.0", chunk_threshold=0)
+        generate_manifest(v2, site2, "1.1.0", chunk_threshold=0)
+        game = os.path.join(work, "game")
+
+        with StaticServer(site1) as server:
+            result, elapsed = timed_update(server.url + "manifest.json", game, workers)
+            print(f"首次安装: {result['downloaded']} 个文件, {result['downloaded_bytes'] / 2**20:.1f} MiB, "
+                  f"{elapsed:.2f} 秒")
+            assert same_tree(v1, game), "首次安装后文件不一致"
+
+        with StaticServer(site2) as server:
+            url = server.url + "manifest.json"
+            # 模拟中断：预先放入一个下载了一半的暂存文件
+            with open(os.path.join(site2, "manifest.json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)["files"]["libs/big0.bin"]
+            source = os.path.join(site2, "objects", entry["sha256"][:2], entry["sha256"])
+            part = os.path.join(game, STATE_DIR, STAGING_DIR, entry["sha256"][:2], entry["sha256"] + ".part")
+            os.makedirs(os.path.dirname(part), exist_ok=True)
+            with open(source, "rb") as src, open(part, "wb") as dst:
+                dst.write(src.read(entry["size"] // 2))
+
+            result, elapsed = timed_update(url, game, workers)
+            print(f"增量更新: {result['downloaded']} 个文件, {result['downloaded_bytes'] / 2**20:.1f} MiB, "
+                  f"删除 {result['removed']} 个文件, {elapsed:.2f} 秒")
+            assert same_tree(v2, game), "增量更新后文件不一致"
+
+            result, elapsed = timed_update(url, game, workers)
+            print(f"无变化时: {result['downloaded']} 个文件, {elapsed:.2f} 秒")
+        print("文件内容校验通过")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
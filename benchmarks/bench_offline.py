@@ -0,0 +1,156 @@
+"""
+离线模式基准测试和行为检查
+
+用一个不接受连接的端口模拟网络不通（监听队列已满，新的连接一直等到超时），比较：
+1. 连续检查版本：旧的写法（requests.get，超时 10 秒）每次都等满超时；
+   新的写法第一次等一次连接超时后返回缓存的版本信息，主机熔断后立即返回；
+2. 网络状态：只按版本文件所在的主机判断是否离线，其他镜像可用时在线，不通的镜像不会使整个客户端离线；
+   熔断时间过后的试探请求成功后主机恢复；
+3. 外置登录：网络不可用时用已保存的账户信息（离线模式），不等待超时。
+
+用法:
+    python benchmarks/bench_offline.py [检查次数]
+"""
+import json
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src', 'backend'))
+sys.path.insert(0, BENCH_DIR)
+
+import auth_module  # noqa: E402
+import http_client  # noqa: E402
+from http_client import CircuitBreaker, CircuitOpenError, HttpClient  # noqa: E402
+from static_server import StaticServer  # noqa: E402
+
+VERSION_TIMEOUT = (2, 10)
+LEGACY_TIMEOUT = 10
+COOLDOWN = 1.0
+
+
+class Blackhole:
+    """监听但从不接受连接的端口，队列填满后新的连接一直等到超时"""
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(0)
+        self.url = f"http://127.0.0.1:{self.server.getsockname()[1]}/"
+        self.fillers = []
+        for _ in range(4):
+            filler = socket.socket()
+            filler.setblocking(False)
+            filler.connect_ex(self.server.getsockname())
+            self.fillers.append(filler)
+        time.sleep(0.2)
+
+    def close(self):
+        for filler in self.fillers:
+            filler.close()
+        self.server.close()
+
+
+def timed(function):
+    started = time.perf_counter()
+    try:
+        result = function()
+    except requests.RequestException as e:
+        result = e
+    return time.perf_counter() - started, result
+
+
+def bench_version_check(work: str, checks: int, blackhole: Blackhole):
+    site = os.path.join(work, "site")
+    os.makedirs(site)
+    with open(os.path.join(site, "version.txt"), "w", encoding="utf-8") as f:
+        f.write("1.2.0\n")
+    client = HttpClient(cache_dir=os.path.join(work, "cache"))
+    client.breaker = CircuitBreaker(cooldown=COOLDOWN)
+    with StaticServer(site) as server:
+        url = server.url + "version.txt"
+        assert client.get_cached(url, ttl=0, timeout=VERSION_TIMEOUT).text.strip() == "1.2.0"
+        # 让版本地址指向不通的端口，缓存仍按原地址保存
+        cached = client.cache.load(url)
+    down_url = blackhole.url + "version.txt"
+    cached["url"] = down_url
+    client.cache.store(down_url, cached)
+
+    print(f"网络不通时连续检查版本 {checks} 次，每次耗时(s)")
+    legacy = [timed(lambda: requests.get(down_url, timeout=LEGACY_TIMEOUT))[0] for _ in range(min(checks, 2))]
+    print(f"{'旧的写法':<10}" + "".join(f"{t:>8.2f}" for t in legacy) + "  （之后每次相同）")
+    times = []
+    for _ in range(checks):
+        elapsed, response = timed(lambda: client.get_cached(down_url, ttl=0, timeout=VERSION_TIMEOUT))
+        assert response.text.strip() == "1.2.0" and response.stale, "网络不通时未返回缓存的版本"
+        times.append(elapsed)
+    print(f"{'熔断+缓存':<10}" + "".join(f"{t:>8.2f}" for t in times))
+    client.update_connectivity([down_url])
+    assert not client.online and client.network_status()["unavailableHosts"], "未进入离线状态"
+    assert max(times[2:], default=0) < 0.05, "熔断后仍在等待超时"
+    return client
+
+
+def check_recovery(client: HttpClient, work: str, blackhole: Blackhole):
+    site = os.path.join(work, "site")
+    down_url = blackhole.url + "version.txt"
+    with StaticServer(site) as server:
+        # 熔断只针对不通的主机，版本文件的其他镜像可用时恢复在线
+        url = server.url + "version.txt"
+        assert client.get(url).text.strip() == "1.2.0"
+        assert client.update_connectivity([down_url, url]), "其他镜像可用时未恢复在线"
+        # 不通的主机不是版本文件所在的主机（如测速失败的镜像）时不影响网络状态
+        assert client.update_connectivity([url]) and client.breaker.is_failing(blackhole.url.split("/")[2])
+        # 该主机也曾连续失败：熔断期间直接失败，熔断时间过后放行试探请求，成功后恢复
+        host = url.split("/")[2]
+        for _ in range(2):
+            client.breaker.record_failure(host)
+        try:
+            client.get(url)
+            raise AssertionError("熔断期间请求仍被发出")
+        except CircuitOpenError:
+            pass
+        time.sleep(COOLDOWN)
+        assert client.get(url).status_code == 200 and host not in client.breaker.open_hosts(), "试探请求后未恢复"
+    print(f"网络恢复: 其他镜像可用时在线，不通的镜像不影响网络状态；熔断 {COOLDOWN:.0f} 秒后的试探请求成功，主机恢复")
+
+
+def check_auth(work: str, blackhole: Blackhole):
+    path = os.path.join(work, "account_info.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "authlib-injector", "server": blackhole.url + "api/yggdrasil/", "name": "Steve",
+                   "uuid": "0" * 32, "access_token": "token", "client_token": "client",
+                   "base_code": "e30="}, f)
+    http_client._http_client = HttpClient(cache_dir=os.path.join(work, "auth-cache"))
+    times = []
+    for _ in range(4):
+        elapsed, account = timed(lambda: auth_module.load_account(path))
+        assert account is not None and account.offline and account.name == "Steve", "离线时未使用已保存的账户"
+        times.append(elapsed)
+    assert max(times[2:]) < 0.05, "熔断后登录仍在等待超时"
+    print("外置登录: 网络不通时使用已保存的账户，每次耗时(s)" + "".join(f"{t:>8.2f}" for t in times))
+
+
+def main():
+    logging.disable(logging.WARNING)
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    work = tempfile.mkdtemp(prefix="offline-bench-")
+    blackhole = Blackhole()
+    try:
+        client = bench_version_check(work, checks, blackhole)
+        check_recovery(client, work, blackhole)
+        check_auth(work, blackhole)
+    finally:
+        blackhole.close()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+GitProgressMonitor 进度解析基准测试
+
+回放一次真实 git clone 的进度输出（data/clone_progress.txt），
+比较改写前后的 GitProgressMonitor.update 每秒可处理的回调次数。
+
+用法:
+    python benchmarks/bench_progress_monitor.py [回放轮数]
+"""
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'backend'))
+
+from git import RemoteProgress  # noqa: E402
+from git_handler import GitProgressMonitor  # noqa: E402
+
+TRANSCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'clone_progress.txt')
+
+
+class LegacyProgressMonitor(GitProgressMonitor):
+    """改写前的 update 实现，逐条消息用 split 解析，每次回调都打印进度"""
+
+    def __init__(self):
+        super().__init__()
+        self._last_received = 0
+
+    def update(self, op_code, cur_count, max_count=None, message=''):
+        with self._lock:
+            self.op_code = op_code
+            self.cur_count = cur_count
+            self.max_count = max_count or 100
+            self.message = message
+            
+            # 解析进度信息
+            if op_code & RemoteProgress.COUNTING:
+                self.stage = "计数对象"
+            elif op_code & RemoteProgress.COMPRESSING:
+                self.stage = "压缩对象"
+            elif op_code & RemoteProgress.WRITING:
+                self.stage = "写入对象"
+            elif op_code & RemoteProgress.RECEIVING:
+                self.stage = "接收对象"
+                if message:
+                    # 详细解析接收消息，格式通常为: "Receiving objects:  67% (835/1254), 433.00 KiB | 433.00 KiB/s"
+                    # 或 "Receiving objects:  67% (835/1254)"
+                    try:
+                        parts = message.split(',')
+                        # 解析对象数量
+                        if len(parts) > 0 and "%" in parts[0]:
+                            percentage_part = parts[0].strip()
+                            count_part = percentage_part.split('(')[1].split(')')[0]
+                            current, total = count_part.split('/')
+                            self.received_objects = int(current)
+                            self.total_objects = int(total)
+                        
+                        # 解析速度信息
+                        if len(parts) > 1 and "KiB/s" in parts[1]:
+                            speed_part = parts[1].strip()
+                            if "|" in speed_part:
+                                speed_text = speed_part.split('|')[1].strip().split(' ')[0]
+                                self.speed = float(speed_text)
+                            
+                        # 计算ETA
+                        if self.received_objects > 0 and self.total_objects > 0:
+                            now = time.time()
+                            time_diff = now - self._last_received_time
+                            received_diff = self.received_objects - self._last_received
+                            
+                            # 只有当新对象接收并且时间差大于0时才更新速度
+                            if time_diff > 0.5 and received_diff > 0:
+                                # 使用过去几秒的数据平滑计算速度
+                                self._last_received = self.received_objects
+                                self._last_received_time = now
+                                
+                                # 计算剩余对象
+                                remaining_objects = self.total_objects - self.received_objects
+                                
+                                # 基于最近的速率计算ETA
+                                if self.speed > 0:
+                                    # 假设每个对象平均大小相同
+                                    objects_per_second = received_diff / time_diff
+                                    if objects_per_second > 0:
+                                        self.eta = remaining_objects / objects_per_second
+                    except Exception as e:
+                        print(f"解析进度消息出错: {e}")
+            elif op_code & RemoteProgress.RESOLVING:
+                self.stage = "解析引用"
+            elif op_code & RemoteProgress.FINDING_SOURCES:
+                self.stage = "查找源"
+            elif op_code & RemoteProgress.CHECKING_OUT:
+                self.stage = "检出代码"
+            else:
+                self.stage = "准备中"
+            
+            # 更新对象计数（直接从消息中提取）
+            if message and "objects" in message:
+                try:
+                    # 如果还没有从上面解析到对象数量，这里再尝试解析
+                    if self.total_objects == 0:
+                        parts = message.split(',')
+                        for part in parts:
+                            if 'total' in part:
+                                total_text = part.strip().split(' ')[0]
+                                self.total_objects = int(total_text)
+                            elif 'received' in part and not self.received_objects:
+                                received_text = part.strip().split(' ')[0]
+                                self.received_objects = int(received_text)
+                            elif 'indexed' in part:
+                                indexed_text = part.strip().split(' ')[0]
+                                self.indexed_objects = int(indexed_text)
+                except Exception as e:
+                    print(f"解析对象数量出错: {e}")
+            
+            # 计算总体进度
+            if self.total_objects > 0 and self.received_objects > 0:
+                # 下载进度
+                receive_progress = min(self.received_objects / self.total_objects, 1.0)
+                # 索引进度
+                index_progress = min(self.indexed_objects / self.total_objects, 1.0) if self.indexed_objects > 0 else 0
+                # 总进度 - 下载占70%，索引占30%
+                self.progress = min(receive_progress * 0.7 + index_progress * 0.3, 0.99)
+            elif self.max_count > 0 and self.cur_count > 0:
+                self.progress = min(self.cur_count / self.max_count, 0.99)
+            else:
+                # 无法获取准确进度时，进度缓慢增加
+                elapsed = time.time() - self.start_time
+                self.progress = min(0.1 + elapsed / 300, 0.5)  # 5分钟内最多增长到50%
+            
+            self.last_update = time.time()
+            
+            # 打印进度，便于调试
+            print(f"\r{self.stage}: {int(self.progress*100)}% - {self.message}", end='', flush=True)
+
+
+def load_transcript():
+    """
+    读取录制的进度输出，并记录 RemoteProgress 解析后产生的 update 调用参数
+    Returns:
+        update 调用参数列表
+    """
+    with open(TRANSCRIPT_PATH, 'r', encoding='utf-8') as f:
+        lines = [line.rstrip('\n') for line in f if line.strip()]
+
+    calls = []
+
+    class Recorder(RemoteProgress):
+        def update(self, *args, **kwargs):
+            calls.append(args)
+
+    recorder = Recorder()
+    for line in lines:
+        recorder._parse_progress_line(line)
+    return calls
+
+
+def run(monitor_class, calls, rounds):
+    """
+    回放 update 调用
+    Returns:
+        耗时秒数
+    """
+    elapsed = 0.0
+    # 进度打印是被测开销的一部分，输出到空设备以免刷屏
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        for _ in range(rounds):
+            monitor = monitor_class()
+            start = time.perf_counter()
+            for args in calls:
+                monitor.update(*args)
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    calls = load_transcript()
+    print(f"回放 {len(calls)} 次进度回调 x {rounds} 轮")
+
+    results = {}
+    for name, monitor_class in (("改写前", LegacyProgressMonitor), ("改写后", GitProgressMonitor)):
+        elapsed = run(monitor_class, calls, rounds)
+        total = len(calls) * rounds
+        results[name] = total / elapsed
+        print(f"{name}: {total} 次回调, {elapsed:.3f} 秒, {results[name]:,.0f} 次/秒")
+
+    print(f"提升: {results['改写后'] / results['改写前']:.2f} 倍")
+
+
+if __name__ == '__main__':
+    main()
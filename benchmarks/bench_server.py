@@ -0,0 +1,162 @@
+"""
+界面服务基准测试
+
+在子进程中分别以两种方式运行界面的 Flask 应用（与客户端线程分开，避免争用 GIL）:
+1. debug: 原来的运行方式，Flask 调试模式，由 pywebview 自带的服务器（wsgiref，每个连接一个线程，
+   HTTP/1.0，每次请求新建连接）处理，并输出访问日志；
+2. production: 关闭调试，由 serving.AppServer 运行（安装了 waitress 时使用 waitress）；
+   另外列出 Werkzeug 多线程服务器（未安装 waitress 时使用）作为对照。
+
+多个客户端线程并发请求 /game/progress 和静态文件（js、css），比较吞吐量和请求延迟的分位数。
+最后在慢请求（模拟初始化、检查版本等阻塞的接口）进行中时测量 /game/progress 的延迟：
+慢请求少于工作线程数时不受影响，占满所有工作线程时需要排队，线程数应大于同时进行的阻塞请求数。
+
+用法:
+    python benchmarks/bench_server.py [每个线程的请求数] [并发数] [工作线程数]
+"""
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'src', 'backend')
+
+MODES = ("debug", "production", "werkzeug")
+STATIC_PATHS = ["/js/game_manager.js", "/css/main.css"]
+# 慢请求的处理时间(秒)
+SLOW_SECONDS = 0.5
+
+
+def serve(mode: str, workers: int):
+    """子进程：以指定方式运行界面服务，输出地址后一直运行到标准输入关闭"""
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ["MINEMC_DEBUG"] = "1" if mode == "debug" else "0"
+    import webview
+    from server import server
+    from serving import AppServer
+
+    @server.route('/bench/slow')
+    def slow():
+        time.sleep(SLOW_SECONDS)
+        return "ok"
+
+    if mode == "debug":
+        from webview import _state
+        from webview.http import BottleServer
+        _state['debug'] = True
+        url = BottleServer.start_server([server], None)[0]
+    else:
+        engine = "werkzeug" if mode == "werkzeug" else ""
+        url = AppServer(server, workers=workers, engine=engine).start().url
+    print(url.rstrip("/"), webview.token, flush=True)
+    sys.stdin.read()
+
+
+class Client:
+    """保持连接的 HTTP 客户端，服务器关闭连接时自动重新连接"""
+
+    def __init__(self, host: str, port: int):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def get(self, path: str) -> float:
+        started = time.perf_counter()
+        self.conn.request("GET", path)
+        response = self.conn.getresponse()
+        body = response.read()
+        elapsed = time.perf_counter() - started
+        assert response.status == 200 and body, f"{path} 返回 {response.status}"
+        if response.will_close:
+            self.conn.close()
+        return elapsed
+
+
+def run_load(address: str, paths, count: int, concurrency: int):
+    """并发请求，返回 (每秒请求数, 延迟列表)"""
+    host, port = address.split("//")[1].split(":")
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index: int):
+        client = Client(host, int(port))
+        local = []
+        barrier.wait()
+        for i in range(count):
+            local.append(client.get(paths[(index + i) % len(paths)]))
+        client.conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.perf_counter() - started), latencies
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(mode: str, target: str, rps: float, latencies):
+    ms = [v * 1000 for v in latencies]
+    print(f"{mode:<12}{target:<10}{rps:>10.0f}{statistics.median(ms):>9.2f}"
+          f"{percentile(ms, 0.95):>9.2f}{percentile(ms, 0.99):>9.2f}{max(ms):>9.2f}")
+
+
+def measure_blocked(address: str, token: str, slow_count: int):
+    """slow_count 个慢请求进行中时，/game/progress 的延迟"""
+    host, port = address.split("//")[1].split(":")
+    slow = [threading.Thread(target=lambda: Client(host, int(port)).get("/bench/slow")) for _ in range(slow_count)]
+    for thread in slow:
+        thread.start()
+    time.sleep(0.05)
+    latency = Client(host, int(port)).get(f"/game/progress?token={token}")
+    for thread in slow:
+        thread.join()
+    return latency
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    print(f"{concurrency} 个客户端并发，每个 {count} 次请求，工作线程数 {workers}")
+    print(f"{'方式':<12}{'请求':<10}{'请求/秒':>10}{'p50(ms)':>9}{'p95(ms)':>9}{'p99(ms)':>9}{'最大(ms)':>9}")
+    slow_counts = (workers - 1, workers)
+    blocked = {count: {} for count in slow_counts}
+    for mode in MODES:
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", mode, str(workers)],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            address, token = proc.stdout.readline().split()
+            time.sleep(0.3)
+            # 预热
+            run_load(address, [f"/game/progress?token={token}"] + STATIC_PATHS, 20, 2)
+            for target, paths in (("progress", [f"/game/progress?token={token}"]), ("static", STATIC_PATHS)):
+                rps, latencies = run_load(address, paths, count, concurrency)
+                report(mode, target, rps, latencies)
+            for slow_count in slow_counts:
+                blocked[slow_count][mode] = measure_blocked(address, token, slow_count)
+        finally:
+            proc.stdin.close()
+            proc.wait()
+    print(f"\n慢请求（{SLOW_SECONDS * 1000:.0f} ms）进行中时 /game/progress 的延迟")
+    for slow_count, latencies in blocked.items():
+        print(f"{slow_count} 个慢请求: " + "，".join(f"{mode} {latency * 1000:.1f} ms"
+                                                 for mode, latency in latencies.items()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
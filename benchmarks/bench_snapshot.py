@@ -0,0 +1,207 @@
+"""
+快照首次安装基准测试
+
+生成三个版本的仓库（可压缩的文本文件加不可压缩的随机文件），发布 v1 的快照，
+在远程为 v2 时分别用普通克隆和快照克隆（导入快照后从 v1 增量下载到 v2）首次安装，
+比较耗时、CPU 时间（本进程和 git 子进程）和从仓库下载的字节数，
+再更新到 v3，检查快照安装之后的增量更新正常。
+
+仓库用本地裸仓库（file:// 协议）作为服务器，快照用本地静态服务器发布；
+从仓库下载的字节数通过包装 git-upload-pack 统计。可以用全局限速模拟网络带宽。
+
+用法:
+    python benchmarks/bench_snapshot.py [文本文件数] [随机文件数] [限速(MB/s)，0 表示不限速]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'src', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from snapshot import create_snapshot, zstd_available  # noqa: E402
+from static_server import StaticServer  # noqa: E402
+
+# 每个版本修改和新增的文件比例
+CHANGED_RATIO = 0.05
+WORDS = ("block", "item", "entity", "minecraft", "texture", "model", "recipe", "tooltip", "config",
+         "enabled", "true", "false", "stone", "iron", "diamond", "crafting", "furnace", "chest")
+VARIANTS = ("clone", "snapshot")
+
+
+def git(*args, cwd=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def _text(rng: random.Random) -> bytes:
+    """类似语言文件和配置文件的文本"""
+    lines = [f'"{rng.choice(WORDS)}.{rng.choice(WORDS)}.{rng.randint(0, 999)}": '
+             f'"{" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))}",'
+             for _ in range(rng.randint(50, 400))]
+    return "\n".join(lines).encode("utf-8")
+
+
+def _write(source: str, path: str, content: bytes):
+    path = os.path.join(source, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def make_fixture(work: str, texts: int, binaries: int) -> str:
+    """
+    创建裸仓库，refs/bench/v1 至 v3 指向三个版本，main 分支为 v1
+
+    返回:
+        裸仓库目录
+    """
+    rng = random.Random(1)
+    source = os.path.join(work, "source")
+    git("init", "-q", "-b", "main", source)
+    paths = [(f"config/d{i % 20:02d}/t{i:05d}.json", True) for i in range(texts)] + \
+            [(f"mods/b{i:05d}.jar", False) for i in range(binaries)]
+
+    def content(text: bool) -> bytes:
+        return _text(rng) if text else rng.randbytes(rng.randint(16 * 1024, 256 * 1024))
+
+    for path, text in paths:
+        _write(source, path, content(text))
+    for version in range(1, 4):
+        if version > 1:
+            for path, text in rng.sample(paths, int(len(paths) * CHANGED_RATIO)):
+                _write(source, path, content(text))
+            for i in range(int(len(paths) * CHANGED_RATIO)):
+                _write(source, f"config/v{version}/n{i:05d}.json", content(True))
+        git("add", "-A", cwd=source)
+        git("-c", "user.name=bench", "-c", "user.email=bench@example.com", "commit", "-qm", f"v{version}",
+            cwd=source)
+
+    bare = os.path.join(work, "server.git")
+    git("clone", "-q", "--bare", source, bare)
+    git("config", "uploadpack.allowFilter", "true", cwd=bare)
+    git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=bare)
+    for version in range(1, 4):
+        git("update-ref", f"refs/bench/v{version}", f"main~{3 - version}", cwd=bare)
+    git("update-ref", "refs/heads/main", "refs/bench/v1", cwd=bare)
+    return bare
+
+
+def make_upload_pack_counter(work: str) -> str:
+    """生成包装 git-upload-pack 的脚本，将发给客户端的数据追加到 BENCH_PACK_LOG 指定的文件"""
+    script = os.path.join(work, "upload-pack-counter.sh")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write('#!/bin/sh\ngit-upload-pack "$@" | tee -a "$BENCH_PACK_LOG"\n')
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    return script
+
+
+def usage() -> dict:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {"wall": time.perf_counter(), "cpu": own.ru_utime + own.ru_stime,
+            "child_cpu": children.ru_utime + children.ru_stime}
+
+
+def measure(start: dict, log: str, downloaded: int = 0) -> dict:
+    end = usage()
+    result = {key: end[key] - start[key] for key in ("wall", "cpu", "child_cpu")}
+    result["repo_bytes"] = os.path.getsize(log) if os.path.exists(log) else 0
+    result["snapshot_bytes"] = downloaded
+    with contextlib.suppress(OSError):
+        os.remove(log)
+    return result
+
+
+def worker(variant: str, bare: str, game: str, snapshot_url: str, rate: float):
+    """在新进程中完成一次首次安装和一次更新，结果以 JSON 输出"""
+    import git_handler
+    from bandwidth import get_transfer_scheduler
+    from git_handler import GitConfig, GitProgressMonitor, clone_git_repo, open_repo, update_git_repo
+
+    if rate:
+        get_transfer_scheduler().configure(global_limit=rate)
+    # 统计快照的下载量
+    downloaded = [0]
+    open_snapshot = git_handler.open_snapshot
+
+    def counting_open_snapshot(url, on_read, session=None):
+        def count(amount):
+            downloaded[0] += amount
+            on_read(amount)
+        return open_snapshot(url, count, session)
+    git_handler.open_snapshot = counting_open_snapshot
+
+    log = os.environ["BENCH_PACK_LOG"]
+    config = GitConfig("file://" + bare, "main", game, snapshot_url=snapshot_url if variant == "snapshot" else "")
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        git("update-ref", "refs/heads/main", "refs/bench/v2", cwd=bare)
+        start = usage()
+        assert clone_git_repo(config, GitProgressMonitor()), "克隆失败"
+        results["install"] = measure(start, log, downloaded[0])
+        assert open_repo(game).head.commit.hexsha == git("rev-parse", "refs/bench/v2", cwd=bare), "安装后版本不正确"
+
+        git("update-ref", "refs/heads/main", "refs/bench/v3", cwd=bare)
+        start = usage()
+        assert update_git_repo(config, GitProgressMonitor()), "更新失败"
+        results["update"] = measure(start, log)
+    assert git("rev-parse", "HEAD", cwd=game) == git("rev-parse", "refs/bench/v3", cwd=bare), "更新后版本不正确"
+    assert not git("status", "--porcelain", cwd=game), "工作目录与版本不一致"
+    git("fsck", "--connectivity-only", cwd=game)
+    print(json.dumps(results))
+
+
+def main():
+    texts = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    binaries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rate = float(sys.argv[3]) * 1024 * 1024 if len(sys.argv) > 3 else 0
+    work = tempfile.mkdtemp(prefix="snapshot-bench-")
+    try:
+        bare = make_fixture(work, texts, binaries)
+        site = os.path.join(work, "site")
+        os.makedirs(site)
+        name = "game.tar.zst" if zstd_available() else "game.tar.gz"
+        started = time.perf_counter()
+        meta = create_snapshot(bare, os.path.join(site, name), "main", "v1")
+        print(f"{texts} 个文本文件，{binaries} 个随机文件；快照 {name}：包 {meta['pack_bytes'] / 1e6:.1f} MB，"
+              f"压缩后 {os.path.getsize(os.path.join(site, name)) / 1e6:.1f} MB，"
+              f"生成耗时 {time.perf_counter() - started:.2f}s")
+
+        env = dict(os.environ, BENCH_PACK_LOG=os.path.join(work, "pack.log"),
+                   GIT_CONFIG_COUNT="1", GIT_CONFIG_KEY_0="remote.origin.uploadpack",
+                   GIT_CONFIG_VALUE_0=make_upload_pack_counter(work))
+        with StaticServer(site) as server:
+            print(f"{'方式':<10}{'阶段':<9}{'耗时(s)':>9}{'CPU(s)':>9}{'git CPU(s)':>12}"
+                  f"{'仓库下载(MB)':>14}{'快照下载(MB)':>14}")
+            for variant in VARIANTS:
+                game = os.path.join(work, f"game-{variant}")
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--worker", variant, bare, game,
+                     server.url + name, str(rate)],
+                    check=True, capture_output=True, text=True, env=env).stdout
+                results = json.loads(output.strip().splitlines()[-1])
+                for phase in ("install", "update"):
+                    r = results[phase]
+                    print(f"{variant:<10}{phase:<9}{r['wall']:>9.2f}{r['cpu']:>9.2f}{r['child_cpu']:>12.2f}"
+                          f"{r['repo_bytes'] / 1e6:>14.2f}{r['snapshot_bytes'] / 1e6:>14.2f}")
+                shutil.rmtree(game, ignore_errors=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], float(sys.argv[6]))
+    else:
+        main()
@@ -0,0 +1,96 @@
+"""
+本地静态文件服务器，供基准测试使用
+
+在 http.server 的基础上支持 Range 请求（单个区间），可限制每个连接的发送速度，
+用于模拟 CDN 或清单更新服务器。
+"""
+import functools
+import os
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """支持 Range 请求的静态文件处理器"""
+
+    # 每个连接的发送速度上限(字节/秒)，0 表示不限制
+    rate_limit = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self._range = None
+        path = self.translate_path(self.path)
+        match = _RANGE_PATTERN.fullmatch(self.headers.get("Range", ""))
+        if match is None or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+        if start >= size:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+
+        end = min(end, size - 1)
+        f = open(path, "rb")
+        f.seek(start)
+        self._range = end - start + 1
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(self._range))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = self._range
+        chunk_size = 64 * 1024
+        started = time.monotonic()
+        sent = 0
+        while remaining is None or remaining > 0:
+            chunk = source.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            sent += len(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+            if self.rate_limit:
+                delay = sent / self.rate_limit - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+
+class StaticServer:
+    """
+    在后台线程中运行的静态文件服务器
+
+    用法:
+        with StaticServer(root) as server:
+            requests.get(server.url + "manifest.json")
+    """
+
+    def __init__(self, root: str, rate_limit: int = 0):
+        handler = type("Handler", (RangeRequestHandler,), {"rate_limit": rate_limit})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=root))
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -85,11 +85,35 @@ function checkGameVersion(callback) {
 }
 
 /**
- * 克隆游戏
+ * 查询后台任务状态
+ * @param {string} jobId - 任务ID
+ * @param {Function} callback - 回调函数，参数为服务器返回的任务信息
+ */
+function getGameJob(jobId, callback) {
+    doAjax(`/game/jobs/${jobId}`, "GET", function() {
+        if (this.readyState == 4) {
+            if (this.status == 200) {
+                var response = JSON.parse(this.responseText);
+                if (typeof callback === 'function') {
+                    callback(response);
+                }
+            } else if (typeof callback === 'function') {
+                callback({
+                    status: 'error',
+                    message: `查询任务失败，状态码: ${this.status}`
+                });
+            }
+        }
+    });
+}
+
+/**
+ * 取消后台任务
+ * @param {string} jobId - 任务ID
  * @param {Function} callback - 回调函数，参数为服务器返回的结果
  */
-function cloneGame(callback) {
-    doAjax("/game/clone", "POST", function() {
+function cancelGameJob(jobId, callback) {
+    doAjax(`/game/jobs/${jobId}/cancel`, "POST", function() {
         if (this.readyState == 4) {
             if (this.status == 200) {
                 var response = JSON.parse(this.responseText);
@@ -101,12 +125,161 @@ function cloneGame(callback) {
     });
 }
 
+/**
+ * 等待后台任务结束
+ * @param {string} jobId - 任务ID
+ * @param {Function} callback - 回调函数，参数为任务的最终结果
+ */
+function waitForGameJob(jobId, callback) {
+    getGameJob(jobId, function(response) {
+        if (response.status !== 'ok') {
+            callback(response);
+            return;
+        }
+
+        const job = response.job;
+        if (job.state === 'pending' || job.state === 'running') {
+            setTimeout(() => waitForGameJob(jobId, callback), 1000);
+        } else if (job.state === 'cancelled') {
+            callback(job.result || { status: 'error', message: '操作已取消' });
+        } else {
+            callback(job.result || { status: 'error', message: '任务没有返回结果' });
+        }
+    });
+}
+
+/**
+ * 订阅任务进度推送
+ * 服务器只推送变化的字段，这里合并为完整的进度数据后再回调
+ * @param {string} jobId - 任务ID
+ * @param {Function} onProgress - 进度回调，参数为完整的进度数据
+ * @param {Function} onEnd - 任务结束回调，参数为任务信息 {id, kind, state, result}
+ * @returns {EventSource} 推送连接，可调用 close() 取消订阅
+ */
+function subscribeGameProgress(jobId, onProgress, onEnd) {
+    const progress = {};
+    const source = new EventSource(`/game/progress/stream?job=${jobId}&token=${window.token}`);
+
+    source.onmessage = function(event) {
+        Object.assign(progress, JSON.parse(event.data));
+        if (typeof onProgress === 'function') {
+            onProgress(Object.assign({}, progress));
+        }
+    };
+
+    source.addEventListener('end', function(event) {
+        source.close();
+        if (typeof onEnd === 'function') {
+            onEnd(JSON.parse(event.data));
+        }
+    });
+
+    return source;
+}
+
+/**
+ * 启动后台任务，推送进度并在结束后回调
+ * 不支持 EventSource 时退回到轮询
+ * @param {string} url - 启动任务的API地址
+ * @param {Function} callback - 回调函数，参数为任务的最终结果
+ * @param {Function} onProgress - 进度回调，参数为进度数据（同 /game/progress）
+ * @param {Object} data - 请求体，可选
+ */
+function runGameJob(url, callback, onProgress, data) {
+    doAjax(url, "POST", function() {
+        if (this.readyState == 4) {
+            if (this.status == 200) {
+                var response = JSON.parse(this.responseText);
+                if (response.status !== 'ok' || !response.jobId) {
+                    if (typeof callback === 'function') {
+                        callback(response);
+                    }
+                    return;
+                }
+
+                const finish = function(result) {
+                    if (typeof callback === 'function') {
+                        callback(result);
+                    }
+                };
+
+                if (window.EventSource) {
+                    subscribeGameProgress(response.jobId, onProgress, function(job) {
+                        if (job.state === 'cancelled') {
+                            finish(job.result || { status: 'error', message: '操作已取消' });
+                        } else {
+                            finish(job.result || { status: 'error', message: '任务没有返回结果' });
+                        }
+                    });
+                    return;
+                }
+
+                const progressTimer = setInterval(function() {
+                    getGameProgress(function(progress) {
+                        if (typeof onProgress === 'function') {
+                            onProgress(progress);
+                        }
+                    }, response.jobId);
+                }, 1000);
+                waitForGameJob(response.jobId, function(result) {
+                    clearInterval(progressTimer);
+                    finish(result);
+                });
+            }
+        }
+    }, data);
+}
+
+/**
+ * 克隆游戏
+ * @param {Function} callback - 回调函数，参数为克隆任务的结果
+ * @param {Function} onProgress - 进度回调，参数为进度数据
+ */
+function cloneGame(callback, onProgress) {
+    runGameJob("/game/clone", callback, onProgress);
+}
+
 /**
  * 更新游戏
- * @param {Function} callback - 回调函数，参数为服务器返回的结果
+ * @param {Function} callback - 回调函数，参数为更新任务的结果
+ * @param {Function} onProgress - 进度回调，参数为进度数据
+ */
+function updateGame(callback, onProgress) {
+    runGameJob("/game/update", callback, onProgress);
+}
+
+/**
+ * 校验游戏文件，并修复损坏或缺失的文件
+ * @param {Function} callback - 回调函数，参数为校验任务的结果
+ * @param {Function} onProgress - 进度回调，参数为进度数据
+ */
+function verifyGame(callback, onProgress) {
+    runGameJob("/game/verify", callback, onProgress);
+}
+
+/**
+ * 获取安装方案
+ * @param {Function} callback - 回调函数，参数为服务器返回的结果（profile 为当前方案，profiles 为全部方案）
+ */
+function getInstallProfiles(callback) {
+    doAjax("/game/profiles", "GET", function() {
+        if (this.readyState == 4) {
+            if (this.status == 200) {
+                var response = JSON.parse(this.responseText);
+                if (typeof callback === 'function') {
+                    callback(response);
+                }
+            }
+        }
+    });
+}
+
+/**
+ * 获取当前版本与已下载的新版本之间的更新日志
+ * @param {Function} callback - 回调函数，参数为服务器返回的结果（available 为 false 时尚未下载新版本）
  */
-function updateGame(callback) {
-    doAjax("/game/update", "POST", function() {
+function getChangelog(callback) {
+    doAjax("/game/changelog", "GET", function() {
         if (this.readyState == 4) {
             if (this.status == 200) {
                 var response = JSON.parse(this.responseText);
@@ -118,6 +291,42 @@ function updateGame(callback) {
     });
 }
 
+/**
+ * 切换安装方案
+ * @param {string} profile - 方案名称
+ * @param {Function} callback - 回调函数，参数为切换任务的结果
+ * @param {Function} onProgress - 进度回调，参数为进度数据
+ */
+function switchInstallProfile(profile, callback, onProgress) {
+    runGameJob("/game/profile", callback, onProgress, { profile: profile });
+}
+
+/**
+ * 获取仓库维护记录
+ * @param {Function} callback - 回调函数，参数为服务器返回的结果（history 为维护记录，最近的在前）
+ */
+function getMaintenanceStatus(callback) {
+    doAjax("/game/maintenance", "GET", function() {
+        if (this.readyState == 4) {
+            if (this.status == 200) {
+                var response = JSON.parse(this.responseText);
+                if (typeof callback === 'function') {
+                    callback(response);
+                }
+            }
+        }
+    });
+}
+
+/**
+ * 立即维护仓库
+ * @param {Function} callback - 回调函数，参数为维护任务的结果
+ * @param {Function} onProgress - 进度回调，参数为进度数据
+ */
+function maintainGame(callback, onProgress) {
+    runGameJob("/game/maintenance", callback, onProgress);
+}
+
 /**
  * 启动游戏
  * @param {Function} callback - 回调函数，参数为服务器返回的结果
@@ -138,9 +347,11 @@ function launchGame(callback) {
 /**
  * 获取游戏下载或更新进度
  * @param {Function} callback - 回调函数，参数为服务器返回的进度信息
+ * @param {string} jobId - 任务ID，可选，默认为最近一个任务
  */
-function getGameProgress(callback) {
-    doAjax("/game/progress", "GET", function() {
+function getGameProgress(callback, jobId) {
+    const url = jobId ? `/game/progress?job=${jobId}` : "/game/progress";
+    doAjax(url, "GET", function() {
         if (this.readyState == 4) {
             if (this.status == 200) {
                 try {
@@ -22,6 +22,7 @@ document.addEventListener('DOMContentLoaded', function () {
         currentVersion: '0.0.0',
         remoteVersion: '',
         needsUpdate: false,
+        offline: false,
         isChecking: false
     };
 
@@ -253,6 +254,29 @@ document.addEventListener('DOMContentLoaded', function () {
     // 关闭状态提示按钮点击事件
     closeStatusBtn.addEventListener('click', hideStatus);
 
+    // 版本清单中变化的组件，未知时为空字符串
+    const COMPONENT_NAMES = { mods: '模组', config: '配置', resourcepacks: '资源包', launcher: '启动器', other: '其他文件' };
+
+    function describeChangedComponents(components) {
+        if (!Array.isArray(components)) {
+            return '';
+        }
+        if (components.length === 0) {
+            return '（游戏文件没有变化）';
+        }
+        return `（更新：${components.map(name => COMPONENT_NAMES[name] || name).join('、')}）`;
+    }
+
+    // 新版本已下载时显示更新日志摘要
+    function showChangelogSummary() {
+        window.getChangelog(function (changelog) {
+            if (changelog.status === 'ok' && changelog.available && changelog.commits.length > 0) {
+                showStatus('warning', '发现新版本',
+                    `${changelog.total_commits} 项更新，${changelog.total_files} 个文件变化：${changelog.commits[0].summary}`, 0);
+            }
+        });
+    }
+
     // 检查游戏版本
     function checkGameVersion() {
         try {
@@ -273,7 +297,9 @@ document.addEventListener('DOMContentLoaded', function () {
                     gameState.exists = result.gameExists;
                     gameState.currentVersion = result.currentVersion;
                     gameState.remoteVersion = result.remoteVersion;
-                    gameState.needsUpdate = result.needsUpdate;
+                    gameState.offline = result.offline === true;
+                    // 离线时无法更新，已安装的游戏直接启动
+                    gameState.needsUpdate = result.needsUpdate && !gameState.offline;
 
                     // 更新版本显示
                     gameVersionElement.textContent = result.currentVersion || '未安装';
@@ -283,8 +309,14 @@ document.addEventListener('DOMContentLoaded', function () {
                         showStatus('warning', '游戏未安装', '需要下载游戏才能开始玩', 0);
                         // 2秒后隐藏状态
                         setTimeout(hideStatus, 2000);
+                    } else if (gameState.offline) {
+                        showStatus('warning', '离线模式', `网络不可用，可以直接开始游戏，当前版本：${result.currentVersion}`, 0);
+                        // 2秒后隐藏状态
+                        setTimeout(hideStatus, 2000);
                     } else if (result.needsUpdate) {
-                        showStatus('warning', '发现新版本', `当前版本 ${result.currentVersion}，最新版本 ${result.remoteVersion}`, 0);
+                        showStatus('warning', '发现新版本', `当前版本 ${result.currentVersion}，最新版本 ${result.remoteVersion}` +
+                            describeChangedComponents(result.changedComponents), 0);
+                        showChangelogSummary();
                         // 2秒后隐藏状态
                         setTimeout(hideStatus, 2000);
                     } else {
@@ -325,122 +357,102 @@ document.addEventListener('DOMContentLoaded', function () {
             setLaunchButtonState('loading', '下载中...', 'fa-download');
             showStatus('loading', '开始下载游戏', '正在从仓库克隆游戏，请稍候...', 5);
 
-            // 启动一个定时器，定期查询下载进度
-            let progressTimer = null;
+            // 进度由服务器推送，每次进度变化时调用
             let lastPercentage = 0;
-            let noChangeCount = 0;
+            let lastChangeTime = Date.now();
             let progressCheckCount = 0;
             
-            // 创建进度查询函数
-            const checkProgress = function() {
-                window.getGameProgress(function(result) {
-                    if (result.status === 'ok') {
-                        // 获取进度百分比
-                        const percentage = result.percentage || 0;
-                        // 获取当前阶段
-                        const stage = result.stage || '';
-                        // 获取下载速度
-                        const speed = result.speed || 0;
-                        // 获取预计剩余时间
-                        const eta = result.eta || '';
-                        // 获取完成状态
-                        const isComplete = result.is_complete || false;
-                        // 总对象数和已接收对象数
-                        const totalObjects = result.total_objects || 0;
-                        const receivedObjects = result.received_objects || 0;
-                        
-                        // 防止误报100%进度
-                        // 如果进度是100%但没有对象数据，或刚开始下载时，认为是初始状态
-                        const isInitialPhase = 
-                            (percentage === 100 && totalObjects === 0) || 
-                            (progressCheckCount < 3 && percentage === 100 && !isComplete);
-                        
-                        // 如果是初始阶段且进度异常，使用默认进度
-                        const displayPercentage = isInitialPhase ? 5 : percentage;
-                        
-                        // 检查进度是否变化
-                        if (displayPercentage === lastPercentage) {
-                            noChangeCount++;
-                            // 如果连续5次进度没有变化，且不是100%，说明可能出现了问题
-                            if (noChangeCount > 5 && displayPercentage < 100 && displayPercentage > 0) {
-                                // 更新提示信息，但继续查询
-                                showStatus('loading', '下载游戏中', `当前进度: ${displayPercentage}%，阶段: ${stage}，可能遇到网络延迟...`, displayPercentage);
-                            }
-                        } else {
-                            // 进度有变化，重置计数器
-                            noChangeCount = 0;
-                            lastPercentage = displayPercentage;
-                        }
-                        
-                        // 递增检查次数
-                        progressCheckCount++;
-                        
-                        // 根据百分比设置状态信息
-                        let statusMessage = `当前进度: ${displayPercentage}%`;
-                        
-                        // 添加阶段信息
-                        if (stage) {
-                            statusMessage += `，阶段: ${stage}`;
-                        }
-                        
-                        // 添加速度信息
-                        if (speed > 0) {
-                            statusMessage += `，速度: ${speed} KB/s`;
-                        }
-                        
-                        // 添加预计完成时间
-                        if (eta) {
-                            statusMessage += `，预计剩余时间: ${eta}`;
-                        }
-                        
-                        // 添加已接收/总对象数量信息
-                        if (result.total_objects > 0) {
-                            statusMessage += `，对象: ${result.received_objects}/${result.total_objects}`;
-                        }
-                        
-                        // 显示下载状态
-                        showStatus('loading', '下载游戏中', statusMessage, displayPercentage);
-                        
-                        // 如果下载完成，停止查询
-                        // 必须同时满足百分比为100且is_complete为true，才算真正完成
-                        if (percentage >= 100 && isComplete) {
-                            console.log("下载真正完成，停止进度查询");
-                            if (progressTimer) {
-                                clearInterval(progressTimer);
-                                progressTimer = null;
-                            }
-                        } else if (percentage >= 95) {
-                            // 进度接近完成但未真正完成时，显示更详细的状态
-                            console.log(`下载进度: ${percentage}%, 已接收: ${result.received_objects}/${result.total_objects}, 已索引: ${result.indexed_objects}/${result.total_objects}, 完成标志: ${isComplete}`);
-                            // 如果显示的百分比高但实际未完成，告知用户
-                            if (percentage >= 99 && !isComplete) {
-                                showStatus('loading', '正在完成下载', `下载到: ${percentage}%，正在完成最后处理...`, percentage);
-                            }
+            // 创建进度处理函数
+            const handleProgress = function(result) {
+                if (result.status === 'ok') {
+                    // 获取进度百分比
+                    const percentage = result.percentage || 0;
+                    // 获取当前阶段
+                    const stage = result.stage || '';
+                    // 获取下载速度
+                    const speed = result.speed || 0;
+                    // 获取预计剩余时间
+                    const eta = result.eta || '';
+                    // 获取完成状态
+                    const isComplete = result.is_complete || false;
+                    // 总对象数和已接收对象数
+                    const totalObjects = result.total_objects || 0;
+                    const receivedObjects = result.received_objects || 0;
+                    
+                    // 防止误报100%进度
+                    // 如果进度是100%但没有对象数据，或刚开始下载时，认为是初始状态
+                    const isInitialPhase = 
+                        (percentage === 100 && totalObjects === 0) || 
+                        (progressCheckCount < 3 && percentage === 100 && !isComplete);
+                    
+                    // 如果是初始阶段且进度异常，使用默认进度
+                    const displayPercentage = isInitialPhase ? 5 : percentage;
+                    
+                    // 检查进度是否变化
+                    if (displayPercentage === lastPercentage) {
+                        // 如果超过5秒进度没有变化，且不是100%，说明可能出现了问题
+                        if (Date.now() - lastChangeTime > 5000 && displayPercentage < 100 && displayPercentage > 0) {
+                            // 更新提示信息，但继续查询
+                            showStatus('loading', '下载游戏中', `当前进度: ${displayPercentage}%，阶段: ${stage}，可能遇到网络延迟...`, displayPercentage);
                         }
                     } else {
-                        // 获取进度失败，使用递增进度
-                        console.warn('获取下载进度失败:', result.message);
-                        // 自动递增进度，但不超过95%
-                        lastPercentage = Math.min(lastPercentage + 1, 95);
-                        showStatus('loading', '下载游戏中', '正在下载，无法获取精确进度...', lastPercentage);
+                        // 进度有变化，记录变化时间
+                        lastChangeTime = Date.now();
+                        lastPercentage = displayPercentage;
+                    }
+                    
+                    // 递增收到的进度次数
+                    progressCheckCount++;
+                    
+                    // 根据百分比设置状态信息
+                    let statusMessage = `当前进度: ${displayPercentage}%`;
+                    
+                    // 添加阶段信息
+                    if (stage) {
+                        statusMessage += `，阶段: ${stage}`;
+                    }
+                    
+                    // 添加速度信息
+                    if (speed > 0) {
+                        statusMessage += `，速度: ${speed} KB/s`;
                     }
-                });
+                    
+                    // 添加预计完成时间
+                    if (eta) {
+                        statusMessage += `，预计剩余时间: ${eta}`;
+                    }
+                    
+                    // 添加已接收/总对象数量信息
+                    if (result.total_objects > 0) {
+                        statusMessage += `，对象: ${result.received_objects}/${result.total_objects}`;
+                    }
+                    
+                    // 显示下载状态
+                    showStatus('loading', '下载游戏中', statusMessage, displayPercentage);
+                    
+                    // 如果下载完成，停止查询
+                    // 必须同时满足百分比为100且is_complete为true，才算真正完成
+                    if (percentage >= 100 && isComplete) {
+                        console.log("下载真正完成");
+                    } else if (percentage >= 95) {
+                        // 进度接近完成但未真正完成时，显示更详细的状态
+                        console.log(`下载进度: ${percentage}%, 已接收: ${result.received_objects}/${result.total_objects}, 已索引: ${result.indexed_objects}/${result.total_objects}, 完成标志: ${isComplete}`);
+                        // 如果显示的百分比高但实际未完成，告知用户
+                        if (percentage >= 99 && !isComplete) {
+                            showStatus('loading', '正在完成下载', `下载到: ${percentage}%，正在完成最后处理...`, percentage);
+                        }
+                    }
+                } else {
+                    // 获取进度失败，使用递增进度
+                    console.warn('获取下载进度失败:', result.message);
+                    // 自动递增进度，但不超过95%
+                    lastPercentage = Math.min(lastPercentage + 1, 95);
+                    showStatus('loading', '下载游戏中', '正在下载，无法获取精确进度...', lastPercentage);
+                }
             };
-            
-            // 立即执行一次进度查询
-            checkProgress();
-            
-            // 每秒查询一次进度
-            progressTimer = setInterval(checkProgress, 1000);
 
             // 调用API克隆游戏
             window.cloneGame(function (result) {
-                // 清除进度条定时器
-                if (progressTimer) {
-                    clearInterval(progressTimer);
-                    progressTimer = null;
-                }
-
                 if (result.status === 'ok') {
                     // 下载成功
                     gameState.exists = true;
@@ -469,7 +481,7 @@ document.addEventListener('DOMContentLoaded', function () {
                     });
                     setLaunchButtonState('normal', '重试下载', 'fa-download');
                 }
-            });
+            }, handleProgress);
         } catch (error) {
             // 捕获未处理的异常
             console.error('下载游戏异常:', error);
@@ -487,122 +499,102 @@ document.addEventListener('DOMContentLoaded', function () {
             setLaunchButtonState('loading', '更新中...', 'fa-sync');
             showStatus('loading', '开始更新游戏', `正在从 ${gameState.currentVersion} 更新到 ${gameState.remoteVersion}...`, 5);
 
-            // 启动一个定时器，定期查询更新进度
-            let progressTimer = null;
+            // 进度由服务器推送，每次进度变化时调用
             let lastPercentage = 0;
-            let noChangeCount = 0;
+            let lastChangeTime = Date.now();
             let progressCheckCount = 0;
             
-            // 创建进度查询函数
-            const checkProgress = function() {
-                window.getGameProgress(function(result) {
-                    if (result.status === 'ok') {
-                        // 获取进度百分比
-                        const percentage = result.percentage || 0;
-                        // 获取当前阶段
-                        const stage = result.stage || '';
-                        // 获取下载速度
-                        const speed = result.speed || 0;
-                        // 获取预计剩余时间
-                        const eta = result.eta || '';
-                        // 获取完成状态
-                        const isComplete = result.is_complete || false;
-                        // 总对象数和已接收对象数
-                        const totalObjects = result.total_objects || 0;
-                        const receivedObjects = result.received_objects || 0;
-                        
-                        // 防止误报100%进度
-                        // 如果进度是100%但没有对象数据，或刚开始下载时，认为是初始状态
-                        const isInitialPhase = 
-                            (percentage === 100 && totalObjects === 0) || 
-                            (progressCheckCount < 3 && percentage === 100 && !isComplete);
-                        
-                        // 如果是初始阶段且进度异常，使用默认进度
-                        const displayPercentage = isInitialPhase ? 5 : percentage;
-                        
-                        // 检查进度是否变化
-                        if (displayPercentage === lastPercentage) {
-                            noChangeCount++;
-                            // 如果连续5次进度没有变化，且不是100%，说明可能出现了问题
-                            if (noChangeCount > 5 && displayPercentage < 100 && displayPercentage > 0) {
-                                // 更新提示信息，但继续查询
-                                showStatus('loading', '更新游戏中', `当前进度: ${displayPercentage}%，阶段: ${stage}，可能遇到网络延迟...`, displayPercentage);
-                            }
-                        } else {
-                            // 进度有变化，重置计数器
-                            noChangeCount = 0;
-                            lastPercentage = displayPercentage;
-                        }
-                        
-                        // 递增检查次数
-                        progressCheckCount++;
-                        
-                        // 根据百分比设置状态信息
-                        let statusMessage = `当前进度: ${displayPercentage}%`;
-                        
-                        // 添加阶段信息
-                        if (stage) {
-                            statusMessage += `，阶段: ${stage}`;
-                        }
-                        
-                        // 添加速度信息
-                        if (speed > 0) {
-                            statusMessage += `，速度: ${speed} KB/s`;
-                        }
-                        
-                        // 添加预计完成时间
-                        if (eta) {
-                            statusMessage += `，预计剩余时间: ${eta}`;
-                        }
-                        
-                        // 添加已接收/总对象数量信息
-                        if (result.total_objects > 0) {
-                            statusMessage += `，对象: ${result.received_objects}/${result.total_objects}`;
-                        }
-                        
-                        // 显示更新状态
-                        showStatus('loading', '更新游戏中', statusMessage, displayPercentage);
-                        
-                        // 如果更新完成，停止查询
-                        // 必须同时满足百分比为100且is_complete为true，才算真正完成
-                        if (percentage >= 100 && isComplete) {
-                            console.log("更新真正完成，停止进度查询");
-                            if (progressTimer) {
-                                clearInterval(progressTimer);
-                                progressTimer = null;
-                            }
-                        } else if (percentage >= 95) {
-                            // 进度接近完成但未真正完成时，显示更详细的状态
-                            console.log(`更新进度: ${percentage}%, 已接收: ${result.received_objects}/${result.total_objects}, 已索引: ${result.indexed_objects}/${result.total_objects}, 完成标志: ${isComplete}`);
-                            // 如果显示的百分比高但实际未完成，告知用户
-                            if (percentage >= 99 && !isComplete) {
-                                showStatus('loading', '正在完成更新', `更新到: ${percentage}%，正在完成最后处理...`, percentage);
-                            }
+            // 创建进度处理函数
+            const handleProgress = function(result) {
+                if (result.status === 'ok') {
+                    // 获取进度百分比
+                    const percentage = result.percentage || 0;
+                    // 获取当前阶段
+                    const stage = result.stage || '';
+                    // 获取下载速度
+                    const speed = result.speed || 0;
+                    // 获取预计剩余时间
+                    const eta = result.eta || '';
+                    // 获取完成状态
+                    const isComplete = result.is_complete || false;
+                    // 总对象数和已接收对象数
+                    const totalObjects = result.total_objects || 0;
+                    const receivedObjects = result.received_objects || 0;
+                    
+                    // 防止误报100%进度
+                    // 如果进度是100%但没有对象数据，或刚开始下载时，认为是初始状态
+                    const isInitialPhase = 
+                        (percentage === 100 && totalObjects === 0) || 
+                        (progressCheckCount < 3 && percentage === 100 && !isComplete);
+                    
+                    // 如果是初始阶段且进度异常，使用默认进度
+                    const displayPercentage = isInitialPhase ? 5 : percentage;
+                    
+                    // 检查进度是否变化
+                    if (displayPercentage === lastPercentage) {
+                        // 如果超过5秒进度没有变化，且不是100%，说明可能出现了问题
+                        if (Date.now() - lastChangeTime > 5000 && displayPercentage < 100 && displayPercentage > 0) {
+                            // 更新提示信息，但继续查询
+                            showStatus('loading', '更新游戏中', `当前进度: ${displayPercentage}%，阶段: ${stage}，可能遇到网络延迟...`, displayPercentage);
                         }
                     } else {
-                        // 获取进度失败，使用递增进度
-                        console.warn('获取更新进度失败:', result.message);
-                        // 自动递增进度，但不超过95%
-                        lastPercentage = Math.min(lastPercentage + 1, 95);
-                        showStatus('loading', '更新游戏中', '正在更新，无法获取精确进度...', lastPercentage);
+                        // 进度有变化，记录变化时间
+                        lastChangeTime = Date.now();
+                        lastPercentage = displayPercentage;
+                    }
+                    
+                    // 递增收到的进度次数
+                    progressCheckCount++;
+                    
+                    // 根据百分比设置状态信息
+                    let statusMessage = `当前进度: ${displayPercentage}%`;
+                    
+                    // 添加阶段信息
+                    if (stage) {
+                        statusMessage += `，阶段: ${stage}`;
                     }
-                });
+                    
+                    // 添加速度信息
+                    if (speed > 0) {
+                        statusMessage += `，速度: ${speed} KB/s`;
+                    }
+                    
+                    // 添加预计完成时间
+                    if (eta) {
+                        statusMessage += `，预计剩余时间: ${eta}`;
+                    }
+                    
+                    // 添加已接收/总对象数量信息
+                    if (result.total_objects > 0) {
+                        statusMessage += `，对象: ${result.received_objects}/${result.total_objects}`;
+                    }
+                    
+                    // 显示更新状态
+                    showStatus('loading', '更新游戏中', statusMessage, displayPercentage);
+                    
+                    // 如果更新完成，停止查询
+                    // 必须同时满足百分比为100且is_complete为true，才算真正完成
+                    if (percentage >= 100 && isComplete) {
+                        console.log("更新真正完成");
+                    } else if (percentage >= 95) {
+                        // 进度接近完成但未真正完成时，显示更详细的状态
+                        console.log(`更新进度: ${percentage}%, 已接收: ${result.received_objects}/${result.total_objects}, 已索引: ${result.indexed_objects}/${result.total_objects}, 完成标志: ${isComplete}`);
+                        // 如果显示的百分比高但实际未完成，告知用户
+                        if (percentage >= 99 && !isComplete) {
+                            showStatus('loading', '正在完成更新', `更新到: ${percentage}%，正在完成最后处理...`, percentage);
+                        }
+                    }
+                } else {
+                    // 获取进度失败，使用递增进度
+                    console.warn('获取更新进度失败:', result.message);
+                    // 自动递增进度，但不超过95%
+                    lastPercentage = Math.min(lastPercentage + 1, 95);
+                    showStatus('loading', '更新游戏中', '正在更新，无法获取精确进度...', lastPercentage);
+                }
             };
-            
-            // 立即执行一次进度查询
-            checkProgress();
-            
-            // 每秒查询一次进度
-            progressTimer = setInterval(checkProgress, 1000);
 
             // 调用API更新游戏
             window.updateGame(function (result) {
-                // 清除进度条定时器
-                if (progressTimer) {
-                    clearInterval(progressTimer);
-                    progressTimer = null;
-                }
-
                 if (result.status === 'ok') {
                     // 更新成功
                     gameState.currentVersion = result.version;
@@ -630,7 +622,7 @@ document.addEventListener('DOMContentLoaded', function () {
                     });
                     setLaunchButtonState('normal', '重试更新', 'fa-sync');
                 }
-            });
+            }, handleProgress);
         } catch (error) {
             // 捕获未处理的异常
             console.error('更新游戏异常:', error);
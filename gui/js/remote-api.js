@@ -4,20 +4,52 @@
 
 // API基础URL，可以根据环境进行调整
 const API_BASE_URL = 'http://localhost:8888';
+// 请求超时(毫秒)，网络不可用时尽快改用缓存的内容
+const REQUEST_TIMEOUT = 5000;
+// 缓存远程内容的 localStorage 键前缀
+const CACHE_PREFIX = 'remote-api:';
 
 /**
- * 获取远程公告
- * @param {Function} callback - 处理响应的回调函数
- * @param {boolean} fallbackToLocal - 若远程API失败是否回退到本地API
+ * 获取远程 JSON，成功时缓存到 localStorage；失败或超时时返回上次缓存的内容
+ * @param {string} url - 请求地址
+ * @returns {Promise<Object>} 响应数据，来自缓存时 offline 为 true；没有缓存时 reject
  */
-function getRemoteAnnouncement(callback, fallbackToLocal = true) {
-  fetch(`${API_BASE_URL}/api/announcement`)
+function fetchJsonWithCache(url) {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), REQUEST_TIMEOUT);
+  return fetch(url, { signal: controller.signal })
     .then(response => {
       if (!response.ok) {
         throw new Error(`API响应错误: ${response.status}`);
       }
       return response.json();
     })
+    .then(data => {
+      try {
+        localStorage.setItem(CACHE_PREFIX + url, JSON.stringify(data));
+      } catch (e) {
+        // 存储空间不足等情况下只是不缓存
+      }
+      return data;
+    })
+    .catch(error => {
+      const cached = localStorage.getItem(CACHE_PREFIX + url);
+      if (cached === null) {
+        throw error;
+      }
+      console.warn(`请求 ${url} 失败，使用缓存的内容:`, error);
+      return Object.assign(JSON.parse(cached), { offline: true });
+    })
+    .finally(() => clearTimeout(timer));
+}
+
+/**
+ * 获取远程公告
+ * @param {Function} callback - 处理响应的回调函数
+ * @param {boolean} fallbackToLocal - 若远程API失败是否回退到本地API
+ */
+function getRemoteAnnouncement(callback, fallbackToLocal = true) {
+  fetchJsonWithCache(`${API_BASE_URL}/api/announcement`)
     .then(data => {
       if (typeof callback === 'function') {
         callback(data);
@@ -44,13 +76,7 @@ function getRemoteAnnouncement(callback, fallbackToLocal = true) {
  * @param {Function} callback - 处理响应的回调函数
  */
 function getCarouselData(callback) {
-  fetch(`${API_BASE_URL}/api/carousel`)
-    .then(response => {
-      if (!response.ok) {
-        throw new Error(`API响应错误: ${response.status}`);
-      }
-      return response.json();
-    })
+  fetchJsonWithCache(`${API_BASE_URL}/api/carousel`)
     .then(data => {
       if (typeof callback === 'function') {
         callback(data);
@@ -106,13 +132,7 @@ function getBackgroundData(callback, defaultOnly = true) {
     ? `${API_BASE_URL}/api/backgrounds?default=true`
     : `${API_BASE_URL}/api/backgrounds`;
     
-  fetch(url)
-    .then(response => {
-      if (!response.ok) {
-        throw new Error(`API响应错误: ${response.status}`);
-      }
-      return response.json();
-    })
+  fetchJsonWithCache(url)
     .then(data => {
       if (typeof callback === 'function') {
         callback(data);
@@ -6,16 +6,36 @@ import os
 import subprocess
 import sys
 import time
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime
 
+from bandwidth import get_throughput_history, get_transfer_scheduler
 from config import get_game_config
-from git_handler import GitConfig, clone_git_repo, update_git_repo, get_git_progress
+from git_handler import (DEFAULT_STALL_TIMEOUT, DEFAULT_SUBMODULE_JOBS, GitConfig, GitProgressMonitor,
+                         clone_git_repo, update_git_repo, rollback_git_repo, prefetch_git_repo, has_staged_update,
+                         list_installed_versions, switch_sparse_checkout, get_git_progress, set_git_engine,
+                         DEFAULT_GIT_ENGINE, estimate_git_update, get_changelog, recover_interrupted_update)
+from http_client import get_http_client
+from integrity import verify_git_repo
+from job_manager import get_job_manager
+from maintenance import (DEFAULT_LOOSE_OBJECTS_LIMIT, DEFAULT_MAINTENANCE_INTERVAL, DEFAULT_PACKS_LIMIT,
+                         load_maintenance_history, run_maintenance)
+from manifest_updater import DEFAULT_DOWNLOAD_WORKERS, estimate_manifest_update, update_from_manifest
+from mirrors import MIRROR_REPO, get_mirror_selector
+from prefetch import DEFAULT_PREFETCH_INTERVAL, DEFAULT_RETRY_DELAY, PrefetchScheduler
+from scheduler import BackgroundScheduler
+from progress_stream import DEFAULT_STREAM_FPS, iter_progress_events
+from version_manifest import is_newer_version
 import webview
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 后台预下载调度器
+_prefetch_scheduler: Optional[PrefetchScheduler] = None
+# 仓库维护调度器
+_maintenance_scheduler: Optional[BackgroundScheduler] = None
+
 
 def initialize() -> bool:
     """
@@ -26,6 +46,10 @@ def initialize() -> bool:
     try:
         # 加载配置
         game_config = get_game_config()
+        configure_bandwidth()
+        configure_git_engine()
+        start_prefetch_scheduler()
+        start_maintenance_scheduler()
         logger.info(f"初始化完成，当前游戏版本: {game_config.get_current_version()}")
         return True
     except Exception as e:
@@ -60,17 +84,29 @@ def check_game_version() -> Dict[str, Any]:
         
         # 检查远程版本
         needs_update, remote_version, current_version = game_config.check_remote_version()
+        remote = game_config.get_remote_version() if needs_update else None
+        changed = game_config.get_changed_components(remote) if remote else None
         
         # 检查游戏是否存在
         game_exists = game_config.game_exists()
+        update_interrupted = game_config.update_interrupted()
+        update_ready = needs_update and game_exists and has_staged_update(game_config.get_game_path())
+        # 没有组件变化时只需记录新版本号，不需要下载；离线时无法估算下载量
+        online = get_http_client().online
+        needs_download = needs_update and not update_ready and changed != [] and online
         
         return {
             "status": "ok",
             "currentVersion": current_version,
             "remoteVersion": remote_version,
             "needsUpdate": needs_update,
+            "changedComponents": changed,
             "gameExists": game_exists,
+            "updateInterrupted": update_interrupted,
+            "updateReady": update_ready,
+            "download": estimate_download(game_config) if needs_download else None,
             "gamePath": game_config.get_game_path(),
+            "offline": not online,
             "checkedAt": datetime.now().isoformat()
         }
     except Exception as e:
@@ -81,9 +117,105 @@ def check_game_version() -> Dict[str, Any]:
         }
 
 
-def clone_game() -> Dict[str, Any]:
+def estimate_download(game_config) -> Optional[Dict[str, Any]]:
+    """
+    估算更新（或首次安装）需要下载的数据量和时间
+    Args:
+        game_config: 游戏配置
+    Returns:
+        包含 objects（文件数）、bytes（字节数）、exact（字节数是否精确）和 seconds（预计耗时，
+        没有下载速度记录时为 None）的字典；未启用、无法估算时返回 None
+    """
+    update_config = game_config.get("update", {})
+    if not update_config.get("estimate", True):
+        return None
+    if _uses_manifest_engine(game_config):
+        manifest_url = update_config.get("manifest_url", "")
+        estimate = estimate_manifest_update(manifest_url, game_config.get_game_path()) if manifest_url else None
+    elif game_config.game_exists():
+        estimate = estimate_git_update(_build_git_config(game_config))
+    else:
+        # 首次克隆前本地没有可比较的文件
+        estimate = None
+    if estimate is None:
+        return None
+    return {
+        "objects": estimate["objects"],
+        "bytes": estimate["bytes"],
+        "exact": estimate["exact"],
+        "seconds": get_throughput_history().estimate_seconds(estimate["bytes"])
+    }
+
+
+def _record_throughput(monitor: Optional[GitProgressMonitor]):
+    """记录一次完成的下载的实际速度，用于估算之后的更新时间"""
+    if monitor is not None:
+        get_throughput_history().record(monitor.transferred_bytes, time.time() - monitor.start_time)
+
+
+def _build_git_config(game_config, target_commit: str = "", rank_mirrors: bool = False) -> GitConfig:
+    """
+    根据游戏配置创建GitConfig对象
+    Args:
+        game_config: 游戏配置
+        target_commit: 更新的目标提交（来自远程版本清单），为空时更新到分支的最新提交
+        rank_mirrors: 镜像排序过期时是否重新测速，只在克隆、更新和预下载时需要；
+            其他操作使用上次的排序，离线时不会因测速而等待
+    Returns:
+        GitConfig对象
+    """
+    git_config_dict = game_config.get_git_config()
+    return GitConfig(
+        git_url=git_config_dict.get("repo_url", game_config.GIT_REPO_URL),
+        git_branch=git_config_dict.get("branch", game_config.GIT_BRANCH),
+        git_path=game_config.get_game_path(),
+        clone_depth=git_config_dict.get("clone_depth", game_config.GIT_CLONE_DEPTH),
+        clone_filter=git_config_dict.get("clone_filter", ""),
+        keep_versions=git_config_dict.get("keep_versions", game_config.GIT_KEEP_VERSIONS),
+        mirror_urls=game_config.get_repo_urls(probe=rank_mirrors),
+        stall_timeout=game_config.get("mirrors", {}).get("stall_timeout", DEFAULT_STALL_TIMEOUT),
+        on_mirror_failed=lambda url: get_mirror_selector().report_failure(MIRROR_REPO, url),
+        sparse_paths=game_config.get_sparse_paths(),
+        snapshot_url=git_config_dict.get("snapshot_url", ""),
+        bundle_url=git_config_dict.get("bundle_url", ""),
+        submodule_jobs=git_config_dict.get("submodule_jobs", DEFAULT_SUBMODULE_JOBS),
+        target_commit=target_commit
+    )
+
+
+def _uses_manifest_engine(game_config) -> bool:
+    """
+    是否使用文件清单方式更新（而不是 Git）
+    Args:
+        game_config: 游戏配置
+    Returns:
+        配置的更新方式为 manifest 时返回 True
+    """
+    return game_config.get("update", {}).get("engine", "git") == "manifest"
+
+
+def _update_from_manifest(game_config, monitor: Optional[GitProgressMonitor]) -> bool:
+    """
+    按远程文件清单安装或更新游戏
+    Args:
+        game_config: 游戏配置
+        monitor: 进度监视器
+    Returns:
+        是否成功
+    """
+    update_config = game_config.get("update", {})
+    manifest_url = update_config.get("manifest_url", "")
+    if not manifest_url:
+        raise ValueError("未配置文件清单地址")
+    workers = update_config.get("download_workers", DEFAULT_DOWNLOAD_WORKERS)
+    return update_from_manifest(manifest_url, game_config.get_game_path(), monitor, workers) is not None
+
+
+def clone_game(monitor: Optional[GitProgressMonitor] = None) -> Dict[str, Any]:
     """
     克隆游戏
+    Args:
+        monitor: 进度监视器，由任务管理器提供
     Returns:
         操作结果字典
     """
@@ -98,33 +230,36 @@ def clone_game() -> Dict[str, Any]:
             }
         
         # 获取Git配置
-        git_config_dict = game_config.get_git_config()
-        game_path = game_config.get_game_path()
-        
-        # 创建GitConfig对象
-        git_config = GitConfig(
-            git_url=git_config_dict.get("repo_url", game_config.GIT_REPO_URL),
-            git_branch=git_config_dict.get("branch", game_config.GIT_BRANCH),
-            git_path=game_path
-        )
+        git_config = _build_git_config(game_config, rank_mirrors=True)
+        game_path = git_config.git_path
         
         # 确保目录存在
         os.makedirs(os.path.dirname(game_path), exist_ok=True)
         
-        # 克隆仓库
-        success = clone_git_repo(git_config)
+        # 克隆仓库，或按文件清单下载
+        if _uses_manifest_engine(game_config):
+            success = _update_from_manifest(game_config, monitor)
+        else:
+            success = clone_git_repo(git_config, monitor)
         
         if success:
+            _record_throughput(monitor)
             # 更新当前版本
-            needs_update, remote_version, _ = game_config.check_remote_version()
+            remote = game_config.get_remote_version()
+            remote_version = remote["version"] if remote else ""
             if remote_version:
-                game_config.set_current_version(remote_version)
+                game_config.set_current_version(remote_version, remote)
                 
             return {
                 "status": "ok",
                 "message": "游戏克隆成功",
                 "version": remote_version
             }
+        elif monitor and monitor.is_cancelled():
+            return {
+                "status": "error",
+                "message": "游戏下载已取消，下次下载将从中断处继续"
+            }
         else:
             return {
                 "status": "error",
@@ -138,54 +273,85 @@ def clone_game() -> Dict[str, Any]:
         }
 
 
-def update_game() -> Dict[str, Any]:
+def update_game(monitor: Optional[GitProgressMonitor] = None) -> Dict[str, Any]:
     """
     更新游戏
+    Args:
+        monitor: 进度监视器，由任务管理器提供
     Returns:
         操作结果字典
     """
     try:
         game_config = get_game_config()
         
-        # 检查游戏是否存在
-        if not game_config.game_exists():
+        # 上次版本切换中断时先恢复到切换前的版本，之后按正常流程更新
+        if not _uses_manifest_engine(game_config) and not recover_interrupted_update(game_config.get_game_path()):
+            return {
+                "status": "error",
+                "message": "恢复中断的更新失败"
+            }
+        
+        # 检查游戏是否存在，文件替换中断时重新按清单更新即可继续完成
+        if not game_config.game_exists() and not game_config.update_interrupted():
             return {
                 "status": "error",
                 "message": "游戏不存在，请先克隆游戏"
             }
         
         # 检查是否需要更新
-        needs_update, remote_version, current_version = game_config.check_remote_version()
+        current_version = game_config.get_current_version()
+        remote = game_config.get_remote_version()
         
-        if not needs_update:
+        if remote is None or not is_newer_version(remote["version"], current_version):
+            # 没有新版本时也要完成中断的文件替换
+            if game_config.update_interrupted() and not _update_from_manifest(game_config, monitor):
+                return {
+                    "status": "error",
+                    "message": "恢复中断的更新失败"
+                }
             return {
                 "status": "ok",
                 "message": "游戏已是最新版本",
                 "version": current_version
             }
+
+        remote_version = remote["version"]
+        changed = game_config.get_changed_components(remote)
+        if changed == []:
+            # 版本清单表明游戏文件没有变化，只记录新版本号
+            game_config.set_current_version(remote_version, remote)
+            if monitor:
+                monitor.mark_complete()
+            return {
+                "status": "ok",
+                "message": f"游戏更新成功，从 {current_version} 更新到 {remote_version}，游戏文件没有变化",
+                "version": remote_version,
+                "changedComponents": changed
+            }
         
-        # 获取Git配置
-        git_config_dict = game_config.get_git_config()
-        game_path = game_config.get_game_path()
-        
-        # 创建GitConfig对象
-        git_config = GitConfig(
-            git_url=git_config_dict.get("repo_url", game_config.GIT_REPO_URL),
-            git_branch=git_config_dict.get("branch", game_config.GIT_BRANCH),
-            git_path=game_path
-        )
-        
-        # 更新仓库
-        success = update_git_repo(git_config)
+        if _uses_manifest_engine(game_config):
+            # 只下载变化的文件
+            success = _update_from_manifest(game_config, monitor)
+        else:
+            # 更新仓库到版本清单指定的提交，当前版本保留为历史版本
+            git_config = _build_git_config(game_config, remote.get("commit", ""), rank_mirrors=True)
+            success = update_git_repo(git_config, monitor, label=current_version)
         
         if success:
+            _record_throughput(monitor)
             # 更新当前版本
-            game_config.set_current_version(remote_version)
+            game_config.set_current_version(remote_version, remote)
             
             return {
                 "status": "ok",
                 "message": f"游戏更新成功，从 {current_version} 更新到 {remote_version}",
-                "version": remote_version
+                "version": remote_version,
+                "changedComponents": changed
+            }
+        elif monitor and monitor.is_cancelled():
+            return {
+                "status": "error",
+                "message": "游戏更新已取消"
             }
         else:
             return {
@@ -200,6 +366,495 @@ def update_game() -> Dict[str, Any]:
         }
 
 
+def rollback_game(monitor: Optional[GitProgressMonitor] = None, commit: Optional[str] = None) -> Dict[str, Any]:
+    """
+    回滚到历史版本
+    Args:
+        monitor: 进度监视器，由任务管理器提供
+        commit: 目标历史版本的提交，为 None 时回滚到上一个版本
+    Returns:
+        操作结果字典
+    """
+    try:
+        game_config = get_game_config()
+        current_version = game_config.get_current_version()
+        entry = rollback_git_repo(_build_git_config(game_config), commit, label=current_version)
+        if entry is None:
+            return {
+                "status": "error",
+                "message": "回滚失败或没有可回滚的版本"
+            }
+
+        version = entry.get("version") or current_version
+        game_config.set_current_version(version)
+        if monitor:
+            monitor.mark_complete()
+        return {
+            "status": "ok",
+            "message": f"已回滚到 {version}",
+            "version": version
+        }
+    except Exception as e:
+        logger.error(f"回滚游戏失败: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+
+def get_installed_versions() -> Dict[str, Any]:
+    """
+    获取可回滚的历史版本
+    Returns:
+        包含历史版本列表的字典
+    """
+    game_config = get_game_config()
+    return {
+        "status": "ok",
+        "currentVersion": game_config.get_current_version(),
+        "versions": list_installed_versions(_build_git_config(game_config))
+    }
+
+
+def get_game_changelog() -> Dict[str, Any]:
+    """
+    获取当前版本与已下载的新版本之间的更新日志
+    Returns:
+        包含提交和变化文件的字典，新版本尚未下载时 available 为 False
+    """
+    game_config = get_game_config()
+    if _uses_manifest_engine(game_config):
+        return {"status": "error", "message": "文件清单方式更新不提供更新日志"}
+    if not os.path.isdir(os.path.join(game_config.get_game_path(), ".git")):
+        return {"status": "error", "message": "游戏不存在，请先克隆游戏"}
+
+    changelog = get_changelog(_build_git_config(game_config))
+    if changelog is None:
+        return {"status": "ok", "available": False}
+    return {"status": "ok", "available": True, **changelog}
+
+
+def verify_game(monitor: Optional[GitProgressMonitor] = None, repair: bool = True) -> Dict[str, Any]:
+    """
+    校验游戏文件，并修复损坏或缺失的文件
+    Args:
+        monitor: 进度监视器，由任务管理器提供
+        repair: 是否修复不一致的文件
+    Returns:
+        操作结果字典
+    """
+    try:
+        game_config = get_game_config()
+
+        # 启动器本身也可能缺失，这里只要求仓库存在
+        if not os.path.isdir(os.path.join(game_config.get_game_path(), ".git")):
+            return {
+                "status": "error",
+                "message": "游戏不存在，请先克隆游戏"
+            }
+
+        workers = game_config.get("verify", {}).get("workers", 0)
+        result = verify_git_repo(_build_git_config(game_config), monitor, repair=repair, workers=workers)
+
+        if result is None:
+            cancelled = monitor is not None and monitor.is_cancelled()
+            return {
+                "status": "error",
+                "message": "游戏文件校验已取消" if cancelled else "游戏文件校验失败"
+            }
+        if result["failed"]:
+            message = f"{len(result['failed'])} 个文件修复失败"
+        elif result["repaired"]:
+            message = f"已修复 {len(result['repaired'])} 个文件"
+        elif result["mismatched"]:
+            message = f"发现 {len(result['mismatched'])} 个文件损坏或缺失"
+        else:
+            message = "游戏文件完整"
+        return {
+            "status": "error" if result["failed"] else "ok",
+            "message": message,
+            **result
+        }
+    except Exception as e:
+        logger.error(f"校验游戏文件失败: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+
+def get_install_profiles() -> Dict[str, Any]:
+    """
+    获取安装方案
+    Returns:
+        包含当前方案名称和各方案稀疏检出规则的字典
+    """
+    game_config = get_game_config()
+    return {
+        "status": "ok",
+        "profile": game_config.get_install_profile(),
+        "profiles": game_config.get_install_profiles()
+    }
+
+
+def switch_install_profile(monitor: Optional[GitProgressMonitor] = None, profile: str = "full") -> Dict[str, Any]:
+    """
+    切换安装方案，游戏已安装时只下载和检出新方案中增加的文件，并删除不再需要的文件
+    Args:
+        monitor: 进度监视器，由任务管理器提供
+        profile: 方案名称
+    Returns:
+        操作结果字典
+    """
+    try:
+        game_config = get_game_config()
+        if profile not in game_config.get_install_profiles():
+            return {
+                "status": "error",
+                "message": f"未定义的安装方案: {profile}"
+            }
+        if _uses_manifest_engine(game_config):
+            # 按文件清单更新时总是安装全部文件
+            return {
+                "status": "error",
+                "message": "按文件清单更新时不支持安装方案",
+                "supported": False
+            }
+
+        # 未安装时只保存设置，安装时按新方案检出
+        if not game_config.game_exists():
+            game_config.set_install_profile(profile)
+            return {
+                "status": "ok",
+                "message": f"已切换到安装方案 {profile}",
+                "profile": profile
+            }
+
+        # 切换成功后才保存设置，取消或失败时工作区和设置都保持原来的方案
+        git_config = _build_git_config(game_config)
+        git_config.sparse_paths = list(game_config.get_install_profiles()[profile] or [])
+        if not switch_sparse_checkout(git_config, monitor):
+            cancelled = monitor is not None and monitor.is_cancelled()
+            return {
+                "status": "error",
+                "message": "切换安装方案已取消" if cancelled else "切换安装方案失败"
+            }
+        game_config.set_install_profile(profile)
+        return {
+            "status": "ok",
+            "message": f"已切换到安装方案 {profile}",
+            "profile": profile
+        }
+    except Exception as e:
+        logger.error(f"切换安装方案失败: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+
+def configure_bandwidth():
+    """按配置设置下载限速"""
+    bandwidth_config = get_game_config().get("bandwidth", {})
+    get_transfer_scheduler().configure(
+        global_limit=bandwidth_config.get("limit_kbps", 0) * 1024,
+        background_limit=bandwidth_config.get("background_kbps", 0) * 1024,
+        background_floor=bandwidth_config.get("background_floor_kbps", 64) * 1024
+    )
+
+
+def configure_git_engine():
+    """按配置选择仓库操作后端，配置无效时使用默认后端"""
+    engine = get_game_config().get("git", {}).get("engine", DEFAULT_GIT_ENGINE)
+    try:
+        set_git_engine(engine)
+    except ValueError as e:
+        logger.error(f"{e}，使用 {DEFAULT_GIT_ENGINE}")
+        set_git_engine(DEFAULT_GIT_ENGINE)
+
+
+def prefetch_game() -> Optional[bool]:
+    """
+    在后台预下载游戏的新版本
+    Returns:
+        已预下载新版本返回 True，没有新版本返回 False，跳过或失败返回 None
+    """
+    game_config = get_game_config()
+    if not game_config.game_exists() or _uses_manifest_engine(game_config):
+        return False
+    # 离线时先检查版本（主机熔断时立即失败），网络恢复后再下载
+    if not get_http_client().online:
+        game_config.get_remote_version()
+        if not get_http_client().online:
+            return None
+    return prefetch_git_repo(_build_git_config(game_config, rank_mirrors=True))
+
+
+def start_prefetch_scheduler() -> Optional[PrefetchScheduler]:
+    """
+    按配置启动后台预下载调度器
+    Returns:
+        调度器，未启用时返回 None
+    """
+    global _prefetch_scheduler
+    prefetch_config = get_game_config().get("prefetch", {})
+    if not prefetch_config.get("enabled", True):
+        return None
+    if _prefetch_scheduler is None:
+        _prefetch_scheduler = PrefetchScheduler(
+            prefetch_game,
+            get_job_manager().has_active,
+            interval=prefetch_config.get("interval", DEFAULT_PREFETCH_INTERVAL),
+            retry_delay=prefetch_config.get("retry_delay", DEFAULT_RETRY_DELAY)
+        )
+    _prefetch_scheduler.start()
+    return _prefetch_scheduler
+
+
+def _maintenance_options(game_config) -> Dict[str, Any]:
+    """
+    读取仓库维护的阈值配置
+    Returns:
+        run_maintenance 的关键字参数
+    """
+    maintenance_config = game_config.get("maintenance", {})
+    return {
+        "loose_objects_limit": maintenance_config.get("loose_objects_limit", DEFAULT_LOOSE_OBJECTS_LIMIT),
+        "packs_limit": maintenance_config.get("packs_limit", DEFAULT_PACKS_LIMIT),
+        "full_interval": maintenance_config.get("full_interval_days", 7) * 24 * 3600
+    }
+
+
+def _can_maintain(game_config) -> bool:
+    """游戏仓库存在且使用 Git 更新时才需要维护"""
+    return os.path.isdir(os.path.join(game_config.get_game_path(), ".git")) and \
+        not _uses_manifest_engine(game_config)
+
+
+def scheduled_maintenance() -> Optional[bool]:
+    """
+    空闲时在后台维护游戏仓库，只在超过阈值时执行
+    Returns:
+        已执行维护返回 True，无需维护返回 False，跳过或失败返回 None
+    """
+    game_config = get_game_config()
+    if not _can_maintain(game_config):
+        return False
+    record = run_maintenance(_build_git_config(game_config), **_maintenance_options(game_config))
+    if record is None:
+        return None
+    return bool(record["steps"])
+
+
+def maintain_game(monitor: Optional[GitProgressMonitor] = None) -> Dict[str, Any]:
+    """
+    立即对游戏仓库进行完整维护
+    Args:
+        monitor: 进度监视器，由任务管理器提供
+    Returns:
+        操作结果字典，包含本次维护的记录
+    """
+    try:
+        game_config = get_game_config()
+        if not _can_maintain(game_config):
+            return {
+                "status": "error",
+                "message": "游戏不存在或未使用 Git 更新，无需维护"
+            }
+        record = run_maintenance(_build_git_config(game_config), monitor or GitProgressMonitor(), force=True,
+                                 **_maintenance_options(game_config))
+        if record is None:
+            cancelled = monitor is not None and monitor.is_cancelled()
+            return {
+                "status": "error",
+                "message": "仓库维护已取消" if cancelled else "仓库维护失败"
+            }
+        return {
+            "status": "ok",
+            "message": f"仓库维护完成，回收 {record['reclaimed_bytes'] / 1024 / 1024:.1f} MB",
+            **record
+        }
+    except Exception as e:
+        logger.error(f"仓库维护失败: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+
+def get_maintenance_status() -> Dict[str, Any]:
+    """
+    获取仓库维护记录和调度状态
+    Returns:
+        包含维护记录（最近的在前）和调度状态的字典
+    """
+    game_config = get_game_config()
+    return {
+        "status": "ok",
+        "history": load_maintenance_history(game_config.get_game_path()),
+        "scheduler": _maintenance_scheduler.get_status() if _maintenance_scheduler is not None else None
+    }
+
+
+def start_maintenance_scheduler() -> Optional[BackgroundScheduler]:
+    """
+    按配置启动仓库维护调度器，有任务进行或游戏运行时跳过
+    Returns:
+        调度器，未启用时返回 None
+    """
+    global _maintenance_scheduler
+    maintenance_config = get_game_config().get("maintenance", {})
+    if not maintenance_config.get("enabled", True):
+        return None
+    if _maintenance_scheduler is None:
+        _maintenance_scheduler = BackgroundScheduler(
+            scheduled_maintenance,
+            lambda: get_job_manager().has_active() or get_transfer_scheduler().game_running(),
+            interval=maintenance_config.get("interval", DEFAULT_MAINTENANCE_INTERVAL),
+            name="仓库维护"
+        )
+    _maintenance_scheduler.start()
+    return _maintenance_scheduler
+
+
+def _start_job(kind: str, func) -> Dict[str, Any]:
+    """
+    提交后台任务
+    Args:
+        kind: 任务类型
+        func: 任务函数
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    try:
+        job = get_job_manager().submit(kind, func)
+        return {
+            "status": "ok",
+            "jobId": job.id
+        }
+    except Exception as e:
+        logger.error(f"提交任务失败: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+
+def start_clone_job() -> Dict[str, Any]:
+    """
+    在后台克隆游戏
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    return _start_job("clone", clone_game)
+
+
+def start_update_job() -> Dict[str, Any]:
+    """
+    在后台更新游戏
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    return _start_job("update", update_game)
+
+
+def start_rollback_job(commit: Optional[str] = None) -> Dict[str, Any]:
+    """
+    在后台回滚到历史版本
+    Args:
+        commit: 目标历史版本的提交，为 None 时回滚到上一个版本
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    return _start_job("rollback", lambda monitor: rollback_game(monitor, commit))
+
+
+def start_verify_job(repair: bool = True) -> Dict[str, Any]:
+    """
+    在后台校验并修复游戏文件
+    Args:
+        repair: 是否修复不一致的文件
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    return _start_job("verify", lambda monitor: verify_game(monitor, repair))
+
+
+def start_profile_job(profile: str) -> Dict[str, Any]:
+    """
+    在后台切换安装方案
+    Args:
+        profile: 方案名称
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    return _start_job("profile", lambda monitor: switch_install_profile(monitor, profile))
+
+
+def start_maintenance_job() -> Dict[str, Any]:
+    """
+    在后台立即维护游戏仓库
+    Returns:
+        包含任务 ID 的结果字典
+    """
+    return _start_job("maintenance", maintain_game)
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    """
+    获取任务状态
+    Args:
+        job_id: 任务 ID
+    Returns:
+        任务信息字典
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return {
+            "status": "error",
+            "message": "任务不存在"
+        }
+    return {
+        "status": "ok",
+        "job": job.to_dict()
+    }
+
+
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    """
+    取消任务
+    Args:
+        job_id: 任务 ID
+    Returns:
+        操作结果字典
+    """
+    if get_job_manager().cancel(job_id):
+        return {
+            "status": "ok",
+            "message": "已请求取消任务"
+        }
+    return {
+        "status": "error",
+        "message": "任务不存在或已结束"
+    }
+
+
+def get_progress_stream(job_id: Optional[str] = None) -> Optional[Iterator[str]]:
+    """
+    获取任务进度的推送流
+    Args:
+        job_id: 任务 ID，为 None 时使用最近一个任务
+    Returns:
+        SSE 消息迭代器，任务不存在时返回 None
+    """
+    manager = get_job_manager()
+    job = manager.get(job_id) if job_id else manager.latest()
+    if job is None:
+        return None
+    fps = get_game_config().get("progress", {}).get("stream_fps", DEFAULT_STREAM_FPS)
+    return iter_progress_events(job, fps)
+
+
 def launch_game() -> Dict[str, Any]:
     """
     启动游戏
@@ -222,10 +877,13 @@ def launch_game() -> Dict[str, Any]:
         # 启动游戏
         if sys.platform == 'win32':
             # Windows平台
-            subprocess.Popen([launcher_path], cwd=game_config.get_game_path())
+            process = subprocess.Popen([launcher_path], cwd=game_config.get_game_path())
         else:
             # 其他平台，假设使用wine
-            subprocess.Popen(['wine', launcher_path], cwd=game_config.get_game_path())
+            process = subprocess.Popen(['wine', launcher_path], cwd=game_config.get_game_path())
+        
+        # 游戏运行期间后台下载降到最低速度
+        get_transfer_scheduler().set_game_process(process)
         
         return {
             "status": "ok",
@@ -260,15 +918,19 @@ def close_window():
         return {"status": "error", "message": str(e)}
 
 
-def get_game_progress() -> Dict[str, Any]:
+def get_game_progress(job_id: Optional[str] = None) -> Dict[str, Any]:
     """
     获取游戏下载或更新的进度
+    Args:
+        job_id: 任务 ID，为 None 时返回最近一个任务的进度
     Returns:
         进度信息字典
     """
     try:
         # 获取进度信息
-        progress_data = get_git_progress()
+        manager = get_job_manager()
+        job = manager.get(job_id) if job_id else manager.latest()
+        progress_data = job.progress.get_progress_data() if job else get_git_progress()
 
         # 添加状态信息
         progress_data["status"] = "ok"
@@ -7,6 +7,8 @@ import logging
 from urllib.parse import urljoin
 from typing import Dict, Optional, Tuple, Any, List
 
+from http_client import get_http_client
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,7 @@ class AuthlibInjectorClient:
         name (str): 用户名称
         base_code (str): 服务器元数据的Base64编码
         selected_profile (dict): 选择的用户配置文件
+        offline (bool): 最近一次请求是否因网络不可用而失败
     """
     
     def __init__(self, server_url: str, username: str = "", password: str = ""):
@@ -45,6 +48,7 @@ class AuthlibInjectorClient:
         self.base_code: Optional[str] = None
         self.selected_profile: Optional[Dict[str, Any]] = None
         self.error_message: Optional[str] = None
+        self.offline = False
     
     def _resolve_api_url(self, url: str) -> str:
         """解析API地址，支持ALI机制
@@ -56,13 +60,15 @@ class AuthlibInjectorClient:
             解析后的API URL
             
         Raises:
-            requests.RequestException: 请求失败时抛出
+            requests.RequestException: 服务器返回错误时抛出；网络不可用时不抛出，返回原地址
         """
+        if not url:
+            return url
         if not url.startswith("https://") and not url.startswith("http://"):
             url = "https://" + url
             
         try:
-            response = requests.get(url, allow_redirects=True, verify=False)
+            response = get_http_client().get(url, allow_redirects=True, verify=False)
             response.raise_for_status()
             
             if 'X-Authlib-Injector-API-Location' in response.headers:
@@ -71,6 +77,11 @@ class AuthlibInjectorClient:
                     new_url = urljoin(url, new_url)
                 return new_url
             return url
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # 网络不可用时直接使用原地址，不影响加载已保存的账户
+            self.offline = True
+            logger.warning(f"网络不可用，无法解析API地址: {e}")
+            return url
         except requests.RequestException as e:
             logger.error(f"解析API地址失败: {e}")
             raise
@@ -82,10 +93,18 @@ class AuthlibInjectorClient:
             bool: 获取成功返回True，否则返回False
         """
         try:
-            response = requests.get(self.server_url, verify=False)
+            response = get_http_client().get(self.server_url, verify=False)
             response.raise_for_status()
             self.base_code = base64.b64encode(response.text.encode()).decode()
             return True
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self.offline = True
+            if self.base_code:
+                logger.warning(f"网络不可用，使用已保存的皮肤站元数据: {e}")
+                return True
+            self.error_message = f"获取皮肤站元数据失败: {e}"
+            logger.error(self.error_message)
+            return False
         except requests.RequestException as e:
             self.error_message = f"获取皮肤站元数据失败: {e}"
             logger.error(self.error_message)
@@ -119,7 +138,7 @@ class AuthlibInjectorClient:
         }
 
         try:
-            response = requests.post(auth_url, data=json.dumps(payload), headers=headers, verify=False)
+            response = get_http_client().post(auth_url, data=json.dumps(payload), headers=headers, verify=False)
             response.raise_for_status()
             data = response.json()
             
@@ -162,8 +181,14 @@ class AuthlibInjectorClient:
         headers = {"Content-Type": "application/json"}
 
         try:
-            response = requests.post(validate_url, data=json.dumps(payload), headers=headers, verify=False)
+            response = get_http_client().post(validate_url, data=json.dumps(payload), headers=headers, verify=False)
+            self.offline = False
             return response.status_code == 204
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self.offline = True
+            self.error_message = f"网络不可用，无法验证令牌: {e}"
+            logger.warning(self.error_message)
+            return False
         except requests.RequestException as e:
             self.error_message = f"验证令牌失败: {e}"
             logger.error(self.error_message)
@@ -188,7 +213,7 @@ class AuthlibInjectorClient:
         headers = {"Content-Type": "application/json"}
 
         try:
-            response = requests.post(refresh_url, data=json.dumps(payload), headers=headers, verify=False)
+            response = get_http_client().post(refresh_url, data=json.dumps(payload), headers=headers, verify=False)
             response.raise_for_status()
             data = response.json()
             
@@ -225,7 +250,7 @@ class AuthlibInjectorClient:
         headers = {"Content-Type": "application/json"}
 
         try:
-            response = requests.post(signout_url, data=json.dumps(payload), headers=headers, verify=False)
+            response = get_http_client().post(signout_url, data=json.dumps(payload), headers=headers, verify=False)
             success = response.status_code == 204
             if success:
                 logger.info("用户已成功登出")
@@ -253,7 +278,7 @@ class AuthlibInjectorClient:
         headers = {"Content-Type": "application/json"}
 
         try:
-            response = requests.post(invalidate_url, data=json.dumps(payload), headers=headers, verify=False)
+            response = get_http_client().post(invalidate_url, data=json.dumps(payload), headers=headers, verify=False)
             success = response.status_code == 204
             if success:
                 logger.info("令牌已成功失效")
@@ -389,7 +414,7 @@ def load_account(file_path: str = "account_info.json") -> Optional[AuthlibInject
         file_path: 账户信息文件路径
         
     Returns:
-        Optional[AuthlibInjectorClient]: 加载成功返回客户端实例，否则返回None
+        Optional[AuthlibInjectorClient]: 加载成功返回客户端实例（离线时 offline 为 True），否则返回None
     """
     if not os.path.exists(file_path):
         logger.warning(f"账户信息文件不存在: {file_path}")
@@ -401,6 +426,10 @@ def load_account(file_path: str = "account_info.json") -> Optional[AuthlibInject
             # 验证令牌是否有效
             if client.validate():
                 return client
+            # 离线时无法验证，使用已保存的账户信息
+            if client.offline:
+                logger.warning("网络不可用，使用已保存的账户信息（离线模式）")
+                return client
             # 尝试刷新令牌
             if client.refresh():
                 client.save_account_info(file_path)  # 保存刷新后的令牌
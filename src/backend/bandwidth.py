@@ -0,0 +1,428 @@
+"""
+下载限速与优先级
+
+所有下载共用一个传输调度器：全局限速对所有下载生效，后台下载（预下载等）
+另有单独的限速，并在前台下载进行或游戏运行时自动降到最低速度，
+避免和玩家的游戏流量争抢带宽。
+
+HTTP 下载按读取的字节数直接限速；Git 的 HTTPS 下载经过本地的限速代理（CONNECT 隧道），
+由代理按读取的字节数限速，TCP 流量控制会让服务器随之降低发送速度。
+无法使用代理时（其他协议或用户已配置代理），通过暂停和恢复 git 进程限速。
+
+每次前台下载完成后记录实际速度，用于估算下次更新需要的时间。
+"""
+import json
+import logging
+import os
+import statistics
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 优先级类别
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+# 默认的后台最低速度(字节/秒)
+DEFAULT_BACKGROUND_FLOOR = 64 * 1024
+# 前台下载结束后多久恢复后台速度(秒)
+INTERACTIVE_HOLD_SECONDS = 2.0
+# 令牌桶容量对应的时长(秒)，允许的短时突发
+BURST_SECONDS = 0.5
+# 限速代理每次转发的字节数
+RELAY_CHUNK_SIZE = 16 * 1024
+# 限速代理连接服务器的超时(秒)
+RELAY_CONNECT_TIMEOUT = 30
+# 请求头的最大长度
+RELAY_MAX_HEADER = 64 * 1024
+# 下载速度记录文件，与配置文件位于同一目录
+THROUGHPUT_FILE = os.path.join(os.path.expanduser('~'), '.minemcupdater', 'throughput.json')
+# 保留的下载速度记录数
+THROUGHPUT_HISTORY_SIZE = 10
+# 少于该字节数的下载主要受延迟影响，不计入速度记录
+MIN_THROUGHPUT_SAMPLE = 256 * 1024
+
+
+class TokenBucket:
+    """线程安全的令牌桶，令牌可以透支，透支部分由调用方等待偿还"""
+
+    def __init__(self, rate: float = 0):
+        """
+        初始化令牌桶
+        Args:
+            rate: 速度(字节/秒)，0 表示不限速
+        """
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._tokens = rate * BURST_SECONDS
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate: float):
+        """
+        修改速度
+        Args:
+            rate: 速度(字节/秒)，0 表示不限速
+        """
+        with self._lock:
+            self._refill()
+            self._rate = rate
+            self._tokens = min(self._tokens, rate * BURST_SECONDS)
+
+    def _refill(self):
+        """按经过的时间补充令牌，调用方需持有锁"""
+        now = time.monotonic()
+        if self._rate:
+            self._tokens = min(self._tokens + (now - self._updated) * self._rate, self._rate * BURST_SECONDS)
+        self._updated = now
+
+    def reserve(self, amount: int) -> float:
+        """
+        取出令牌
+        Args:
+            amount: 字节数
+        Returns:
+            需要等待的秒数，不限速时为 0
+        """
+        with self._lock:
+            if not self._rate:
+                return 0.0
+            self._refill()
+            self._tokens -= amount
+            return max(-self._tokens / self._rate, 0.0)
+
+
+class TransferScheduler:
+    """传输调度器，管理全局限速和后台下载的限速"""
+
+    def __init__(self, global_limit: float = 0, background_limit: float = 0,
+                 background_floor: float = DEFAULT_BACKGROUND_FLOOR):
+        """
+        初始化传输调度器
+        Args:
+            global_limit: 全局限速(字节/秒)，0 表示不限速
+            background_limit: 后台下载限速(字节/秒)，0 表示只受全局限速
+            background_floor: 前台下载进行或游戏运行时后台下载的速度(字节/秒)
+        """
+        self._global = TokenBucket()
+        self._background = TokenBucket()
+        self._game_process: Optional[subprocess.Popen] = None
+        self._last_interactive = 0.0
+        self.configure(global_limit, background_limit, background_floor)
+
+    def configure(self, global_limit: float = 0, background_limit: float = 0,
+                  background_floor: float = DEFAULT_BACKGROUND_FLOOR):
+        """
+        修改限速设置
+        Args:
+            global_limit: 全局限速(字节/秒)，0 表示不限速
+            background_limit: 后台下载限速(字节/秒)，0 表示只受全局限速
+            background_floor: 前台下载进行或游戏运行时后台下载的速度(字节/秒)
+        """
+        self.global_limit = global_limit
+        self.background_limit = background_limit
+        self.background_floor = max(background_floor, 1)
+        self._global.set_rate(global_limit)
+
+    def set_game_process(self, process: Optional[subprocess.Popen]):
+        """
+        记录游戏进程，游戏运行期间后台下载降到最低速度
+        Args:
+            process: launch_game 启动的游戏进程
+        """
+        self._game_process = process
+
+    def game_running(self) -> bool:
+        """
+        游戏是否正在运行
+        Returns:
+            游戏进程存在且未退出时返回 True
+        """
+        process = self._game_process
+        return process is not None and process.poll() is None
+
+    def background_rate(self) -> float:
+        """
+        当前后台下载的限速
+        Returns:
+            速度(字节/秒)，0 表示只受全局限速
+        """
+        if self.game_running() or time.monotonic() - self._last_interactive < INTERACTIVE_HOLD_SECONDS:
+            return self.background_floor
+        return self.background_limit
+
+    def reserve(self, amount: int, priority: str = PRIORITY_INTERACTIVE) -> float:
+        """
+        登记已传输的字节数
+        Args:
+            amount: 字节数
+            priority: 优先级类别
+        Returns:
+            为遵守限速需要等待的秒数
+        """
+        wait = self._global.reserve(amount)
+        if priority == PRIORITY_BACKGROUND:
+            self._background.set_rate(self.background_rate())
+            wait = max(wait, self._background.reserve(amount))
+        else:
+            self._last_interactive = time.monotonic()
+        return wait
+
+    def acquire(self, amount: int, priority: str = PRIORITY_INTERACTIVE):
+        """
+        登记已传输的字节数，并等待到限速允许的时间
+        Args:
+            amount: 字节数
+            priority: 优先级类别
+        """
+        wait = self.reserve(amount, priority)
+        if wait > 0:
+            time.sleep(wait)
+
+    def is_limited(self, priority: str = PRIORITY_INTERACTIVE) -> bool:
+        """
+        该类别的下载当前是否受限速
+        Args:
+            priority: 优先级类别
+        Returns:
+            有任一限速生效时返回 True
+        """
+        return bool(self.global_limit or (priority == PRIORITY_BACKGROUND and self.background_rate()))
+
+    def get_status(self) -> Dict:
+        """
+        获取限速状态
+        Returns:
+            包含全局限速、当前后台限速和游戏是否运行的字典，速度单位为字节/秒
+        """
+        return {
+            "globalLimit": self.global_limit,
+            "backgroundLimit": self.background_rate(),
+            "gameRunning": self.game_running()
+        }
+
+
+def suspend_process(process: subprocess.Popen):
+    """暂停进程"""
+    if sys.platform == "win32":
+        import ctypes
+        ctypes.windll.ntdll.NtSuspendProcess(int(process._handle))
+    else:
+        import signal
+        os.kill(process.pid, signal.SIGSTOP)
+
+
+def resume_process(process: subprocess.Popen):
+    """恢复被暂停的进程"""
+    if sys.platform == "win32":
+        import ctypes
+        ctypes.windll.ntdll.NtResumeProcess(int(process._handle))
+    else:
+        import signal
+        os.kill(process.pid, signal.SIGCONT)
+
+
+def _relay(source: socket.socket, target: socket.socket, priority: Optional[str] = None):
+    """
+    单向转发数据直到对端关闭
+    Args:
+        source: 读取的连接
+        target: 写入的连接
+        priority: 优先级类别，为 None 时不限速
+    """
+    scheduler = get_transfer_scheduler()
+    try:
+        while True:
+            data = source.recv(RELAY_CHUNK_SIZE)
+            if not data:
+                break
+            if priority is not None:
+                scheduler.acquire(len(data), priority)
+            target.sendall(data)
+    except OSError:
+        pass
+    finally:
+        try:
+            target.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+class _ShapingProxyHandler(socketserver.BaseRequestHandler):
+    """限速代理的连接处理器，只支持 HTTPS 使用的 CONNECT 隧道"""
+
+    def _read_head(self) -> bytes:
+        """读取到请求头结束，返回已读取的全部数据"""
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = self.request.recv(RELAY_CHUNK_SIZE)
+            if not chunk or len(data) > RELAY_MAX_HEADER:
+                return b""
+            data += chunk
+        return data
+
+    def handle(self):
+        data = self._read_head()
+        if not data:
+            return
+        method, target = (data.split(b"\r\n", 1)[0].split(b" ") + [b""])[:2]
+        if method != b"CONNECT":
+            self.request.sendall(b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n")
+            return
+        try:
+            host, _, port = target.decode().rpartition(":")
+            upstream = socket.create_connection((host.strip("[]"), int(port)), RELAY_CONNECT_TIMEOUT)
+        except (OSError, ValueError) as e:
+            logger.info(f"限速代理连接失败: {e}")
+            self.request.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            return
+        self.request.sendall(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+        data = data.split(b"\r\n\r\n", 1)[1]
+
+        with upstream:
+            upstream.settimeout(None)
+            if data:
+                upstream.sendall(data)
+            uplink = threading.Thread(target=_relay, args=(self.request, upstream), daemon=True)
+            uplink.start()
+            _relay(upstream, self.request, self.server.priority)
+            uplink.join()
+
+
+class _ShapingProxyServer(socketserver.ThreadingTCPServer):
+    """只监听本机地址的限速代理"""
+
+    daemon_threads = True
+
+    def __init__(self, priority: str):
+        super().__init__(("127.0.0.1", 0), _ShapingProxyHandler)
+        self.priority = priority
+
+
+class ThroughputHistory:
+    """
+    最近几次下载的实际速度，持久化到文件
+
+    速度按整个下载操作（包括连接、解析和写入）计算，反映玩家实际等待的时间。
+    """
+
+    def __init__(self, path: str = THROUGHPUT_FILE):
+        """
+        初始化下载速度记录
+        Args:
+            path: 记录文件路径
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._samples: List[Dict] = self._load()
+
+    def _load(self) -> List[Dict]:
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def record(self, received_bytes: float, seconds: float):
+        """
+        记录一次下载，太小的下载不计入
+        Args:
+            received_bytes: 下载的字节数
+            seconds: 耗时(秒)
+        """
+        if received_bytes < MIN_THROUGHPUT_SAMPLE or seconds <= 0:
+            return
+        with self._lock:
+            self._samples = ([{"bytes": int(received_bytes), "seconds": round(seconds, 3), "at": time.time()}]
+                             + self._samples)[:THROUGHPUT_HISTORY_SIZE]
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                with open(self._path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump(self._samples, f)
+                os.replace(self._path + ".tmp", self._path)
+            except OSError as e:
+                logger.error(f"保存下载速度记录失败: {e}")
+
+    def throughput(self) -> Optional[float]:
+        """
+        最近几次下载速度的中位数
+        Returns:
+            速度(字节/秒)，没有记录时返回 None
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return None
+        return statistics.median(sample["bytes"] / sample["seconds"] for sample in samples)
+
+    def estimate_seconds(self, total_bytes: float) -> Optional[float]:
+        """
+        按下载速度记录和当前的全局限速估算下载时间
+        Args:
+            total_bytes: 需要下载的字节数
+        Returns:
+            预计耗时(秒)，没有速度记录时返回 None
+        """
+        rate = self.throughput()
+        limit = get_transfer_scheduler().global_limit
+        if limit:
+            rate = min(rate, limit) if rate else None
+        if not rate:
+            return None
+        return total_bytes / rate
+
+
+# 全局传输调度器实例
+_transfer_scheduler = None
+# 全局下载速度记录实例
+_throughput_history = None
+# 各优先级类别的限速代理
+_shaping_proxies: Dict[str, _ShapingProxyServer] = {}
+_shaping_proxies_lock = threading.Lock()
+
+
+def get_transfer_scheduler() -> TransferScheduler:
+    """
+    获取传输调度器实例（单例模式）
+    Returns:
+        传输调度器实例
+    """
+    global _transfer_scheduler
+    if _transfer_scheduler is None:
+        _transfer_scheduler = TransferScheduler()
+    return _transfer_scheduler
+
+
+def get_throughput_history() -> ThroughputHistory:
+    """
+    获取下载速度记录实例（单例模式）
+    Returns:
+        下载速度记录实例
+    """
+    global _throughput_history
+    if _throughput_history is None:
+        _throughput_history = ThroughputHistory()
+    return _throughput_history
+
+
+def get_shaping_proxy(priority: str = PRIORITY_INTERACTIVE) -> str:
+    """
+    获取该优先级类别的限速代理地址，首次调用时启动代理
+    Args:
+        priority: 优先级类别
+    Returns:
+        代理地址，如 http://127.0.0.1:12345
+    """
+    with _shaping_proxies_lock:
+        server = _shaping_proxies.get(priority)
+        if server is None:
+            server = _ShapingProxyServer(priority)
+            threading.Thread(target=server.serve_forever, name=f"shaping-proxy-{priority}", daemon=True).start()
+            _shaping_proxies[priority] = server
+    return f"http://127.0.0.1:{server.server_address[1]}"
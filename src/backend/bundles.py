@@ -0,0 +1,244 @@
+"""
+静态 Git 增量包
+
+通过智能 HTTP 协议更新时，服务器要为每个客户端协商并计算要发送的对象，新版本发布后大量玩家同时更新，
+Git 服务器很容易成为瓶颈。发布端可以在每次发布时预先生成从上一版本到新版本的增量包（git bundle），
+和索引一起放在普通的静态服务器或 CDN 上；客户端按索引找到从本地版本到最新版本的增量包链，
+依次下载并导入，不需要连接 Git 服务器。本地版本不在链上（如跳过的版本已被清理）时改用普通下载。
+
+服务器目录结构:
+    bundles.json                        索引：分支、最新提交和各增量包
+    <旧提交前 12 位>-<新提交前 12 位>.bundle
+
+生成增量包（每次发布后运行，第一次运行只记录当前版本）:
+    python bundles.py <仓库目录> <输出目录> [分支] [版本号]
+"""
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from http_client import get_http_client
+
+# 索引文件名
+BUNDLE_INDEX = "bundles.json"
+# 索引格式版本
+BUNDLE_FORMAT = 1
+# 索引中保留的增量包数，更旧版本的客户端改用普通下载
+DEFAULT_KEEP_BUNDLES = 10
+# 请求超时(秒)
+REQUEST_TIMEOUT = 30
+# 下载和读取文件的块大小
+CHUNK_SIZE = 256 * 1024
+# 索引中的提交、增量包文件名和哈希
+_COMMIT_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+_BUNDLE_FILE_PATTERN = re.compile(r"^[0-9a-f]{12}-[0-9a-f]{12}\.bundle$")
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _sha256_file(path: str) -> str:
+    """计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_index(path: str) -> Optional[Dict]:
+    """读取索引文件，不存在或损坏时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish_bundle(repo_path: str, output_dir: str, branch: str = "main", version: str = "",
+                   keep: int = DEFAULT_KEEP_BUNDLES) -> Dict:
+    """
+    为分支的当前版本生成从上次发布的版本开始的增量包，并更新索引
+
+    Args:
+        repo_path: 发布端仓库（可以是裸仓库），需包含上次发布的提交
+        output_dir: 输出目录，可直接作为静态服务器的根目录
+        branch: 分支
+        version: 版本号，写入索引
+        keep: 保留的增量包数，更早的增量包会被删除
+    Returns:
+        更新后的索引
+    """
+    head = subprocess.run(["git", "rev-parse", "--verify", f"refs/heads/{branch}^{{commit}}"], cwd=repo_path,
+                          check=True, capture_output=True, text=True).stdout.strip()
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, BUNDLE_INDEX)
+    index = _load_index(index_path) or {}
+    if index.get("branch") != branch:
+        index = {"format": BUNDLE_FORMAT, "branch": branch, "head": "", "bundles": []}
+    previous = index["head"]
+    if previous == head:
+        return index
+
+    if previous:
+        name = f"{previous[:12]}-{head[:12]}.bundle"
+        path = os.path.join(output_dir, name)
+        # 增量包以上次发布的提交为前提，只包含新版本相对它新增的对象
+        subprocess.run(["git", "bundle", "create", "-q", path + ".tmp", f"{previous}..refs/heads/{branch}"],
+                       cwd=repo_path, check=True, capture_output=True)
+        os.replace(path + ".tmp", path)
+        index["bundles"].append({"from": previous, "to": head, "file": name, "version": version,
+                                 "bytes": os.path.getsize(path), "sha256": _sha256_file(path)})
+        for entry in index["bundles"][:-keep]:
+            try:
+                os.remove(os.path.join(output_dir, entry["file"]))
+            except OSError:
+                pass
+        index["bundles"] = index["bundles"][-keep:]
+    index.update(head=head, version=version, updated=time.time())
+
+    with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(index_path + ".tmp", index_path)
+    return index
+
+
+def _check_bundle_file(name) -> str:
+    """
+    检查增量包文件名，文件名会拼接到本地保存路径和下载地址中
+    Raises:
+        RuntimeError: 文件名不是 <旧提交前 12 位>-<新提交前 12 位>.bundle
+    """
+    if not isinstance(name, str) or os.path.basename(name) != name or not _BUNDLE_FILE_PATTERN.match(name):
+        raise RuntimeError(f"增量包文件名无效: {name!r}")
+    return name
+
+
+def validate_bundle_index(index) -> Dict:
+    """
+    检查增量包索引的格式和其中的提交、文件名、哈希和大小
+    Returns:
+        索引本身
+    Raises:
+        RuntimeError: 索引无效
+    """
+    if not isinstance(index, dict) or index.get("format") != BUNDLE_FORMAT:
+        raise RuntimeError(f"不支持的增量包索引格式: {index.get('format') if isinstance(index, dict) else None}")
+    head = index.get("head")
+    if not isinstance(index.get("branch"), str) or not isinstance(head, str) \
+            or head and not _COMMIT_PATTERN.match(head):
+        raise RuntimeError("增量包索引的分支或最新提交无效")
+    bundles = index.get("bundles")
+    if not isinstance(bundles, list):
+        raise RuntimeError("增量包索引的增量包列表无效")
+    for entry in bundles:
+        if not isinstance(entry, dict):
+            raise RuntimeError("增量包索引的条目无效")
+        for key in ("from", "to"):
+            if not isinstance(entry.get(key), str) or not _COMMIT_PATTERN.match(entry[key]):
+                raise RuntimeError(f"增量包的提交无效: {entry.get(key)!r}")
+        name = _check_bundle_file(entry.get("file"))
+        if name != f"{entry['from'][:12]}-{entry['to'][:12]}.bundle":
+            raise RuntimeError(f"增量包文件名与提交不符: {name}")
+        if not isinstance(entry.get("sha256"), str) or not _SHA256_PATTERN.match(entry["sha256"]):
+            raise RuntimeError(f"增量包 {name} 的哈希无效")
+        size = entry.get("bytes")
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise RuntimeError(f"增量包 {name} 的大小无效")
+    return index
+
+
+def fetch_bundle_index(url: str, session: Optional[requests.Session] = None) -> Dict:
+    """
+    下载增量包索引，通过共享的 HTTP 客户端缓存，索引未变化时服务器只返回 304
+
+    Raises:
+        RuntimeError: 索引格式不正确，或其中的提交、文件名、哈希无效
+    """
+    if session is None:
+        response = get_http_client().get_cached(url, timeout=REQUEST_TIMEOUT)
+    else:
+        response = session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return validate_bundle_index(response.json())
+
+
+def plan_bundle_chain(index: Dict, current: str) -> Optional[List[Dict]]:
+    """
+    找出从本地版本到索引中最新版本的增量包链
+
+    Args:
+        index: 增量包索引
+        current: 本地版本的提交
+    Returns:
+        按顺序导入的增量包，已是最新版本时为空列表；本地版本不在链上时返回 None
+    """
+    by_start = {entry["from"]: entry for entry in index.get("bundles", [])}
+    chain = []
+    commit = current
+    while commit != index.get("head"):
+        entry = by_start.get(commit)
+        if entry is None or len(chain) > len(by_start):
+            return None
+        chain.append(entry)
+        commit = entry["to"]
+    return chain
+
+
+def download_bundle(url: str, entry: Dict, path: str, on_read: Callable[[int], None],
+                    session: Optional[requests.Session] = None):
+    """
+    下载增量包并校验，支持断点续传
+
+    Args:
+        url: 增量包地址
+        entry: 索引中的增量包信息
+        path: 保存路径，下载中的内容保存在 path + ".part"
+        on_read: 每下载一段数据后调用，参数为字节数（续传时先以已下载的字节数调用一次），
+            可以在其中更新进度、限速或抛出异常中止下载
+    Raises:
+        RuntimeError: 文件名无效或校验不通过
+    """
+    _check_bundle_file(entry["file"])
+    if os.path.exists(path) and _sha256_file(path) == entry["sha256"]:
+        on_read(entry["bytes"])
+        return
+    part = path + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if 0 < offset < entry["bytes"] else {}
+    with (session or get_http_client().session).get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 206:
+            mode = "ab"
+            on_read(offset)
+        elif response.status_code == 416:
+            mode = None
+            on_read(offset)
+        else:
+            response.raise_for_status()
+            # 服务器不支持 Range，从头下载
+            mode = "wb"
+        if mode:
+            with open(part, mode) as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    on_read(len(chunk))
+                    f.write(chunk)
+    if _sha256_file(part) != entry["sha256"]:
+        os.remove(part)
+        raise RuntimeError(f"增量包 {entry['file']} 校验失败")
+    os.replace(part, path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法: python bundles.py <仓库目录> <输出目录> [分支] [版本号]")
+        sys.exit(1)
+    result = publish_bundle(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "main",
+                            sys.argv[4] if len(sys.argv) > 4 else "")
+    latest = result["bundles"][-1] if result["bundles"] else None
+    print(f"当前版本 {result['head'][:8]}，共 {len(result['bundles'])} 个增量包" +
+          (f"，最新 {latest['file']}（{latest['bytes']} 字节）" if latest else ""))
@@ -0,0 +1,142 @@
+"""
+大文件的内容定义分块存储
+
+大型 jar 和资源包每个新版本都是一个新文件，但内容大多与旧版本相同。
+这里用 Gear 滚动哈希按内容切分文件（FastCDC 的规范化分块），插入或删除内容只影响附近的块，
+其余块的边界和哈希保持不变。块按 SHA-256 存放，不同版本、不同文件中相同的块只保存一份，
+更新时客户端只需下载新出现的块，其余块从已安装的旧文件中读取。
+
+存储目录结构:
+    <根目录>/<哈希前两位>/<哈希>    块内容
+"""
+import hashlib
+import os
+import random
+from typing import BinaryIO, Iterator, List, Tuple
+
+# 块大小的下限、目标平均值和上限(字节)
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+# 不小于该大小的文件才分块存储(字节)
+CHUNK_THRESHOLD = 1024 * 1024
+# 读取文件的块大小
+READ_SIZE = 4 * 1024 * 1024
+
+# Gear 哈希表，固定种子保证发布端每次切分结果相同
+_GEAR_RANDOM = random.Random(0x4D696E65)
+_GEAR = [_GEAR_RANDOM.getrandbits(64) for _ in range(256)]
+_HASH_MASK = (1 << 64) - 1
+# 规范化分块：未到平均大小时用更严格的掩码，超过后用更宽松的掩码，使块大小集中在平均值附近
+_MASK_SMALL = ((1 << (AVG_CHUNK_SIZE.bit_length() + 1)) - 1) << (64 - AVG_CHUNK_SIZE.bit_length() - 1)
+_MASK_LARGE = ((1 << (AVG_CHUNK_SIZE.bit_length() - 3)) - 1) << (64 - AVG_CHUNK_SIZE.bit_length() + 3)
+
+
+def _find_boundary(data: bytes, start: int, end: int) -> int:
+    """
+    在 data[start:end] 中找下一个块边界
+
+    Returns:
+        块的结束位置；数据不足一个最大块且没有找到边界时返回 -1
+    """
+    length = end - start
+    if length <= MIN_CHUNK_SIZE:
+        return -1
+    limit = min(length, MAX_CHUNK_SIZE)
+    normal = min(AVG_CHUNK_SIZE, limit)
+    gear = _GEAR
+    mask_small, mask_large, hash_mask = _MASK_SMALL, _MASK_LARGE, _HASH_MASK
+
+    # 小于最小块的部分不计算哈希
+    h = 0
+    i = start + MIN_CHUNK_SIZE
+    stop = start + normal
+    while i < stop:
+        h = ((h << 1) + gear[data[i]]) & hash_mask
+        if not h & mask_small:
+            return i + 1
+        i += 1
+    stop = start + limit
+    while i < stop:
+        h = ((h << 1) + gear[data[i]]) & hash_mask
+        if not h & mask_large:
+            return i + 1
+        i += 1
+    return start + limit if limit == MAX_CHUNK_SIZE else -1
+
+
+def iter_chunks(stream: BinaryIO) -> Iterator[bytes]:
+    """
+    按内容切分数据流
+
+    Args:
+        stream: 以二进制方式打开的文件
+    Yields:
+        依次切出的块
+    """
+    buffer = b""
+    position = 0
+    eof = False
+    while True:
+        boundary = _find_boundary(buffer, position, len(buffer))
+        if boundary < 0:
+            if eof:
+                if position < len(buffer):
+                    yield buffer[position:]
+                return
+            data = stream.read(READ_SIZE)
+            eof = not data
+            buffer = buffer[position:] + data
+            position = 0
+            continue
+        yield buffer[position:boundary]
+        position = boundary
+
+
+class ChunkStore:
+    """
+    按哈希存放块的目录
+
+    Attributes:
+        root (str): 存储目录
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        """块的存放路径"""
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def has(self, sha256: str) -> bool:
+        """块是否已存在"""
+        return os.path.exists(self.path(sha256))
+
+    def put(self, data: bytes) -> str:
+        """
+        保存块，已存在时不重复写入
+        Returns:
+            块的 SHA-256
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        target = self.path(sha256)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(target + ".tmp", target)
+        return sha256
+
+    def get(self, sha256: str) -> bytes:
+        """读取块"""
+        with open(self.path(sha256), "rb") as f:
+            return f.read()
+
+    def add_file(self, path: str) -> List[Tuple[str, int]]:
+        """
+        切分文件并保存其中的块
+        Returns:
+            依次排列的 (块哈希, 块大小)
+        """
+        with open(path, "rb") as f:
+            return [(self.put(chunk), len(chunk)) for chunk in iter_chunks(f)]
@@ -1,20 +1,44 @@
+import atexit
+import copy
 import os
 import json
 import logging
-import requests
-from typing import Dict, Any, Optional, Tuple
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from git_handler import has_interrupted_update
+from http_client import get_http_client
+from manifest_updater import has_interrupted_manifest_update
+from mirrors import (DEFAULT_RANKING_TTL, MIRROR_REPO, MIRROR_VERSION, get_mirror_selector,
+                     git_probe_url)
+from version_manifest import changed_components, component_ids, is_newer_version, parse_version_manifest
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 修改配置后延迟写入的秒数，期间的修改合并为一次写入
+SAVE_DELAY = 0.5
+# 远程版本号的缓存时间(秒)，检查更新后紧接着的安装和更新不再重复请求
+VERSION_CACHE_TTL = 60
+# 获取远程版本号的超时(秒)：连接超时和读取超时，网络不可用时尽快使用缓存的版本信息
+VERSION_TIMEOUT = (2, 10)
+
 class Config:
-    """配置管理基类"""
-    
-    def __init__(self, config_path=None):
+    """
+    配置管理基类
+
+    配置保存在内存中的快照里，读取时直接返回当前快照中的值，不加锁；
+    修改时复制快照并整体替换，正在读取旧快照的线程不受影响。
+    修改后不立即写文件，而是在 save_delay 秒后把这段时间内的所有修改一次写入，
+    写入时先写临时文件再原子地替换，进程在写入途中退出也不会留下损坏的配置文件。
+    """
+
+    def __init__(self, config_path=None, save_delay: float = SAVE_DELAY):
         """
         初始化配置管理器
         Args:
             config_path: 配置文件路径，为None时使用默认路径
+            save_delay: 修改后延迟写入的秒数，0 表示每次修改立即写入
         """
         # 确定配置文件路径
         if config_path is None:
@@ -25,10 +49,27 @@ class Config:
             self.config_path = os.path.join(config_dir, 'config.json')
         else:
             self.config_path = config_path
-        
+
+        self.save_delay = save_delay
+        # 修改快照时持有，写文件时持有另一把锁，写文件期间仍可修改
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # 等待写入的定时器，以及快照自上次写入后是否有修改
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
+        # 写入文件的次数
+        self.save_count = 0
+
         # 加载配置
-        self.config = self.load_config()
-    
+        self._snapshot: Dict[str, Any] = self.load_config()
+        # 进程正常退出时写入尚未保存的修改
+        atexit.register(self.flush)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """当前配置的快照，不要直接修改，修改请使用 set"""
+        return self._snapshot
+
     def load_config(self):
         """
         加载配置文件
@@ -47,22 +88,64 @@ class Config:
         else:
             logger.info("配置文件不存在，使用默认配置")
             return self.get_default_config()
-    
+
     def save_config(self):
         """
-        保存配置到文件
+        立即保存配置到文件，并取消等待中的延迟写入
         Returns:
             保存是否成功
         """
-        try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
-            logger.info(f"配置已保存到 {self.config_path}")
-            return True
-        except Exception as e:
-            logger.error(f"保存配置失败: {e}")
-            return False
-    
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self._dirty = False
+        return self._write()
+
+    def flush(self):
+        """
+        有尚未写入的修改时立即写入
+        Returns:
+            保存是否成功，没有需要写入的修改时返回True
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+        return self.save_config()
+
+    def _write(self) -> bool:
+        """
+        将当前快照原子地写入配置文件：先写临时文件并刷到磁盘，再替换原文件。
+        在写入锁内读取快照，并发写入时后写入的总是较新的快照。
+        """
+        with self._save_lock:
+            snapshot = self._snapshot
+            temp_path = self.config_path + ".tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, indent=4, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.config_path)
+                self.save_count += 1
+                logger.info(f"配置已保存到 {self.config_path}")
+                return True
+            except Exception as e:
+                logger.error(f"保存配置失败: {e}")
+                with self._lock:
+                    # 写入失败时保留修改标记，下次修改或退出时再写
+                    self._dirty = True
+                return False
+
+    def _scheduled_save(self):
+        """延迟写入的定时器回调"""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self._write()
+
     def get_default_config(self):
         """
         获取默认配置
@@ -71,27 +154,43 @@ class Config:
         """
         # 子类应覆盖此方法
         return {}
-    
+
     def get(self, key, default=None):
         """
-        获取配置项
+        获取配置项，返回的值属于共享的快照，不要直接修改
         Args:
             key: 配置键
             default: 默认值
         Returns:
             配置值
         """
-        return self.config.get(key, default)
-    
-    def set(self, key, value):
+        return self._snapshot.get(key, default)
+
+    def set(self, key, value, flush: bool = False):
         """
-        设置配置项
+        设置配置项，短时间内的多次修改合并为一次写入
         Args:
             key: 配置键
-            value: 配置值
+            value: 配置值，会被复制，之后修改传入的对象不影响配置
+            flush: 是否立即写入文件，用于需要确保持久化的修改
+        Returns:
+            flush 为True或不延迟写入时返回保存是否成功，否则返回True
         """
-        self.config[key] = value
-        return self.save_config()
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            snapshot[key] = copy.deepcopy(value)
+            self._snapshot = snapshot
+            self._dirty = True
+            if flush or self.save_delay <= 0:
+                immediate = True
+            else:
+                immediate = False
+                # 定时器不随每次修改重新计时，持续修改时最多延迟 save_delay 秒写入
+                if self._save_timer is None:
+                    self._save_timer = threading.Timer(self.save_delay, self._scheduled_save)
+                    self._save_timer.daemon = True
+                    self._save_timer.start()
+        return self.save_config() if immediate else True
 
 
 class GameConfig(Config):
@@ -100,6 +199,8 @@ class GameConfig(Config):
     VERSION_URL = "https://gitee.com/canfeng_plaeir/mc/raw/main/version.txt"
     GIT_REPO_URL = "https://gitee.com/canfeng_plaeir/mc"
     GIT_BRANCH = "main"
+    GIT_CLONE_DEPTH = 1
+    GIT_KEEP_VERSIONS = 3
     
     def __init__(self, config_path=None):
         """
@@ -132,6 +233,97 @@ class GameConfig(Config):
             "git": {
                 "repo_url": self.GIT_REPO_URL,
                 "branch": self.GIT_BRANCH,
+                # 首次安装使用浅克隆，0 表示下载完整历史
+                "clone_depth": self.GIT_CLONE_DEPTH,
+                # 首次下载提交和目录树时的过滤器，为空表示 "blob:none"（文件内容随后分批续传）
+                "clone_filter": "",
+                # 更新后保留的历史版本数，用于快速回滚
+                "keep_versions": self.GIT_KEEP_VERSIONS,
+                # 仓库操作后端：gitpython 或 cli（直接调用 git 命令行）
+                "engine": "gitpython",
+                # 首次安装时先下载的快照（.tar.zst、.tar.gz 或 .tar，见 snapshot.py），为空表示直接从仓库下载
+                "snapshot_url": "",
+                # 增量包索引 bundles.json 的地址（见 bundles.py），更新时优先从静态服务器下载，为空表示直接从仓库下载
+                "bundle_url": "",
+                # 同时下载的子模块数
+                "submodule_jobs": 4,
+            },
+            "install": {
+                # 当前安装方案，对应 profiles 中的名称
+                "profile": "full",
+                # 各安装方案的稀疏检出规则（gitignore 格式，路径相对于游戏目录），为空表示安装全部文件
+                "profiles": {
+                    "full": [],
+                    "client": ["/*", "!/server/"],
+                    "lite": ["/*", "!/server/", "!/.minecraft/shaderpacks/", "!/.minecraft/resourcepacks/"],
+                    "server": ["/*", "!/.minecraft/shaderpacks/", "!/.minecraft/resourcepacks/"],
+                },
+            },
+            "mirrors": {
+                # 仓库镜像地址，与 git.repo_url 一起测速，使用最快的
+                "repo_urls": [],
+                # 版本文件镜像地址，与内置地址一起测速；可以是 version.txt 或 version.json（版本清单）
+                "version_urls": [],
+                # 测速结果的有效期(秒)
+                "ttl": DEFAULT_RANKING_TTL,
+                # 下载超过该秒数没有进度时切换到下一个镜像
+                "stall_timeout": 60,
+            },
+            "bandwidth": {
+                # 全局下载限速(KB/s)，0 表示不限速
+                "limit_kbps": 0,
+                # 后台下载（预下载等）限速(KB/s)，0 表示只受全局限速
+                "background_kbps": 0,
+                # 前台下载进行或游戏运行时后台下载的速度(KB/s)
+                "background_floor_kbps": 64,
+            },
+            "update": {
+                # 更新方式：git 或 manifest（按文件清单通过 HTTP 下载变化的文件）
+                "engine": "git",
+                # 文件清单地址，文件内容位于同目录的 objects/ 下
+                "manifest_url": "",
+                # 按文件清单更新时的并发下载数
+                "download_workers": 4,
+                # 检查版本时是否估算更新的下载大小和时间
+                "estimate": True,
+            },
+            "jobs": {
+                # 同时运行的后台任务数
+                "max_workers": 2,
+            },
+            "progress": {
+                # 进度推送的最大帧率（每秒推送次数）
+                "stream_fps": 10,
+            },
+            "server": {
+                # 调试模式：使用 pywebview 自带的服务器并打开 Flask 调试和开发者工具（见 serving.py）
+                "debug": False,
+                # 界面服务处理请求的工作线程数
+                "workers": 8,
+            },
+            "verify": {
+                # 校验文件时计算哈希的线程数，0 表示按 CPU 核数
+                "workers": 0,
+            },
+            "prefetch": {
+                # 是否在后台预下载新版本
+                "enabled": True,
+                # 检查间隔(秒)
+                "interval": 1800,
+                # 失败后的首次重试间隔(秒)
+                "retry_delay": 60,
+            },
+            "maintenance": {
+                # 是否在空闲时自动维护仓库
+                "enabled": True,
+                # 检查间隔(秒)
+                "interval": 3600,
+                # 松散对象超过该数量时打包
+                "loose_objects_limit": 500,
+                # 对象包超过该数量时合并
+                "packs_limit": 10,
+                # 完整维护(gc)的间隔(天)
+                "full_interval_days": 7,
             }
         }
     
@@ -143,16 +335,18 @@ class GameConfig(Config):
         """
         return self.get("version", {}).get("current_version", "0.0.0")
     
-    def set_current_version(self, version):
+    def set_current_version(self, version, remote: Optional[Dict] = None):
         """
         设置当前游戏版本
         Args:
             version: 版本号
+            remote: 安装的远程版本信息，记录其中的组件标识供下次比较；为 None 时清除组件标识
         """
-        version_config = self.get("version", {})
+        version_config = dict(self.get("version", {}))
         version_config["current_version"] = version
-        self.set("version", version_config)
-        return self.save_config()
+        version_config["components"] = component_ids(remote) if remote else None
+        # 版本号决定下次是否需要更新，立即写入
+        return self.set("version", version_config, flush=True)
     
     def get_game_path(self):
         """
@@ -176,10 +370,20 @@ class GameConfig(Config):
         """
         检查游戏是否存在
         Returns:
-            游戏是否存在
+            游戏是否存在，上次版本切换中断（文件可能不完整）时返回False
         """
         launcher_path = self.get_launcher_path()
-        return os.path.exists(launcher_path)
+        game_path = self.get_game_path()
+        return os.path.exists(launcher_path) and not self.update_interrupted()
+    
+    def update_interrupted(self):
+        """
+        检查上次更新是否中断
+        Returns:
+            上次版本切换或文件替换未完成（游戏文件可能不完整）时返回True，再次更新或克隆时会先恢复
+        """
+        game_path = self.get_game_path()
+        return has_interrupted_update(game_path) or has_interrupted_manifest_update(game_path)
     
     def get_git_config(self):
         """
@@ -189,28 +393,125 @@ class GameConfig(Config):
         """
         return self.get("git", {})
     
+    def get_install_profiles(self):
+        """
+        获取安装方案
+        Returns:
+            方案名称到稀疏检出规则的字典
+        """
+        return self.get("install", {}).get("profiles", {"full": []})
+    
+    def get_install_profile(self):
+        """
+        获取当前安装方案的名称
+        Returns:
+            方案名称
+        """
+        return self.get("install", {}).get("profile", "full")
+    
+    def set_install_profile(self, profile):
+        """
+        设置当前安装方案
+        Args:
+            profile: 方案名称，需在 profiles 中定义
+        """
+        if profile not in self.get_install_profiles():
+            raise ValueError(f"未定义的安装方案: {profile}")
+        install_config = dict(self.get("install", {}))
+        install_config["profile"] = profile
+        return self.set("install", install_config)
+    
+    def get_sparse_paths(self):
+        """
+        获取当前安装方案的稀疏检出规则
+        Returns:
+            规则列表，为空表示安装全部文件
+        """
+        return self.get_install_profiles().get(self.get_install_profile(), [])
+    
+    def _mirror_urls(self, primary: str, key: str) -> list:
+        """
+        主地址与配置的镜像地址，去重后保持顺序
+        Args:
+            primary: 主地址
+            key: mirrors 配置中的镜像列表键名
+        Returns:
+            地址列表
+        """
+        urls = [primary] + self.get("mirrors", {}).get(key, [])
+        return list(dict.fromkeys(url for url in urls if url))
+
+    def get_repo_urls(self, probe: bool = True) -> list:
+        """
+        获取按速度排序的仓库地址
+        Args:
+            probe: 排序过期时是否重新测速，为False时直接使用上次的排序（不访问网络）
+        Returns:
+            由快到慢排列的仓库地址
+        """
+        urls = self._mirror_urls(self.get_git_config().get("repo_url", self.GIT_REPO_URL), "repo_urls")
+        if not probe:
+            return get_mirror_selector().cached_ranking(MIRROR_REPO, urls)
+        ttl = self.get("mirrors", {}).get("ttl", DEFAULT_RANKING_TTL)
+        return get_mirror_selector().rank(MIRROR_REPO, urls, ttl, git_probe_url)
+
+    def get_version_urls(self) -> list:
+        """
+        获取按速度排序的版本文件地址
+        Returns:
+            由快到慢排列的版本文件地址
+        """
+        urls = self._mirror_urls(self.VERSION_URL, "version_urls")
+        ttl = self.get("mirrors", {}).get("ttl", DEFAULT_RANKING_TTL)
+        return get_mirror_selector().rank(MIRROR_VERSION, urls, ttl)
+
+    def get_remote_version(self) -> Optional[Dict]:
+        """
+        获取远程版本信息（version.json 版本清单或 version.txt），当前镜像失败时依次尝试其他镜像
+        Returns:
+            包含 version、commit 和 components 的字典，见 version_manifest.parse_version_manifest；
+            网络不可用时返回上次缓存的版本信息，没有缓存且所有镜像都失败时返回 None
+        """
+        client = get_http_client()
+        urls = self.get_version_urls()
+        remote = None
+        for url in urls:
+            try:
+                # 获取远程版本信息，缓存过期后用条件请求验证
+                response = client.get_cached(url, ttl=VERSION_CACHE_TTL, timeout=VERSION_TIMEOUT)
+                if response.status_code == 200:
+                    remote = parse_version_manifest(response.text)
+                    break
+                else:
+                    logger.error(f"获取远程版本失败，HTTP状态码: {response.status_code}")
+            except Exception as e:
+                logger.error(f"检查远程版本失败: {e}")
+            get_mirror_selector().report_failure(MIRROR_VERSION, url)
+        # 只按版本文件所在的主机判断是否离线
+        client.update_connectivity(urls)
+        return remote
+
     def check_remote_version(self) -> Tuple[bool, str, str]:
         """
-        检查远程版本
+        检查远程版本，按语义化版本比较，远程版本比当前版本新时需要更新
         Returns:
             (是否需要更新, 远程版本, 当前版本)
         """
-        try:
-            # 获取远程版本信息
-            response = requests.get(self.VERSION_URL, timeout=10)
-            if response.status_code == 200:
-                remote_version = response.text.strip()
-                current_version = self.get_current_version()
-                
-                # 比较版本
-                needs_update = remote_version != current_version
-                return needs_update, remote_version, current_version
-            else:
-                logger.error(f"获取远程版本失败，HTTP状态码: {response.status_code}")
-                return False, "", self.get_current_version()
-        except Exception as e:
-            logger.error(f"检查远程版本失败: {e}")
-            return False, "", self.get_current_version()
+        current_version = self.get_current_version()
+        remote = self.get_remote_version()
+        if remote is None:
+            return False, "", current_version
+        return is_newer_version(remote["version"], current_version), remote["version"], current_version
+
+    def get_changed_components(self, remote: Dict) -> Optional[List[str]]:
+        """
+        与已安装版本比较，得到远程版本中变化的组件
+        Args:
+            remote: get_remote_version 的结果
+        Returns:
+            变化的组件，无法判断（远程只有版本号，或本地没有记录组件标识）时返回 None
+        """
+        return changed_components(remote, self.get("version", {}).get("components"))
 
 
 # 全局配置实例
@@ -0,0 +1,304 @@
+"""
+直接调用 git 命令行的仓库后端
+
+GitPython 的 Repo 在打开仓库时会建立对象数据库、配置解析器等，调用命令时还要经过一层参数和输出处理。
+启动器对仓库的操作几乎都是直接运行 git 命令，这里只实现 git_handler 用到的那部分 Repo 接口，
+每个操作直接启动 git 进程。命令参数、输出和异常与 GitPython 后端保持一致，调用方无需区分后端；
+下载进度仍由 git_handler 读取 git 的 --progress 输出解析。
+"""
+import os
+import subprocess
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+# 与 GitPython 使用同一个 git 可执行文件
+GIT_EXECUTABLE = os.environ.get("GIT_PYTHON_GIT_EXECUTABLE", "git")
+# Windows 上不为 git 进程弹出控制台窗口
+_CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+
+
+def _transform_kwargs(kwargs: Dict) -> List[str]:
+    """
+    将关键字参数转换为命令行选项，规则与 GitPython 相同：
+    单字母参数转为 "-k value"，其余转为 "--key-name=value"，True 表示不带值的开关，False 和 None 忽略
+    """
+    args = []
+    for key, values in kwargs.items():
+        for value in values if isinstance(values, (list, tuple)) else [values]:
+            if value is None or value is False:
+                continue
+            if len(key) == 1:
+                args += [f"-{key}"] if value is True else [f"-{key}", str(value)]
+            else:
+                option = "--" + key.replace("_", "-")
+                args.append(option if value is True else f"{option}={value}")
+    return args
+
+
+class CliProcess:
+    """
+    以 as_process 方式启动的 git 进程，接口与 GitPython 的 AutoInterrupt 相同
+
+    Attributes:
+        proc: 进程对象
+        args: 命令行
+    """
+
+    def __init__(self, proc: subprocess.Popen, args: List[str]):
+        self.proc = proc
+        self.args = args
+
+    def wait(self, stderr: bytes = b"") -> int:
+        """
+        等待进程结束
+
+        参数:
+            stderr: 之前已读取的错误输出
+
+        异常:
+            GitCommandError: 进程返回非 0 状态
+        """
+        status = self.proc.wait()
+        if status != 0:
+            try:
+                stderr = (stderr or b"") + (self.proc.stderr.read() if self.proc.stderr else b"")
+            except (OSError, ValueError):
+                pass
+            raise GitCommandError(self.args, status, stderr)
+        return status
+
+
+class CliGit:
+    """
+    git 命令调用器，接口与 GitPython 的 repo.git 相同：repo.git.rev_parse("HEAD") 运行 git rev-parse HEAD
+    """
+
+    def __init__(self, working_dir: str, options: Optional[List[str]] = None,
+                 environment: Optional[Dict[str, str]] = None):
+        self._working_dir = working_dir
+        self._options = list(options or [])
+        self._environment = environment if environment is not None else {}
+
+    def __call__(self, **kwargs) -> "CliGit":
+        """返回带 git 全局选项的调用器，如 repo.git(c="key=value").fetch() 运行 git -c key=value fetch"""
+        return CliGit(self._working_dir, self._options + _transform_kwargs(kwargs), self._environment)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.execute(name.replace("_", "-"), *args, **kwargs)
+
+    @contextmanager
+    def custom_environment(self, **environment: str) -> Iterator[None]:
+        """在代码块内运行的 git 命令使用额外的环境变量"""
+        previous = dict(self._environment)
+        self._environment.update(environment)
+        try:
+            yield
+        finally:
+            self._environment.clear()
+            self._environment.update(previous)
+
+    def execute(self, command: str, *args, istream=None, as_process: bool = False, with_stdout: bool = True,
+                strip_newline_in_stdout: bool = True, **kwargs):
+        """
+        运行 git 命令
+
+        参数:
+            command: git 子命令，如 "rev-parse"
+            args: 命令参数，选项（关键字参数）放在参数之前
+            istream: 作为标准输入的文件
+            as_process: 不等待结束，返回进程对象，错误输出通过管道读取
+            with_stdout: 是否读取标准输出
+            strip_newline_in_stdout: 是否去掉输出末尾的一个换行符
+
+        返回:
+            标准输出文本；as_process 为 True 时返回 CliProcess
+
+        异常:
+            GitCommandError: 命令返回非 0 状态
+        """
+        call = [GIT_EXECUTABLE, *self._options, command, *_transform_kwargs(kwargs),
+                *(str(arg) for arg in args if arg is not None)]
+        env = os.environ.copy()
+        # 与 GitPython 相同，强制英文输出，进度解析依赖英文文本
+        env["LANGUAGE"] = "C"
+        env["LC_ALL"] = "C"
+        env.update(self._environment)
+        try:
+            proc = subprocess.Popen(
+                call, cwd=self._working_dir, env=env,
+                stdin=istream if istream is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE if with_stdout else subprocess.DEVNULL,
+                stderr=subprocess.PIPE, creationflags=_CREATION_FLAGS
+            )
+        except OSError as e:
+            raise GitCommandError(call, e) from e
+        if as_process:
+            return CliProcess(proc, call)
+
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            raise GitCommandError(call, proc.returncode, stderr, stdout)
+        output = (stdout or b"").decode("utf-8", errors="surrogateescape")
+        if strip_newline_in_stdout and output.endswith("\n"):
+            output = output[:-1]
+        return output
+
+
+class _CliConfig:
+    """仓库配置的读写，接口与 GitPython 的 GitConfigParser 相同，节名如 'remote "origin"'"""
+
+    def __init__(self, git: CliGit):
+        self._git = git
+
+    def __enter__(self) -> "_CliConfig":
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @staticmethod
+    def _key(section: str, option: str) -> str:
+        name, _, subsection = section.partition(" ")
+        return f"{name}.{subsection.strip(chr(34))}.{option}" if subsection else f"{name}.{option}"
+
+    def has_option(self, section: str, option: str) -> bool:
+        try:
+            self._git.config("--get", self._key(section, option))
+            return True
+        except GitCommandError:
+            return False
+
+    def get_value(self, section: str, option: str) -> str:
+        return self._git.config("--get", self._key(section, option))
+
+    def set_value(self, section: str, option: str, value) -> "_CliConfig":
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        self._git.config("--local", "--replace-all", self._key(section, option), str(value))
+        return self
+
+    def remove_option(self, section: str, option: str):
+        self._git.config("--local", "--unset-all", self._key(section, option))
+
+
+class _CliRemote:
+    """远程仓库，接口与 GitPython 的 Remote 相同"""
+
+    def __init__(self, git: CliGit, name: str):
+        self._git = git
+        self.name = name
+
+    @property
+    def url(self) -> str:
+        return self._git.remote("get-url", self.name)
+
+    def set_url(self, url: str) -> "_CliRemote":
+        self._git.remote("set-url", self.name, url)
+        return self
+
+
+class _CliRemotes(list):
+    """远程仓库列表，可按名称以属性方式访问，如 repo.remotes.origin"""
+
+    def __getattr__(self, name: str) -> _CliRemote:
+        for remote in self:
+            if remote.name == name:
+                return remote
+        raise AttributeError(f"没有名为 {name} 的远程仓库")
+
+
+class _CliCommit:
+    def __init__(self, hexsha: str):
+        self.hexsha = hexsha
+
+
+class _CliHead:
+    """HEAD，接口与 GitPython 的 HEAD 相同"""
+
+    def __init__(self, git: CliGit):
+        self._git = git
+
+    @property
+    def commit(self) -> _CliCommit:
+        try:
+            return _CliCommit(self._git.rev_parse("--verify", "HEAD"))
+        except GitCommandError as e:
+            # 与 GitPython 相同，空仓库的 HEAD 没有提交时抛出 ValueError
+            raise ValueError("HEAD 没有指向任何提交") from e
+
+    @property
+    def is_detached(self) -> bool:
+        try:
+            self._git.symbolic_ref("-q", "HEAD")
+            return False
+        except GitCommandError:
+            return True
+
+
+class _CliBranch:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class CliRepo:
+    """
+    直接调用 git 命令行的仓库，实现 git_handler 用到的 GitPython Repo 接口
+
+    Attributes:
+        working_tree_dir (str): 工作目录
+        git_dir (str): .git 目录
+        git (CliGit): git 命令调用器
+    """
+
+    def __init__(self, path: str):
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            raise NoSuchPathError(path)
+        git_dir = os.path.join(path, ".git")
+        if os.path.isfile(git_dir):
+            # 工作树或子模块的 .git 是指向实际目录的文件
+            with open(git_dir, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content.startswith("gitdir:"):
+                raise InvalidGitRepositoryError(path)
+            git_dir = os.path.normpath(os.path.join(path, content[len("gitdir:"):].strip()))
+        if not os.path.isdir(git_dir):
+            raise InvalidGitRepositoryError(path)
+        self.working_tree_dir = path
+        self.working_dir = path
+        self.git_dir = git_dir
+        self.git = CliGit(path)
+        self.head = _CliHead(self.git)
+
+    @classmethod
+    def init(cls, path: str) -> "CliRepo":
+        """在目录中初始化仓库，目录不存在时创建"""
+        os.makedirs(path, exist_ok=True)
+        CliGit(path).init()
+        return cls(path)
+
+    @property
+    def remotes(self) -> _CliRemotes:
+        return _CliRemotes(_CliRemote(self.git, name) for name in self.git.remote().split())
+
+    def create_remote(self, name: str, url: str) -> _CliRemote:
+        self.git.remote("add", name, url)
+        return _CliRemote(self.git, name)
+
+    @property
+    def active_branch(self) -> _CliBranch:
+        try:
+            return _CliBranch(self.git.symbolic_ref("--short", "HEAD"))
+        except GitCommandError as e:
+            raise TypeError("HEAD 处于分离状态") from e
+
+    def config_reader(self) -> _CliConfig:
+        return _CliConfig(self.git)
+
+    def config_writer(self) -> _CliConfig:
+        return _CliConfig(self.git)
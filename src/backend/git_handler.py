@@ -1,13 +1,62 @@
 """
 作者: canfeng
 描述: 一个使用 GitPython 的 Git 克隆和更新工具。
+
+仓库操作通过可替换的后端进行：默认使用 GitPython，也可以使用直接调用 git 命令行的后端（见 git_cli），
+由 set_git_engine 按配置选择。
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from bandwidth import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, get_shaping_proxy, get_transfer_scheduler,
+                       resume_process, suspend_process)
 from git import Repo, RemoteProgress
+from git.exc import GitCommandError
+from git.util import finalize_process
+from bundles import download_bundle, fetch_bundle_index, plan_bundle_chain
+from git_cli import CliRepo
+from snapshot import open_snapshot
+import json
 import os
-from typing import Optional, Dict
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+from typing import Callable, Iterator, Optional, Dict, List, Tuple
 import time
 import threading
+import urllib.parse
+import urllib.request
+
+
+# 各操作阶段的显示名称
+_STAGE_NAMES = {
+    RemoteProgress.COUNTING: "计数对象",
+    RemoteProgress.COMPRESSING: "压缩对象",
+    RemoteProgress.WRITING: "写入对象",
+    RemoteProgress.RECEIVING: "接收对象",
+    RemoteProgress.RESOLVING: "解析引用",
+    RemoteProgress.FINDING_SOURCES: "查找源",
+    RemoteProgress.CHECKING_OUT: "检出代码",
+}
+# 接收阶段消息中的已传输数据量，如 "433.00 KiB | 433.00 KiB/s"
+_TRANSFER_PATTERN = re.compile(r"([\d.]+) (bytes|KiB|MiB|GiB)")
+_UNIT_BYTES = {"bytes": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+# 速度采样间隔(秒)和指数移动平均系数
+SPEED_SAMPLE_INTERVAL = 0.5
+SPEED_EWMA_ALPHA = 0.3
+# 控制台打印进度的最小间隔(秒)
+PRINT_INTERVAL = 1.0
+
+
+class TransferStalled(Exception):
+    """Git 进程长时间没有任何进度"""
+
+
+class OperationCancelled(Exception):
+    """Git 操作被用户取消"""
 
 
 class GitProgressMonitor(RemoteProgress):
@@ -38,12 +87,187 @@ class GitProgressMonitor(RemoteProgress):
         self.eta = 0
         # 锁，用于线程安全访问
         self._lock = threading.Lock()
-        # 上次接收对象数和时间，用于计算速度
-        self._last_received = 0
+        # 已接收字节数
+        self.received_bytes = 0
+        # 上次计算速度的时间，平滑后的速度 (字节/秒)
         self._last_received_time = time.time()
+        self._speed_bps = 0.0
+        # 当前 git 进程报告的字节数，以及之前进程累计的字节数
+        self._last_reported_bytes = 0.0
+        self._bytes_base = 0.0
+        # 上次打印进度的时间
+        self._last_print_time = 0.0
         # 显式设置初始完成状态为False
         self._is_complete = False
-        
+        # 分批下载时之前批次已完成的对象数，以及整个操作的对象总数
+        self._object_base = 0
+        self._object_total = 0
+        # 取消标志，由任务管理器设置，Git 进程会在检测到后被终止
+        self._cancel_event = threading.Event()
+        # 后台操作以较低的进程优先级运行 Git，减少对游戏和前台操作的影响
+        self.low_priority = False
+        # 进度变化监听器，用于向前端推送进度
+        self._listeners: Tuple[Callable[[], None], ...] = ()
+        # 并行子操作的监视器，进度汇总到本监视器
+        self._children: Tuple["GitProgressMonitor", ...] = ()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """
+        添加进度变化监听器，监听器在进度更新的线程中调用，应尽快返回
+
+        参数:
+            listener: 无参数回调函数
+        """
+        with self._lock:
+            self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        """移除进度变化监听器"""
+        with self._lock:
+            self._listeners = tuple(item for item in self._listeners if item != listener)
+
+    def notify_listeners(self):
+        """通知所有监听器进度已变化"""
+        # 监听器列表只整体替换，读取时无需加锁
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception as e:
+                print(f"进度监听器出错: {e}")
+
+    def cancel(self):
+        """请求取消当前操作"""
+        self._cancel_event.set()
+        self.notify_listeners()
+
+    def is_cancelled(self) -> bool:
+        """
+        是否已请求取消
+        Returns:
+            bool: 已请求取消返回 True
+        """
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """已请求取消时抛出 OperationCancelled"""
+        if self._cancel_event.is_set():
+            raise OperationCancelled("操作已取消")
+
+    def set_stage(self, stage: str):
+        """设置当前阶段描述"""
+        with self._lock:
+            self.stage = stage
+            self.last_update = time.time()
+        self.notify_listeners()
+
+    def mark_complete(self):
+        """将进度标记为完成"""
+        with self._lock:
+            self.progress = 1.0
+            self.received_objects = self.total_objects or 100
+            self.indexed_objects = self.total_objects or 100
+            self.last_update = time.time()
+            self.stage = "完成"
+            self._is_complete = True  # 设置显式完成标志
+        self.notify_listeners()
+
+    def create_child(self) -> "GitProgressMonitor":
+        """
+        创建并行子操作（如各子模块的下载）的监视器
+
+        子监视器与本监视器共用取消标志和优先级。子监视器的进度变化时汇总到本监视器：
+        总进度为各子操作进度的平均值，对象数和字节数为各子操作之和。
+
+        返回:
+            GitProgressMonitor: 子监视器
+        """
+        child = GitProgressMonitor()
+        child._cancel_event = self._cancel_event
+        child.low_priority = self.low_priority
+        with self._lock:
+            self._children = self._children + (child,)
+        child.add_listener(self._aggregate_children)
+        return child
+
+    def _aggregate_children(self):
+        """将子监视器的进度汇总到本监视器"""
+        children = self._children
+        now = time.time()
+        with self._lock:
+            self.progress = min(sum(1.0 if child._is_complete else child.progress for child in children)
+                                / len(children), 0.99)
+            self.total_objects = sum(child.total_objects for child in children)
+            self.received_objects = sum(child.received_objects for child in children)
+            self.indexed_objects = sum(child.indexed_objects for child in children)
+            self._update_bytes(sum(child.transferred_bytes for child in children), now)
+            self.last_update = now
+        self.notify_listeners()
+
+    def start_batch(self, done_objects: int, total_objects: int):
+        """
+        开始新的一批下载，使进度按整个操作而不是单个批次计算
+
+        参数:
+            done_objects: 之前批次已完成的对象数
+            total_objects: 整个操作需要下载的对象总数
+        """
+        with self._lock:
+            self._object_base = done_objects
+            self._object_total = total_objects
+            self.received_objects = done_objects
+            self.indexed_objects = done_objects
+            self.total_objects = total_objects
+        self.notify_listeners()
+
+    @property
+    def transferred_bytes(self) -> float:
+        """当前已接收的字节数，不经过速度采样的延迟，用于限速"""
+        return self._bytes_base + self._last_reported_bytes
+
+    @property
+    def priority(self) -> str:
+        """下载的优先级类别，后台操作为 background"""
+        return PRIORITY_BACKGROUND if self.low_priority else PRIORITY_INTERACTIVE
+
+    def set_count(self, done: int, total: int):
+        """
+        更新本地操作（如文件校验）的进度，不经过 Git 进程
+
+        参数:
+            done: 已处理的数量
+            total: 总数量
+        """
+        with self._lock:
+            self.total_objects = total
+            self.received_objects = done
+            self.indexed_objects = done
+            self.progress = min(done / total, 0.99) if total else 0.99
+            self.last_update = time.time()
+        self.notify_listeners()
+
+    def set_bytes(self, received_bytes: int, total_bytes: int, done_files: int = 0, total_files: int = 0):
+        """
+        更新按字节计量的下载进度，用于不经过 Git 的 HTTP 下载
+
+        参数:
+            received_bytes: 已下载的字节数
+            total_bytes: 需要下载的总字节数
+            done_files: 已完成的文件数
+            total_files: 需要下载的文件数
+        """
+        now = time.time()
+        with self._lock:
+            self.stage = "接收对象"
+            self.total_objects = total_files
+            self.received_objects = done_files
+            self.indexed_objects = done_files
+            self.progress = min(received_bytes / total_bytes, 0.99) if total_bytes else 0.99
+            self._update_bytes(received_bytes, now)
+            if self._speed_bps > 0:
+                self.eta = max(total_bytes - received_bytes, 0) / self._speed_bps
+            self.last_update = now
+        self.notify_listeners()
+
     def update(self, op_code, cur_count, max_count=None, message=''):
         """
         Git操作进度更新回调方法
@@ -52,94 +276,33 @@ class GitProgressMonitor(RemoteProgress):
             op_code: 操作码，表示当前执行的操作类型
             cur_count: 当前进度计数
             max_count: 最大计数
-            message: 进度消息
+            message: 进度消息，接收阶段格式为 "433.00 KiB | 433.00 KiB/s"
         """
+        now = time.time()
         with self._lock:
             self.op_code = op_code
             self.cur_count = cur_count
             self.max_count = max_count or 100
             self.message = message
-            
-            # 解析进度信息
-            if op_code & RemoteProgress.COUNTING:
-                self.stage = "计数对象"
-            elif op_code & RemoteProgress.COMPRESSING:
-                self.stage = "压缩对象"
-            elif op_code & RemoteProgress.WRITING:
-                self.stage = "写入对象"
-            elif op_code & RemoteProgress.RECEIVING:
-                self.stage = "接收对象"
+
+            stage_code = op_code & RemoteProgress.OP_MASK
+            stage = _STAGE_NAMES.get(stage_code, "准备中")
+            stage_changed = stage != self.stage
+            self.stage = stage
+
+            if stage_code == RemoteProgress.RECEIVING:
+                # 对象计数由 RemoteProgress 直接给出，浅克隆/部分克隆时总数会随阶段变化
+                if max_count:
+                    self.received_objects = self._object_base + int(cur_count)
+                    self.total_objects = self._object_total or int(max_count)
                 if message:
-                    # 详细解析接收消息，格式通常为: "Receiving objects:  67% (835/1254), 433.00 KiB | 433.00 KiB/s"
-                    # 或 "Receiving objects:  67% (835/1254)"
-                    try:
-                        parts = message.split(',')
-                        # 解析对象数量
-                        if len(parts) > 0 and "%" in parts[0]:
-                            percentage_part = parts[0].strip()
-                            count_part = percentage_part.split('(')[1].split(')')[0]
-                            current, total = count_part.split('/')
-                            self.received_objects = int(current)
-                            self.total_objects = int(total)
-                        
-                        # 解析速度信息
-                        if len(parts) > 1 and "KiB/s" in parts[1]:
-                            speed_part = parts[1].strip()
-                            if "|" in speed_part:
-                                speed_text = speed_part.split('|')[1].strip().split(' ')[0]
-                                self.speed = float(speed_text)
-                            
-                        # 计算ETA
-                        if self.received_objects > 0 and self.total_objects > 0:
-                            now = time.time()
-                            time_diff = now - self._last_received_time
-                            received_diff = self.received_objects - self._last_received
-                            
-                            # 只有当新对象接收并且时间差大于0时才更新速度
-                            if time_diff > 0.5 and received_diff > 0:
-                                # 使用过去几秒的数据平滑计算速度
-                                self._last_received = self.received_objects
-                                self._last_received_time = now
-                                
-                                # 计算剩余对象
-                                remaining_objects = self.total_objects - self.received_objects
-                                
-                                # 基于最近的速率计算ETA
-                                if self.speed > 0:
-                                    # 假设每个对象平均大小相同
-                                    objects_per_second = received_diff / time_diff
-                                    if objects_per_second > 0:
-                                        self.eta = remaining_objects / objects_per_second
-                    except Exception as e:
-                        print(f"解析进度消息出错: {e}")
-            elif op_code & RemoteProgress.RESOLVING:
-                self.stage = "解析引用"
-            elif op_code & RemoteProgress.FINDING_SOURCES:
-                self.stage = "查找源"
-            elif op_code & RemoteProgress.CHECKING_OUT:
-                self.stage = "检出代码"
-            else:
-                self.stage = "准备中"
-            
-            # 更新对象计数（直接从消息中提取）
-            if message and "objects" in message:
-                try:
-                    # 如果还没有从上面解析到对象数量，这里再尝试解析
-                    if self.total_objects == 0:
-                        parts = message.split(',')
-                        for part in parts:
-                            if 'total' in part:
-                                total_text = part.strip().split(' ')[0]
-                                self.total_objects = int(total_text)
-                            elif 'received' in part and not self.received_objects:
-                                received_text = part.strip().split(' ')[0]
-                                self.received_objects = int(received_text)
-                            elif 'indexed' in part:
-                                indexed_text = part.strip().split(' ')[0]
-                                self.indexed_objects = int(indexed_text)
-                except Exception as e:
-                    print(f"解析对象数量出错: {e}")
-            
+                    match = _TRANSFER_PATTERN.search(message)
+                    if match:
+                        self._update_bytes(float(match.group(1)) * _UNIT_BYTES[match.group(2)], now)
+            elif stage_code == RemoteProgress.RESOLVING:
+                if max_count:
+                    self.indexed_objects = self._object_base + int(cur_count)
+
             # 计算总体进度
             if self.total_objects > 0 and self.received_objects > 0:
                 # 下载进度
@@ -152,14 +315,49 @@ class GitProgressMonitor(RemoteProgress):
                 self.progress = min(self.cur_count / self.max_count, 0.99)
             else:
                 # 无法获取准确进度时，进度缓慢增加
-                elapsed = time.time() - self.start_time
+                elapsed = now - self.start_time
                 self.progress = min(0.1 + elapsed / 300, 0.5)  # 5分钟内最多增长到50%
             
-            self.last_update = time.time()
+            self.last_update = now
             
-            # 打印进度，便于调试
-            print(f"\r{self.stage}: {int(self.progress*100)}% - {self.message}", end='', flush=True)
-    
+            # 打印进度，便于调试；限制频率，避免每次回调都写控制台
+            if stage_changed or now - self._last_print_time >= PRINT_INTERVAL:
+                self._last_print_time = now
+                print(f"\r{self.stage}: {int(self.progress*100)}% - {self.message}", end='', flush=True)
+
+        self.notify_listeners()
+
+    def _update_bytes(self, reported_bytes: float, now: float):
+        """
+        根据 git 报告的已接收字节数更新速度和剩余时间，调用方需持有锁
+
+        参数:
+            reported_bytes: 当前 git 进程报告的已接收字节数
+            now: 当前时间
+        """
+        # 分批下载时每个 git 进程从 0 开始计数，计数变小说明换了新进程
+        if reported_bytes < self._last_reported_bytes:
+            self._bytes_base += self._last_reported_bytes
+        self._last_reported_bytes = reported_bytes
+        received = self._bytes_base + reported_bytes
+
+        time_diff = now - self._last_received_time
+        if time_diff >= SPEED_SAMPLE_INTERVAL:
+            # 指数移动平均平滑速度
+            sample = (received - self.received_bytes) / time_diff
+            if self._speed_bps > 0:
+                self._speed_bps = SPEED_EWMA_ALPHA * sample + (1 - SPEED_EWMA_ALPHA) * self._speed_bps
+            else:
+                self._speed_bps = sample
+            self._last_received_time = now
+            self.received_bytes = received
+            self.speed = self._speed_bps / 1024
+
+            # 按已接收对象的平均大小估算总字节数，再由剩余字节数计算 ETA
+            if self._speed_bps > 0 and self.received_objects > 0 and self.total_objects > 0:
+                expected_bytes = received / self.received_objects * self.total_objects
+                self.eta = max(expected_bytes - received, 0) / self._speed_bps
+
     def get_progress_data(self) -> Dict:
         """
         获取进度数据
@@ -197,6 +395,7 @@ class GitProgressMonitor(RemoteProgress):
 
             return {
                 "percentage": percentage,
+                "is_cancelled": self._cancel_event.is_set(),
                 "stage": self.stage,
                 "elapsed_seconds": int(time.time() - self.start_time),
                 "total_objects": self.total_objects,
@@ -204,6 +403,7 @@ class GitProgressMonitor(RemoteProgress):
                 "indexed_objects": self.indexed_objects,
                 "is_complete": self._is_complete,
                 "message": self.message,
+                "received_bytes": int(self.received_bytes),
                 "speed": round(self.speed, 2),
                 "eta": eta_text
             }
@@ -213,98 +413,1483 @@ class GitProgressMonitor(RemoteProgress):
 progress_monitor = GitProgressMonitor()
 
 
+# 默认克隆深度，只下载最新一次提交，避免下载历史中所有旧版本的文件
+DEFAULT_CLONE_DEPTH = 1
+# 可续传克隆首先只下载提交和目录树
+RESUMABLE_CLONE_FILTER = "blob:none"
+# 每批补全的文件对象数，中断时最多损失一批
+HYDRATE_BATCH_SIZE = 500
+# 向 Git 进程写入快照数据的块大小
+READ_BLOCK_SIZE = 256 * 1024
+# 未完成克隆的状态文件（位于 .git 目录中）和保存目标提交的引用
+CLONE_STATE_FILE = "minemc-clone.json"
+CLONE_REF = "refs/minemc/clone"
+# 已下载、待切换的更新版本
+STAGED_REF = "refs/minemc/staged"
+# 切换版本期间存在的标记文件，切换中断时游戏目录处于不完整状态
+UPDATE_STATE_FILE = "minemc-update.json"
+# 保留的历史版本记录及其引用前缀，用于快速回滚
+VERSIONS_FILE = "minemc-versions.json"
+VERSION_REF_PREFIX = "refs/minemc/versions/"
+# 更新大小估算的缓存（状态文件），以及估算时下载目录树的临时仓库（位于 .git 目录中）
+ESTIMATE_STATE_FILE = "minemc-estimate.json"
+ESTIMATE_REPO_DIR = "minemc-estimate"
+# 下载中的增量包，位于 .git 目录下，中断后继续下载
+BUNDLE_DIR = "minemc-bundles"
+# 同时下载的子模块数
+DEFAULT_SUBMODULE_JOBS = 4
+# 更新日志缓存文件，按 (旧提交, 新提交) 保存，位于 .git 目录下
+CHANGELOG_CACHE_FILE = "minemc-changelog.json"
+# 缓存的更新日志数
+CHANGELOG_CACHE_SIZE = 20
+# 更新日志中最多列出的提交数和文件数
+CHANGELOG_MAX_COMMITS = 200
+CHANGELOG_MAX_FILES = 1000
+DEFAULT_KEEP_VERSIONS = 3
+# 下载超过多少秒没有任何进度时视为卡住，切换到下一个镜像(秒)
+DEFAULT_STALL_TIMEOUT = 60
+# 限速时单次暂停 Git 进程的最短和最长时间(秒)
+THROTTLE_MIN_PAUSE = 0.05
+THROTTLE_MAX_PAUSE = 1.0
+# 终止 Git 进程后等待输出管道关闭的时间(秒)
+PIPE_CLOSE_GRACE = 2
+# 后台 Git 进程的 nice 值（非 Windows 平台）
+LOW_PRIORITY_NICENESS = 10
+
+# 每个仓库的操作锁，以及当前持有锁的后台操作
+_repo_locks: Dict[str, threading.Lock] = {}
+_background_monitors: Dict[str, "GitProgressMonitor"] = {}
+_repo_locks_guard = threading.Lock()
+
+
+class GitPythonEngine:
+    """GitPython 后端"""
+    name = "gitpython"
+
+    @staticmethod
+    def open(path: str) -> Repo:
+        return Repo(path)
+
+    @staticmethod
+    def init(path: str) -> Repo:
+        return Repo.init(path)
+
+
+class GitCliEngine:
+    """直接调用 git 命令行的后端，仓库对象实现 GitPython Repo 接口中用到的部分"""
+    name = "cli"
+
+    @staticmethod
+    def open(path: str) -> CliRepo:
+        return CliRepo(path)
+
+    @staticmethod
+    def init(path: str) -> CliRepo:
+        return CliRepo.init(path)
+
+
+# 可用的仓库后端，以及当前使用的后端
+GIT_ENGINES = {engine.name: engine for engine in (GitPythonEngine, GitCliEngine)}
+DEFAULT_GIT_ENGINE = GitPythonEngine.name
+_git_engine = GIT_ENGINES[DEFAULT_GIT_ENGINE]
+
+
+def set_git_engine(name: str):
+    """
+    选择仓库后端，之后打开的仓库都使用该后端。
+
+    参数:
+        name (str): 后端名称，见 GIT_ENGINES
+
+    异常:
+        ValueError: 未知的后端名称
+    """
+    global _git_engine
+    if name not in GIT_ENGINES:
+        raise ValueError(f"未知的 Git 后端: {name}，可选: {', '.join(GIT_ENGINES)}")
+    _git_engine = GIT_ENGINES[name]
+
+
+def get_git_engine() -> str:
+    """当前使用的仓库后端名称"""
+    return _git_engine.name
+
+
+def open_repo(path: str) -> Repo:
+    """
+    用当前后端打开仓库。
+
+    异常:
+        NoSuchPathError: 路径不存在
+        InvalidGitRepositoryError: 路径不是 Git 仓库
+    """
+    return _git_engine.open(path)
+
+
+def init_repo(path: str) -> Repo:
+    """用当前后端在目录中初始化仓库"""
+    return _git_engine.init(path)
+
+
 class GitConfig:
-    def __init__(self, git_url: str = "", git_branch: str = "main", git_path: Optional[str] = None):
+    def __init__(self, git_url: str = "", git_branch: str = "main", git_path: Optional[str] = None,
+                 clone_depth: int = DEFAULT_CLONE_DEPTH, clone_filter: str = "",
+                 keep_versions: int = DEFAULT_KEEP_VERSIONS, mirror_urls: Optional[List[str]] = None,
+                 stall_timeout: float = DEFAULT_STALL_TIMEOUT,
+                 on_mirror_failed: Optional[Callable[[str], None]] = None,
+                 sparse_paths: Optional[List[str]] = None, snapshot_url: str = "", bundle_url: str = "",
+                 submodule_jobs: int = DEFAULT_SUBMODULE_JOBS, target_commit: str = ""):
         """
         初始化 Git 配置，包括仓库 URL、分支名称和克隆路径。
+
+        参数:
+            clone_depth: 克隆深度，0 表示下载完整历史
+            clone_filter: 首次下载使用的部分克隆过滤器，为空时使用 "blob:none"
+            keep_versions: 更新后保留的历史版本数，用于回滚
+            mirror_urls: 按优先级排列的仓库镜像地址，为空时只使用 git_url
+            stall_timeout: 下载超过该秒数没有进度时切换到下一个镜像，0 表示不检测
+            on_mirror_failed: 镜像下载失败时的回调，参数为镜像地址
+            sparse_paths: 稀疏检出规则（gitignore 格式），只下载和检出匹配的文件，为空时检出全部文件
+            snapshot_url: 首次安装使用的快照地址（见 snapshot），为空时直接从仓库下载
+            bundle_url: 增量包索引地址（见 bundles），为空时更新直接从仓库下载
+            submodule_jobs: 同时下载的子模块数
+            target_commit: 更新的目标提交（来自版本清单），为空时更新到分支的最新提交
         """
         self.git_url = git_url
+        self.mirror_urls = list(mirror_urls or []) or [git_url]
+        self.stall_timeout = stall_timeout
+        self.on_mirror_failed = on_mirror_failed
         self.git_branch = git_branch
         # 设置克隆路径，默认为当前文件目录下的 "git_repo" 文件夹
         self.git_path = git_path or os.path.join(os.path.dirname(__file__), "git_repo")
+        self.clone_depth = clone_depth
+        self.clone_filter = clone_filter
+        self.keep_versions = keep_versions
+        self.sparse_paths = list(sparse_paths or [])
+        self.snapshot_url = snapshot_url
+        self.bundle_url = bundle_url
+        self.submodule_jobs = max(1, submodule_jobs)
+        self.target_commit = target_commit
+
+
+def get_clone_options(config: GitConfig) -> Dict:
+    """
+    根据配置生成首次下载时传给 git fetch 的参数。
+
+    克隆总是先只下载提交和目录树（blob:none），文件内容随后分批补全，
+    这样中断后已下载的批次会保留在对象库中。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+
+    返回:
+        Dict: 下载参数，键为 git 命令行选项名
+    """
+    options = {"filter": config.clone_filter or RESUMABLE_CLONE_FILTER}
+    if config.clone_depth and config.clone_depth > 0:
+        # 浅克隆只保留最近的提交
+        options["depth"] = config.clone_depth
+    return options
+
+
+def get_fetch_options(config: GitConfig) -> Dict:
+    """
+    根据配置生成更新时传给 git fetch 的参数。
+
+    稀疏检出时只下载提交和目录树，检出范围内的文件内容随后由 _verify_commit 补全，
+    范围外的文件不会下载。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+
+    返回:
+        Dict: 下载参数，键为 git 命令行选项名
+    """
+    # 子模块在切换版本后由 _update_submodules 并行下载，这里不随主仓库逐个下载
+    options = {"recurse_submodules": "no"}
+    if config.sparse_paths:
+        options["filter"] = RESUMABLE_CLONE_FILTER
+    return options
+
+
+def _lower_process_priority(popen):
+    """降低进程优先级，之后由其启动的子进程也会继承"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            ctypes.windll.kernel32.SetPriorityClass(int(popen._handle), subprocess.BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.setpriority(os.PRIO_PROCESS, popen.pid, LOW_PRIORITY_NICENESS)
+    except Exception as e:
+        print(f"降低进程优先级失败: {e}")
+
+
+@contextmanager
+def repo_lock(git_path: str, background: Optional[GitProgressMonitor] = None) -> Iterator[bool]:
+    """
+    获取仓库操作锁，保证同一仓库同时只有一个 Git 操作。
+
+    前台操作（克隆、更新、回滚）会取消正在进行的后台操作并等待其退出；
+    后台操作（预下载等）在仓库忙时不等待，直接返回未获取。
+
+    参数:
+        git_path (str): 仓库路径。
+        background (GitProgressMonitor): 后台操作的进度监视器，为 None 表示前台操作。
+
+    返回:
+        Iterator[bool]: 是否获取到锁。
+    """
+    key = os.path.abspath(git_path)
+    with _repo_locks_guard:
+        lock = _repo_locks.setdefault(key, threading.Lock())
+        if background is None and key in _background_monitors:
+            print("取消正在进行的后台操作")
+            _background_monitors[key].cancel()
+
+    acquired = lock.acquire(blocking=background is None)
+    if acquired and background is not None:
+        with _repo_locks_guard:
+            _background_monitors[key] = background
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with _repo_locks_guard:
+                if _background_monitors.get(key) is background:
+                    _background_monitors.pop(key, None)
+            lock.release()
+
+
+def _pause_process(popen, monitor: GitProgressMonitor, seconds: float):
+    """暂停进程一段时间，期间请求取消时立即恢复"""
+    try:
+        suspend_process(popen)
+    except Exception as e:
+        print(f"暂停进程失败: {e}")
+        return
+    try:
+        deadline = time.time() + seconds
+        while time.time() < deadline and not monitor.is_cancelled():
+            time.sleep(min(0.05, max(deadline - time.time(), 0)))
+    finally:
+        resume_process(popen)
+
+
+def _pump_progress(stream, handler: Callable[[bytes], object]):
+    """
+    逐行读取 Git 的进度输出。
+
+    Git 用回车符刷新同一行进度，按换行符读取时整个阶段的进度要到阶段结束才能收到，
+    这里同时按回车符和换行符分行，使进度、限速和卡住检测都能及时得到已下载的字节数。
+    """
+    buffer = b""
+    try:
+        while True:
+            chunk = os.read(stream.fileno(), 4096)
+            if not chunk:
+                break
+            *lines, buffer = re.split(rb"[\r\n]", buffer + chunk)
+            for line in lines:
+                if line:
+                    handler(line)
+        if buffer:
+            handler(buffer)
+    except (OSError, ValueError):
+        pass
+    finally:
+        stream.close()
+
+
+def _run_git_process(proc, monitor: GitProgressMonitor, stall_timeout: float = 0, throttle: bool = True):
+    """
+    等待以 as_process 方式启动的 Git 进程结束，期间转发进度并响应取消。
+
+    参数:
+        proc: GitPython 返回的进程对象
+        monitor: 接收进度的监视器，请求取消后进程会被终止
+        stall_timeout: 超过该秒数没有进度时终止进程，0 表示不检测
+        throttle: 是否通过暂停进程限速，下载已经过限速代理时为 False
+
+    异常:
+        OperationCancelled: 操作被取消
+        TransferStalled: 长时间没有进度
+        GitCommandError: Git 命令执行失败
+    """
+    started = time.time()
+    errors_before = len(monitor.error_lines)
+    pump = threading.Thread(
+        target=_pump_progress,
+        args=(proc.proc.stderr, monitor.new_message_handler()),
+        daemon=True
+    )
+    pump.start()
+    if monitor.low_priority:
+        _lower_process_priority(proc.proc)
+    stalled = False
+    terminated_at = 0.0
+    scheduler = get_transfer_scheduler()
+    counted_bytes = monitor.transferred_bytes
+    while pump.is_alive():
+        if monitor.is_cancelled() or stalled:
+            if proc.proc.poll() is None:
+                proc.proc.terminate()
+            terminated_at = terminated_at or time.time()
+            # 进程已结束但其子进程（如 git-remote-http）仍占用输出管道时不再等待
+            if proc.proc.poll() is not None and time.time() - terminated_at > PIPE_CLOSE_GRACE:
+                break
+        elif stall_timeout and time.time() - max(started, monitor.last_update) > stall_timeout:
+            stalled = True
+            continue
+        else:
+            # 按已接收的字节数限速，超出时暂停进程，直到偿还超出的部分；
+            # 不限速时也要登记，前台下载进行时后台下载会因此降速
+            transferred = monitor.transferred_bytes
+            if throttle:
+                wait = scheduler.reserve(int(max(transferred - counted_bytes, 0)), monitor.priority)
+                if wait > THROTTLE_MIN_PAUSE:
+                    _pause_process(proc.proc, monitor, min(wait, THROTTLE_MAX_PAUSE))
+                    # 暂停期间没有进度，不计入卡住的时间
+                    started = time.time()
+            counted_bytes = max(counted_bytes, transferred)
+        pump.join(0.2)
+
+    if stalled:
+        proc.proc.wait()
+        raise TransferStalled(f"超过 {stall_timeout} 秒没有下载进度")
+    if monitor.is_cancelled():
+        proc.proc.wait()
+        raise OperationCancelled("操作已取消")
+    try:
+        finalize_process(proc)
+    except GitCommandError as e:
+        # 错误输出已被进度读取线程读走，从监视器收集的错误行中补回
+        errors = monitor.error_lines[errors_before:]
+        if e.stderr or not errors:
+            raise
+        raise GitCommandError(e.command, e.status, "\n".join(errors)) from None
+
+
+def run_git_command(repo: Repo, monitor: GitProgressMonitor, command: str, *args):
+    """
+    运行本地 Git 命令，可通过监视器取消，低优先级监视器会降低进程优先级。
+
+    参数:
+        repo: 仓库
+        monitor: 进度监视器
+        command: Git 子命令，如 "repack"
+        args: 命令参数
+
+    异常:
+        OperationCancelled: 操作被取消
+        GitCommandError: Git 命令执行失败
+    """
+    proc = getattr(repo.git, command.replace("-", "_"))(*args, as_process=True, with_stdout=False)
+    _run_git_process(proc, monitor, throttle=False)
+
+
+def _shaping_environment(repo: Repo, url: str, monitor: GitProgressMonitor) -> Dict[str, str]:
+    """
+    让 HTTPS 下载经过限速代理的环境变量。
+
+    其他协议、用户已配置代理或当前无需限速时返回空字典，此时由 _run_git_process 暂停进程限速。
+    后台下载总是经过代理，因为游戏启动后限速会随时生效。
+    """
+    if not url.startswith("https://"):
+        return {}
+    if not (monitor.priority == PRIORITY_BACKGROUND or get_transfer_scheduler().is_limited(monitor.priority)):
+        return {}
+    if urllib.request.getproxies() or repo.config_reader().has_option("http", "proxy"):
+        return {}
+    proxy = get_shaping_proxy(monitor.priority)
+    return {"https_proxy": proxy}
+
+
+def _run_fetch(repo: Repo, config: GitConfig, monitor: GitProgressMonitor, start: Callable[[], object]):
+    """
+    依次从各镜像下载，当前镜像失败或卡住时切换到下一个镜像。
+
+    失败的镜像移到列表末尾，同一操作之后的下载直接使用可用的镜像。
+
+    参数:
+        start: 启动 Git 下载进程的函数，从 origin 下载
+    """
+    for attempt in range(len(config.mirror_urls)):
+        url = config.mirror_urls[0]
+        if repo.remotes.origin.url != url:
+            repo.remotes.origin.set_url(url)
+        try:
+            environment = _shaping_environment(repo, url, monitor)
+            if config.stall_timeout:
+                # HTTP 传输由 git 自身检测低速，终止后遗留的 git-remote-http 进程也会随之退出
+                environment.update(GIT_HTTP_LOW_SPEED_LIMIT="1",
+                                   GIT_HTTP_LOW_SPEED_TIME=str(int(config.stall_timeout)))
+            with repo.git.custom_environment(**environment):
+                proc = start()
+            _run_git_process(proc, monitor, config.stall_timeout, throttle="https_proxy" not in environment)
+            return
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if attempt == len(config.mirror_urls) - 1:
+                raise
+            print(f"镜像 {url} 下载失败，切换到下一个镜像。错误: {e}")
+            config.mirror_urls.append(config.mirror_urls.pop(0))
+            if config.on_mirror_failed:
+                config.on_mirror_failed(url)
+
+
+def _load_state(repo: Repo, name: str) -> Dict:
+    """读取 .git 目录中的状态文件，不存在或损坏时返回空字典"""
+    state_path = os.path.join(repo.git_dir, name)
+    if not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"读取状态文件 {name} 失败: {e}")
+        return {}
+
+
+def _save_state(repo: Repo, name: str, state):
+    """原子地保存 .git 目录中的状态文件"""
+    state_path = os.path.join(repo.git_dir, name)
+    temp_path = state_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(temp_path, state_path)
+
+
+def _remove_state(repo: Repo, name: str):
+    """删除 .git 目录中的状态文件"""
+    state_path = os.path.join(repo.git_dir, name)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+def _open_clone_repo(config: GitConfig) -> Repo:
+    """
+    打开或初始化克隆目标仓库。
+
+    目标目录中残留的未完成克隆会被直接复用，已下载的对象不会丢弃。
+    """
+    if os.path.isdir(os.path.join(config.git_path, ".git")):
+        print("发现未完成的克隆，继续下载")
+        repo = open_repo(config.git_path)
+    else:
+        repo = init_repo(config.git_path)
+
+    if "origin" in [remote.name for remote in repo.remotes]:
+        repo.remotes.origin.set_url(config.mirror_urls[0])
+    else:
+        repo.create_remote("origin", config.mirror_urls[0])
+
+    with repo.config_writer() as writer:
+        # 只跟踪指定分支
+        writer.set_value('remote "origin"', "fetch",
+                         f"+refs/heads/{config.git_branch}:refs/remotes/origin/{config.git_branch}")
+        # 标记为部分克隆的来源，缺失的对象可以从 origin 补全
+        writer.set_value('remote "origin"', "promisor", "true")
+    return repo
+
+
+def _write_blob(repo: Repo, content: str) -> str:
+    """将内容写入对象库，返回 blob 哈希"""
+    with tempfile.TemporaryFile() as content_file:
+        content_file.write(content.encode())
+        content_file.seek(0)
+        return repo.git.hash_object("-w", "--stdin", istream=content_file)
+
+
+def _has_commit(repo: Repo, commit: str) -> bool:
+    """提交是否已在本地，不会触发按需下载"""
+    try:
+        repo.git.rev_list("--missing=print", "--no-walk", commit)
+        return True
+    except GitCommandError:
+        return False
+
+
+def _list_missing_objects(repo: Repo, commit: str, sparse_paths: Optional[List[str]] = None) -> List[str]:
+    """
+    列出检出指定提交所需、但本地尚不存在的对象。
+
+    只遍历该提交的目录树，不会触发按需下载。提供稀疏检出规则时只列出匹配的文件。
+    """
+    options = []
+    if sparse_paths:
+        options.append(f"--filter=sparse:oid={_write_blob(repo, _sparse_content(sparse_paths))}")
+    output = repo.git.rev_list("--objects", "--missing=print", *options, f"{commit}^{{tree}}")
+    return [line[1:].split()[0] for line in output.splitlines() if line.startswith("?")]
+
+
+def sparse_checkout_enabled(repo: Repo) -> bool:
+    """
+    仓库是否启用了稀疏检出。
+
+    该设置由 git sparse-checkout 写在 config.worktree 中，GitPython 读取不到，这里直接询问 git。
+    """
+    return repo.git.config("--type=bool", "--default=false", "--get", "core.sparseCheckout") == "true"
+
+
+def _sparse_content(sparse_paths: List[str]) -> str:
+    """稀疏检出规则文件的内容"""
+    return "\n".join(sparse_paths) + "\n"
+
+
+def _apply_sparse_checkout(repo: Repo, sparse_paths: List[str]) -> bool:
+    """
+    按规则设置稀疏检出，并立即增删工作区中的文件；规则为空时恢复检出全部文件。
+
+    调用前需保证当前提交在规则范围内的对象都已下载。
+
+    返回:
+        bool: 规则有变化时返回 True
+    """
+    sparse_file = os.path.join(repo.git_dir, "info", "sparse-checkout")
+    enabled = sparse_checkout_enabled(repo)
+    if not sparse_paths:
+        if not enabled:
+            return False
+        print("恢复检出全部文件")
+        repo.git.sparse_checkout("disable")
+        return True
+
+    content = _sparse_content(sparse_paths)
+    if enabled and os.path.exists(sparse_file):
+        with open(sparse_file, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    print(f"设置稀疏检出: {sparse_paths}")
+    with tempfile.TemporaryFile() as pattern_file:
+        pattern_file.write(content.encode())
+        pattern_file.seek(0)
+        repo.git.sparse_checkout("set", "--no-cone", "--stdin", istream=pattern_file)
+    return True
+
+
+def _fetch_objects(repo: Repo, config: GitConfig, object_ids: List[str], monitor: GitProgressMonitor):
+    """按对象 ID 从 origin 下载一批缺失的对象"""
+    with tempfile.TemporaryFile() as id_file:
+        id_file.write("\n".join(object_ids).encode() + b"\n")
+
+        def start():
+            id_file.seek(0)
+            return repo.git(c="fetch.negotiationAlgorithm=noop").fetch(
+                "origin", "--stdin", "--no-tags", "--no-write-fetch-head",
+                "--recurse-submodules=no", "--filter=blob:none",
+                progress=True, istream=id_file, as_process=True, with_stdout=False
+            )
+
+        _run_fetch(repo, config, monitor, start)
+
+
+def _list_submodules(repo: Repo) -> List[str]:
+    """列出当前版本中需要检出的子模块路径，稀疏检出范围外的子模块不包括在内"""
+    output = repo.git.ls_files("-s", "-t", "-z")
+    paths = []
+    for entry in output.split("\0"):
+        # 格式为 "<状态> <模式> <对象> <阶段>\t<路径>"，状态 S 表示在稀疏检出范围外
+        info, _, path = entry.partition("\t")
+        fields = info.split()
+        if len(fields) == 4 and fields[1] == "160000" and fields[0] != "S":
+            paths.append(path)
+    return paths
+
+
+def _submodule_urls(repo: Repo) -> Dict[str, str]:
+    """已初始化的子模块的路径到下载地址的映射，读取失败的子模块不包括在内"""
+    try:
+        output = repo.git.config("-f", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$")
+    except GitCommandError:
+        return {}
+    urls = {}
+    for line in output.splitlines():
+        key, _, path = line.partition(" ")
+        name = key[len("submodule."):-len(".path")]
+        try:
+            urls[path] = repo.git.config("--get", f"submodule.{name}.url")
+        except GitCommandError:
+            pass
+    return urls
+
+
+def _update_submodules(repo: Repo, config: GitConfig, monitor: GitProgressMonitor):
+    """
+    将子模块下载并检出到当前版本记录的提交，最多同时下载 config.submodule_jobs 个。
+
+    每个子模块使用单独的 git 进程和子监视器，进度汇总到 monitor。
+    子模块的地址等配置先统一写入（同时写入会争用配置文件的锁），再并行下载。
+    与主仓库相同，HTTPS 地址的子模块经过限速代理下载；其他协议的子模块只能暂停 git submodule 进程限速，
+    由它启动的 git fetch/clone 不受暂停影响，实际不限速。
+
+    异常:
+        OperationCancelled: 操作被取消
+        RuntimeError: 有子模块下载失败，已成功的子模块保持在新版本
+    """
+    paths = _list_submodules(repo)
+    if not paths:
+        return
+    monitor.check_cancelled()
+    monitor.set_stage("更新子模块")
+    repo.git.submodule("sync", "--quiet", "--", *paths)
+    repo.git.submodule("init", "--quiet", "--", *paths)
+    options = ["--depth", str(config.clone_depth)] if config.clone_depth and config.clone_depth > 0 else []
+    urls = _submodule_urls(repo)
+
+    def update(path: str, child: GitProgressMonitor):
+        child.check_cancelled()
+        # 各子模块并行启动，环境变量随命令传入，不修改共用的 repo.git
+        environment = _shaping_environment(repo, urls.get(path, ""), child)
+        proc = repo.git.submodule("update", "--progress", "--recursive", *options, "--", path,
+                                  as_process=True, with_stdout=False, env=environment)
+        _run_git_process(proc, child, config.stall_timeout, throttle="https_proxy" not in environment)
+        child.mark_complete()
+
+    print(f"正在更新 {len(paths)} 个子模块")
+    children = [monitor.create_child() for _ in paths]
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(config.submodule_jobs, len(paths)),
+                            thread_name_prefix="submodule") as executor:
+        futures = [executor.submit(update, path, child) for path, child in zip(paths, children)]
+        for path, future in zip(paths, futures):
+            try:
+                future.result()
+            except OperationCancelled:
+                pass
+            except Exception as e:
+                print(f"子模块 {path} 更新失败。错误: {e}")
+                failed.append(path)
+    monitor.check_cancelled()
+    if failed:
+        raise RuntimeError(f"以下子模块更新失败: {', '.join(failed)}")
+
+
+def _use_monitor(monitor: Optional[GitProgressMonitor]) -> GitProgressMonitor:
+    """使用调用方提供的进度监视器，未提供时新建，并设为当前全局监视器"""
+    global progress_monitor
+    progress_monitor = monitor or GitProgressMonitor()
+    return progress_monitor
 
 
-def clone_git_repo(config: GitConfig) -> bool:
+def clone_git_repo(config: GitConfig, monitor: Optional[GitProgressMonitor] = None) -> bool:
     """
     根据提供的配置克隆 Git 仓库。
 
+    克隆分三步进行：先下载提交和目录树，再分批补全文件内容，最后检出。
+    每一步完成的结果都会保留，中断或取消后再次调用会从中断处继续，
+    而不是从 0% 重新开始。
+    配置了快照地址时，先下载快照导入对象库，之后只需从快照的版本增量下载；
+    快照下载失败时直接从仓库下载，稀疏检出时不使用快照。
+    检出后并行下载子模块，进度汇总在同一个监视器中。
+
     参数:
         config (GitConfig): Git 配置对象。
+        monitor (GitProgressMonitor): 进度监视器，为 None 时新建。
 
     返回:
         bool: 克隆成功返回 True，否则返回 False。
     """
+    progress_monitor = _use_monitor(monitor)
     try:
-        print(f"正在克隆 Git 仓库: {config.git_url}")
-        # 重置进度监视器
-        global progress_monitor
-        progress_monitor = GitProgressMonitor()
-        
-        # 克隆仓库到指定路径，使用进度监视器
-        repo = Repo.clone_from(
-            config.git_url, 
-            config.git_path, 
-            branch=config.git_branch,
-            progress=progress_monitor
-        )
-        
-        # 确保进度数据显示为完成
-        with progress_monitor._lock:
-            progress_monitor.progress = 1.0
-            progress_monitor.received_objects = progress_monitor.total_objects or 100
-            progress_monitor.indexed_objects = progress_monitor.total_objects or 100
-            progress_monitor.last_update = time.time()
-            progress_monitor.stage = "完成"
-            progress_monitor._is_complete = True  # 设置显式完成标志
-        
-        print("Git 仓库克隆成功。")
-        return True
+        with repo_lock(config.git_path):
+            return _clone_git_repo(config, progress_monitor)
+    except OperationCancelled:
+        print("克隆已取消，已下载的内容保留在目标目录中。")
+        return False
     except Exception as e:
-        # 捕获异常并打印错误信息
+        # 捕获异常并打印错误信息，已下载的内容保留在目标目录中供下次继续
         print(f"克隆 Git 仓库失败。错误: {e}")
         return False
 
 
-def update_git_repo(config: GitConfig) -> bool:
+def _clone_git_repo(config: GitConfig, progress_monitor: GitProgressMonitor) -> bool:
+    """克隆仓库，调用方需持有仓库操作锁"""
+    print(f"正在克隆 Git 仓库: {config.git_url}")
+
+    repo = _open_clone_repo(config)
+    # 目录中是已安装的游戏但上次版本切换中断时，先恢复到切换前的版本，再按克隆流程检出
+    _recover_interrupted_update(repo)
+    state = _load_state(repo, CLONE_STATE_FILE)
+
+    # 第一步：下载提交和目录树，地址或分支变化时重新下载
+    commit = state.get("commit")
+    if not commit or state.get("url") != config.git_url or state.get("branch") != config.git_branch:
+        # 有快照时先导入快照，之后的下载只需从快照的版本增量协商
+        if config.snapshot_url and not config.sparse_paths and \
+                not _resolve_ref(repo, f"refs/remotes/origin/{config.git_branch}"):
+            _import_snapshot(repo, config, progress_monitor)
+        clone_options = get_clone_options(config)
+        print(f"克隆参数: {clone_options}")
+        _run_fetch(repo, config, progress_monitor,
+                   lambda: repo.git.fetch("origin", config.git_branch, progress=True,
+                                          as_process=True, with_stdout=False, **clone_options))
+        commit = repo.git.rev_parse(f"refs/remotes/origin/{config.git_branch}")
+        # 用引用保存已下载的提交，避免被回收，并在重新协商时告知服务器
+        repo.git.update_ref(CLONE_REF, commit)
+        state = {"url": config.git_url, "branch": config.git_branch, "commit": commit}
+        _save_state(repo, CLONE_STATE_FILE, state)
+
+    # 第二步：分批下载缺失的文件内容，每批完成后即写入对象库，稀疏检出时只下载范围内的文件
+    missing = _list_missing_objects(repo, commit, config.sparse_paths)
+    total = len(missing)
+    if total:
+        print(f"需要下载 {total} 个文件对象")
+    for start in range(0, total, HYDRATE_BATCH_SIZE):
+        progress_monitor.check_cancelled()
+        progress_monitor.start_batch(start, total)
+        _fetch_objects(repo, config, missing[start:start + HYDRATE_BATCH_SIZE], progress_monitor)
+
+    # 第三步：检出文件，之后的更新按普通方式拉取完整对象
+    progress_monitor.check_cancelled()
+    progress_monitor.set_stage("检出代码")
+    _apply_sparse_checkout(repo, config.sparse_paths)
+    repo.git.checkout("-f", "-B", config.git_branch, commit)
+    repo.git.branch("--set-upstream-to", f"origin/{config.git_branch}")
+    with repo.config_writer() as writer:
+        if writer.has_option('remote "origin"', "partialclonefilter"):
+            writer.remove_option('remote "origin"', "partialclonefilter")
+    repo.git.update_ref("-d", CLONE_REF)
+    _remove_state(repo, CLONE_STATE_FILE)
+    _update_submodules(repo, config, progress_monitor)
+
+    # 确保进度数据显示为完成
+    progress_monitor.mark_complete()
+    
+    print("Git 仓库克隆成功。")
+    return True
+
+
+def _import_snapshot(repo: Repo, config: GitConfig, monitor: GitProgressMonitor) -> bool:
+    """
+    下载快照并导入对象库，快照的提交作为远程分支的已知版本。
+
+    快照边下载边解压，包数据直接写入 git index-pack，由其解析增量和计算哈希，进度通过监视器显示。
+    快照只包含一个提交，导入后仓库为浅克隆。下载失败时放弃快照，由调用方直接从仓库下载。
+
+    返回:
+        bool: 是否成功导入
+
+    异常:
+        OperationCancelled: 操作被取消
+    """
+    scheduler = get_transfer_scheduler()
+
+    def on_read(amount: int):
+        monitor.check_cancelled()
+        scheduler.acquire(amount, monitor.priority)
+
+    print(f"正在下载快照: {config.snapshot_url}")
+    monitor.set_stage("下载快照")
+    try:
+        with open_snapshot(config.snapshot_url, on_read) as (meta, pack):
+            if meta.get("branch") != config.git_branch:
+                print(f"快照的分支 {meta.get('branch')} 与 {config.git_branch} 不同，不使用快照")
+                return False
+            proc = repo.git.index_pack("--stdin", "-v", istream=subprocess.PIPE, as_process=True,
+                                       with_stdout=False)
+            errors = []
+
+            def feed():
+                try:
+                    for data in iter(lambda: pack.read(READ_BLOCK_SIZE), b""):
+                        proc.proc.stdin.write(data)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    try:
+                        proc.proc.stdin.close()
+                    except OSError:
+                        pass
+
+            feeder = threading.Thread(target=feed, name="snapshot-feed", daemon=True)
+            feeder.start()
+            try:
+                _run_git_process(proc, monitor, config.stall_timeout, throttle=False)
+            finally:
+                feeder.join()
+            if errors:
+                raise errors[0]
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        if monitor.is_cancelled():
+            raise OperationCancelled("操作已取消") from e
+        print(f"快照下载失败，直接从仓库下载。错误: {e}")
+        return False
+
+    commit = meta["commit"]
+    # 快照只有这一个提交，标记为浅克隆边界，之后的下载和它增量协商
+    with open(os.path.join(repo.git_dir, "shallow"), 'a', encoding='utf-8') as f:
+        f.write(commit + "\n")
+    repo.git.update_ref(f"refs/remotes/origin/{config.git_branch}", commit)
+    print(f"快照导入完成: {meta.get('version') or commit[:8]}")
+    return True
+
+
+def has_interrupted_update(git_path: str) -> bool:
+    """
+    检查游戏目录是否有中断的版本切换
+
+    参数:
+        git_path (str): 仓库路径。
+
+    返回:
+        bool: 上次版本切换未完成（游戏文件可能不完整）时返回 True。
+    """
+    return os.path.exists(os.path.join(git_path, ".git", UPDATE_STATE_FILE))
+
+
+def _recover_interrupted_update(repo: Repo):
+    """将中断的版本切换恢复到切换前的版本"""
+    state = _load_state(repo, UPDATE_STATE_FILE)
+    if state.get("from"):
+        print(f"发现中断的版本切换，恢复到 {state['from'][:8]}")
+        repo.git.reset("--hard", state["from"])
+    _remove_state(repo, UPDATE_STATE_FILE)
+
+
+def recover_interrupted_update(git_path: str) -> bool:
+    """
+    恢复中断的版本切换，将游戏目录恢复到切换前的版本并清除标记。
+
+    参数:
+        git_path (str): 仓库路径。
+
+    返回:
+        bool: 恢复成功或没有中断的版本切换时返回 True，失败返回 False。
+    """
+    if not has_interrupted_update(git_path):
+        return True
+    try:
+        with repo_lock(git_path):
+            _recover_interrupted_update(open_repo(git_path))
+        return True
+    except Exception as e:
+        print(f"恢复中断的版本切换失败。错误: {e}")
+        return False
+
+
+def _verify_commit(repo: Repo, config: GitConfig, commit: str, monitor: GitProgressMonitor):
+    """
+    校验检出指定提交所需的对象都已在本地，缺失的对象（部分克隆时）先行下载，
+    保证之后的切换只是本地操作。
+    """
+    monitor.set_stage("校验更新")
+    repo.git.cat_file("-e", f"{commit}^{{tree}}")
+    missing = _list_missing_objects(repo, commit, config.sparse_paths)
+    for start in range(0, len(missing), HYDRATE_BATCH_SIZE):
+        monitor.check_cancelled()
+        monitor.start_batch(start, len(missing))
+        _fetch_objects(repo, config, missing[start:start + HYDRATE_BATCH_SIZE], monitor)
+    if _list_missing_objects(repo, commit, config.sparse_paths):
+        raise RuntimeError("更新文件不完整，校验失败")
+
+
+def _restore_paths(repo: Repo, previous: str, changes: List[List[str]]):
+    """
+    将更新涉及的文件恢复到切换前的版本，不触碰其他文件
+
+    参数:
+        previous: 切换前的提交
+        changes: diff --name-status 的结果，每项为 [状态, 路径]
+    """
+    repo.git.reset("-q", previous)
+    restore = [path for status, path in changes if status != "A"]
+    if restore:
+        repo.git.checkout(previous, "--", *restore)
+    for status, path in changes:
+        full_path = os.path.join(repo.working_tree_dir, path)
+        if status == "A" and os.path.exists(full_path):
+            os.remove(full_path)
+
+
+def _switch_to_commit(repo: Repo, branch: str, commit: str):
+    """
+    将游戏目录切换到指定提交，失败时将更新涉及的文件恢复到切换前的版本。
+
+    切换期间在 .git 目录中保留标记文件，进程意外退出时下次操作会先恢复原版本。
+    """
+    previous = repo.head.commit.hexsha
+    changes = [line.split("\t", 1) for line in
+               repo.git.diff("--name-status", "--no-renames", previous, commit).splitlines()]
+
+    # 玩家修改过的文件与更新冲突时拒绝切换，不覆盖玩家的修改；子模块由 _update_submodules 单独处理
+    modified = set(repo.git.diff("--name-only", "--ignore-submodules=all", "HEAD").splitlines())
+    conflicts = sorted(modified & {path for _, path in changes})
+    if conflicts:
+        raise RuntimeError(f"以下文件被本地修改，与更新冲突: {', '.join(conflicts[:5])}")
+
+    _save_state(repo, UPDATE_STATE_FILE, {"from": previous, "to": commit})
+    try:
+        if repo.head.is_detached or repo.active_branch.name != branch:
+            repo.git.checkout(branch)
+        repo.git.reset("--keep", commit)
+    except Exception:
+        print(f"切换版本失败，恢复到 {previous[:8]}")
+        _restore_paths(repo, previous, changes)
+        _remove_state(repo, UPDATE_STATE_FILE)
+        raise
+    _remove_state(repo, UPDATE_STATE_FILE)
+
+
+def _record_version(repo: Repo, commit: str, label: str, keep_versions: int):
+    """
+    将被替换的版本加入历史记录，并只保留最近 keep_versions 个
+
+    参数:
+        commit: 被替换版本的提交
+        label: 被替换版本的版本号
+        keep_versions: 保留的历史版本数
+    """
+    versions = [entry for entry in _load_state(repo, VERSIONS_FILE) or [] if entry.get("commit") != commit]
+    versions.insert(0, {"commit": commit, "version": label, "replaced_at": time.time()})
+    repo.git.update_ref(VERSION_REF_PREFIX + commit, commit)
+
+    for entry in versions[keep_versions:]:
+        repo.git.update_ref("-d", VERSION_REF_PREFIX + entry["commit"])
+    _save_state(repo, VERSIONS_FILE, versions[:keep_versions])
+
+
+def list_installed_versions(config: GitConfig) -> List[Dict]:
+    """
+    获取可回滚的历史版本
+
+    参数:
+        config (GitConfig): Git 配置对象。
+
+    返回:
+        List[Dict]: 历史版本列表，最近替换的在前，每项包含 commit、version、replaced_at。
+    """
+    try:
+        return _load_state(open_repo(config.git_path), VERSIONS_FILE) or []
+    except Exception as e:
+        print(f"读取历史版本失败: {e}")
+        return []
+
+
+def get_changelog(config: GitConfig, target: Optional[str] = None) -> Optional[Dict]:
+    """
+    列出当前版本与已下载的新版本之间的提交和变化的文件，用于更新对话框。
+
+    只读取本地已下载的提交和目录树，不连接服务器、不下载文件内容。
+    没有提交图时先写入，遍历长历史时使用其中的代数（generation number）尽早停止；
+    结果按 (旧提交, 新提交) 缓存在 .git 目录中。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+        target (str): 新版本的提交，默认为预下载的暂存版本，没有时为远程分支的最新版本。
+
+    返回:
+        Optional[Dict]: 包含 from、to、commits（每项包含 commit、summary、author、time）、total_commits、
+        files（每项包含 status 和 path）、total_files 和 truncated；新版本尚未下载（包括目标就是当前版本
+        或当前版本的祖先）或读取失败时返回 None。
+    """
+    try:
+        repo = open_repo(config.git_path)
+        current = repo.head.commit.hexsha
+        target = target or _resolve_ref(repo, STAGED_REF) or \
+            _resolve_ref(repo, f"refs/remotes/origin/{config.git_branch}")
+        if not target:
+            return None
+        target = repo.git.rev_parse("--verify", "--quiet", f"{target}^{{commit}}")
+        # 已经更新到目标版本（或比它更新）时没有可显示的更新
+        if target == current or repo.is_ancestor(target, current):
+            return None
+
+        key = f"{current}..{target}"
+        cache = _load_state(repo, CHANGELOG_CACHE_FILE)
+        if key in cache:
+            return cache[key]
+
+        # 浅克隆不支持提交图，其历史只有克隆之后的更新，本来就很短
+        info_dir = os.path.join(repo.git_dir, "objects", "info")
+        if not os.path.exists(os.path.join(repo.git_dir, "shallow")) and \
+                not any(os.path.exists(os.path.join(info_dir, name)) for name in ("commit-graph", "commit-graphs")):
+            try:
+                repo.git.commit_graph("write", "--reachable", "--split")
+            except GitCommandError as e:
+                # 维护任务可能正在写入提交图，不影响结果，只是遍历慢一些
+                print(f"写入提交图失败: {e}")
+
+        # --no-renames 只比较目录树，部分克隆中缺失的文件内容不会被按需下载
+        log = repo.git.log("--no-renames", "-z", f"--max-count={CHANGELOG_MAX_COMMITS}",
+                           "--format=%H%x1f%s%x1f%an%x1f%ct", key)
+        commits = []
+        for record in filter(None, log.split("\0")):
+            commit, summary, author, timestamp = record.strip("\n").split("\x1f")
+            commits.append({"commit": commit, "summary": summary, "author": author, "time": int(timestamp)})
+        total_commits = int(repo.git.rev_list("--count", key))
+
+        diff = repo.git.diff("--name-status", "--no-renames", "-z", current, target).split("\0")
+        files = [{"status": status, "path": path} for status, path in zip(diff[0::2], diff[1::2])]
+        result = {
+            "from": current,
+            "to": target,
+            "commits": commits,
+            "total_commits": total_commits,
+            "files": files[:CHANGELOG_MAX_FILES],
+            "total_files": len(files),
+            "truncated": total_commits > len(commits) or len(files) > CHANGELOG_MAX_FILES
+        }
+
+        # 只保留最近的几项，字典保持插入顺序
+        cache[key] = result
+        _save_state(repo, CHANGELOG_CACHE_FILE, dict(list(cache.items())[-CHANGELOG_CACHE_SIZE:]))
+        return result
+    except Exception as e:
+        print(f"读取更新日志失败: {e}")
+        return None
+
+
+def update_git_repo(config: GitConfig, monitor: Optional[GitProgressMonitor] = None, label: str = "") -> bool:
     """
     根据提供的配置更新 Git 仓库。
 
+    更新分阶段进行：先下载到暂存引用并校验，期间游戏目录不变，仍可启动旧版本；
+    下载和校验完成后再在本地切换到新版本，切换失败时回滚。
+    被替换的版本保留为历史版本，可通过 rollback_git_repo 立即回滚。
+    配置了增量包索引时优先从静态服务器下载增量包，没有可用的增量包链时直接从仓库下载。
+    切换版本后并行更新子模块；子模块更新失败时返回 False，再次更新会继续。
+
     参数:
         config (GitConfig): Git 配置对象。
+        monitor (GitProgressMonitor): 进度监视器，为 None 时新建。
+        label (str): 当前（被替换）版本的版本号，记录在历史版本中。
 
     返回:
         bool: 更新成功返回 True，否则返回 False。
     """
+    progress_monitor = _use_monitor(monitor)
     try:
-        print(f"正在更新 Git 仓库: {config.git_url}")
-        # 重置进度监视器
-        global progress_monitor
-        progress_monitor = GitProgressMonitor()
-        
-        # 使用 GitPython 打开仓库
-        repo = Repo(config.git_path)
-        # 切换到指定分支
-        repo.git.checkout(config.git_branch)
-        # 拉取远程仓库更新，使用进度监视器
-        repo.remotes.origin.pull(progress=progress_monitor)
-        
-        # 确保进度数据显示为完成
-        with progress_monitor._lock:
-            progress_monitor.progress = 1.0
-            progress_monitor.received_objects = progress_monitor.total_objects or 100
-            progress_monitor.indexed_objects = progress_monitor.total_objects or 100
-            progress_monitor.last_update = time.time()
-            progress_monitor.stage = "完成"
-            progress_monitor._is_complete = True  # 设置显式完成标志
-        
-        print("Git 仓库更新成功。")
-        return True
+        with repo_lock(config.git_path):
+            return _update_git_repo(config, progress_monitor, label)
+    except OperationCancelled:
+        print("更新已取消，游戏目录未改动。")
+        return False
     except Exception as e:
         # 捕获异常并打印错误信息
         print(f"更新 Git 仓库失败。错误: {e}")
         return False
 
 
+def _update_git_repo(config: GitConfig, progress_monitor: GitProgressMonitor, label: str) -> bool:
+    """更新仓库，调用方需持有仓库操作锁"""
+    print(f"正在更新 Git 仓库: {config.git_url}")
+    
+    repo = open_repo(config.git_path)
+    _recover_interrupted_update(repo)
+
+    # 第一步：下载更新，不改动游戏目录；目标提交已在本地（如回滚后再更新、已预下载）时不需要下载，
+    # 有可用的增量包时从静态服务器下载
+    if config.target_commit and _has_commit(repo, config.target_commit):
+        print(f"目标版本 {config.target_commit[:8]} 已在本地，无需下载")
+    elif not _fetch_bundles(repo, config, progress_monitor):
+        _run_fetch(repo, config, progress_monitor,
+                   lambda: repo.git.fetch("origin", config.git_branch, progress=True,
+                                          as_process=True, with_stdout=False, **get_fetch_options(config)))
+    if config.target_commit and _has_commit(repo, config.target_commit):
+        target = config.target_commit
+    else:
+        if config.target_commit:
+            print(f"分支中没有版本清单指定的提交 {config.target_commit[:8]}，更新到分支的最新提交")
+        target = repo.git.rev_parse(f"refs/remotes/origin/{config.git_branch}")
+    repo.git.update_ref(STAGED_REF, target)
+
+    # 第二步：校验更新完整
+    _verify_commit(repo, config, target, progress_monitor)
+
+    # 第三步：切换版本
+    progress_monitor.check_cancelled()
+    current = repo.head.commit.hexsha
+    if current != target:
+        progress_monitor.set_stage("切换版本")
+        _switch_to_commit(repo, config.git_branch, target)
+        _record_version(repo, current, label, config.keep_versions)
+    # 安装范围有变化时在新版本上增删文件，范围内的对象已在第二步下载
+    _apply_sparse_checkout(repo, config.sparse_paths)
+    repo.git.update_ref("-d", STAGED_REF)
+    # 子模块在主仓库切换后按新版本记录的提交更新；失败时再次更新会继续
+    _update_submodules(repo, config, progress_monitor)
+    
+    # 确保进度数据显示为完成
+    progress_monitor.mark_complete()
+    
+    print("Git 仓库更新成功。")
+    return True
+
+
+def rollback_git_repo(config: GitConfig, commit: Optional[str] = None, label: str = "") -> Optional[Dict]:
+    """
+    回滚到历史版本，所需对象都在本地，无需下载。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+        commit (str): 目标历史版本的提交，为 None 时回滚到最近替换的版本。
+        label (str): 当前版本的版本号，当前版本会加入历史版本以便再次切换回来。
+
+    返回:
+        Optional[Dict]: 回滚成功返回目标历史版本记录，否则返回 None。
+    """
+    try:
+        with repo_lock(config.git_path):
+            return _rollback_git_repo(config, commit, label)
+    except Exception as e:
+        print(f"回滚失败。错误: {e}")
+        return None
+
+
+def _rollback_git_repo(config: GitConfig, commit: Optional[str], label: str) -> Optional[Dict]:
+    """回滚仓库，调用方需持有仓库操作锁"""
+    repo = open_repo(config.git_path)
+    _recover_interrupted_update(repo)
+    versions = _load_state(repo, VERSIONS_FILE) or []
+    entry = next((item for item in versions if commit in (None, item["commit"])), None)
+    if entry is None:
+        print("没有可回滚的历史版本")
+        return None
+
+    current = repo.head.commit.hexsha
+    print(f"正在回滚到 {entry['version'] or entry['commit'][:8]}")
+    _switch_to_commit(repo, config.git_branch, entry["commit"])
+    repo.git.update_ref("-d", VERSION_REF_PREFIX + entry["commit"])
+    _save_state(repo, VERSIONS_FILE, [item for item in versions if item is not entry])
+    _record_version(repo, current, label, config.keep_versions)
+    _update_submodules(repo, config, GitProgressMonitor())
+    return entry
+
+
+def switch_sparse_checkout(config: GitConfig, monitor: Optional[GitProgressMonitor] = None) -> bool:
+    """
+    按配置中的稀疏检出规则切换安装范围。
+
+    只下载新范围内缺失的文件，工作区中只增删范围变化的部分，其他文件保持不动。
+
+    参数:
+        config (GitConfig): Git 配置对象，sparse_paths 为空时恢复检出全部文件。
+        monitor (GitProgressMonitor): 进度监视器，为 None 时新建。
+
+    返回:
+        bool: 切换成功返回 True，否则返回 False。
+    """
+    progress_monitor = _use_monitor(monitor)
+    try:
+        with repo_lock(config.git_path):
+            return _switch_sparse_checkout(config, progress_monitor)
+    except OperationCancelled:
+        print("切换安装范围已取消，游戏目录未改动。")
+        return False
+    except Exception as e:
+        print(f"切换安装范围失败。错误: {e}")
+        return False
+
+
+def _switch_sparse_checkout(config: GitConfig, progress_monitor: GitProgressMonitor) -> bool:
+    """切换安装范围，调用方需持有仓库操作锁"""
+    repo = open_repo(config.git_path)
+    _recover_interrupted_update(repo)
+    # 先下载新范围内缺失的文件，之后的增删只是本地操作
+    _verify_commit(repo, config, repo.head.commit.hexsha, progress_monitor)
+    progress_monitor.check_cancelled()
+    progress_monitor.set_stage("检出代码")
+    _apply_sparse_checkout(repo, config.sparse_paths)
+    _update_submodules(repo, config, progress_monitor)
+    progress_monitor.mark_complete()
+    print("安装范围切换成功。")
+    return True
+
+
+def _fetch_bundles(repo: Repo, config: GitConfig, monitor: GitProgressMonitor, target: str = "") -> bool:
+    """
+    从静态服务器下载增量包链并导入，远程分支的引用更新到索引中的最新版本。
+
+    从本地已有的版本（远程分支的引用、已下载的暂存版本或当前版本）中选择增量包链最短的一个。
+    没有配置增量包、索引不可用、本地版本不在链上或已是索引中的最新版本时返回 False，
+    由调用方直接从仓库下载。下载的增量包保存在 .git 目录下，中断后继续下载。
+
+    参数:
+        target: 已知的远程最新版本，索引中的最新版本与之不同时不使用增量包
+
+    返回:
+        bool: 是否已通过增量包更新
+
+    异常:
+        OperationCancelled: 操作被取消
+    """
+    if not config.bundle_url:
+        return False
+    try:
+        index = fetch_bundle_index(config.bundle_url)
+    except Exception as e:
+        print(f"读取增量包索引失败，直接从仓库下载。错误: {e}")
+        return False
+    if index.get("branch") != config.git_branch or (target and index.get("head") != target):
+        return False
+    chains = [plan_bundle_chain(index, commit) for commit in
+              (_resolve_ref(repo, f"refs/remotes/origin/{config.git_branch}"), _resolve_ref(repo, STAGED_REF),
+               repo.head.commit.hexsha) if commit]
+    chain = min((chain for chain in chains if chain is not None), key=len, default=None)
+    if not chain:
+        # 已是索引中的最新版本时仍从仓库下载，仓库可能有更新的版本
+        return False
+
+    total = sum(entry["bytes"] for entry in chain)
+    print(f"使用 {len(chain)} 个增量包更新，共 {total} 字节")
+    directory = os.path.join(repo.git_dir, BUNDLE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    scheduler = get_transfer_scheduler()
+    received = 0
+    try:
+        for done, entry in enumerate(chain):
+            monitor.set_stage("下载增量包")
+
+            def on_read(amount: int):
+                nonlocal received
+                monitor.check_cancelled()
+                scheduler.acquire(amount, monitor.priority)
+                received += amount
+                monitor.set_bytes(received, total, done, len(chain))
+            download_bundle(urllib.parse.urljoin(config.bundle_url, entry["file"]), entry,
+                            os.path.join(directory, entry["file"]), on_read)
+
+        for entry in chain:
+            monitor.check_cancelled()
+            monitor.set_stage("导入增量包")
+            path = os.path.join(directory, entry["file"])
+            # 与从仓库下载相同，导入后更新远程分支的引用
+            proc = repo.git.fetch(path, f"+refs/heads/{config.git_branch}:refs/remotes/origin/{config.git_branch}",
+                                  progress=True, recurse_submodules="no", as_process=True, with_stdout=False)
+            _run_git_process(proc, monitor, throttle=False)
+            imported = repo.git.rev_parse(f"refs/remotes/origin/{config.git_branch}")
+            if imported != entry["to"]:
+                raise RuntimeError(f"增量包 {entry['file']} 的版本 {imported[:8]} 与索引不符")
+            os.remove(path)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        if monitor.is_cancelled():
+            raise OperationCancelled("操作已取消") from e
+        print(f"增量包更新失败，直接从仓库下载。错误: {e}")
+        return False
+    _remove_tree(directory)
+    return True
+
+
+def prefetch_git_repo(config: GitConfig) -> Optional[bool]:
+    """
+    在后台预下载远程的新版本到暂存引用，之后的更新只需在本地切换。
+
+    Git 进程以较低优先级运行；有前台操作时不启动，前台操作开始时会被取消。
+    游戏目录和当前版本不会改动。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+
+    返回:
+        Optional[bool]: 已预下载新版本返回 True，没有新版本返回 False，
+        仓库忙、被取消或失败返回 None。
+    """
+    monitor = GitProgressMonitor()
+    monitor.low_priority = True
+    try:
+        with repo_lock(config.git_path, background=monitor) as acquired:
+            if not acquired:
+                print("仓库正被其他操作使用，跳过预下载")
+                return None
+            repo = open_repo(config.git_path)
+            if os.path.exists(os.path.join(repo.git_dir, UPDATE_STATE_FILE)):
+                return None
+
+            # 先用 ls-remote 比较远程版本，无新版本时不进行协商
+            if repo.remotes.origin.url != config.mirror_urls[0]:
+                repo.remotes.origin.set_url(config.mirror_urls[0])
+            output = repo.git.ls_remote("origin", f"refs/heads/{config.git_branch}")
+            remote = output.split()[0] if output else ""
+            staged = _resolve_ref(repo, STAGED_REF)
+            if not remote or remote == repo.head.commit.hexsha:
+                return False
+            if remote == staged:
+                return True
+
+            print(f"正在后台预下载新版本: {remote[:8]}")
+            if not _fetch_bundles(repo, config, monitor, remote):
+                _run_fetch(repo, config, monitor,
+                           lambda: repo.git.fetch("origin", config.git_branch, progress=True,
+                                                  as_process=True, with_stdout=False,
+                                                  **get_fetch_options(config)))
+            target = repo.git.rev_parse(f"refs/remotes/origin/{config.git_branch}")
+            _verify_commit(repo, config, target, monitor)
+            repo.git.update_ref(STAGED_REF, target)
+            print("新版本预下载完成")
+            return True
+    except OperationCancelled:
+        print("预下载已取消")
+        return None
+    except Exception as e:
+        print(f"预下载失败。错误: {e}")
+        return None
+
+
+def estimate_git_update(config: GitConfig) -> Optional[Dict]:
+    """
+    估算更新到远程最新版本需要下载的文件数和字节数，不下载文件内容。
+
+    只下载新版本的提交和目录树（浅克隆、不含文件内容，通常只有几百 KB）到 .git 中的临时仓库，
+    临时仓库通过 alternates 使用本地对象库，由此得到本地缺少的文件对象，用后删除；
+    游戏仓库本身不变，之后的更新仍按原方式下载。已预下载的新版本直接在本地比较。
+    目录树不包含文件大小，字节数按游戏目录中同一路径旧文件的大小估算，新增文件按平均大小估算。
+    结果按远程提交、当前版本和安装范围缓存，远程没有变化时只需一次 ls-remote。
+
+    与预下载相同，以较低优先级在后台模式下运行，仓库忙时不等待。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+
+    返回:
+        Optional[Dict]: remote（远程提交）、objects（需要下载的文件数）、bytes（估算的字节数）
+        和 exact（字节数是否精确，这里为 False）；仓库忙、被取消或失败时返回 None。
+    """
+    monitor = GitProgressMonitor()
+    monitor.low_priority = True
+    try:
+        with repo_lock(config.git_path, background=monitor) as acquired:
+            if not acquired:
+                print("仓库正被其他操作使用，跳过更新大小估算")
+                return None
+            return _estimate_git_update(config, monitor)
+    except OperationCancelled:
+        return None
+    except Exception as e:
+        print(f"估算更新大小失败。错误: {e}")
+        return None
+
+
+def _estimate_git_update(config: GitConfig, monitor: GitProgressMonitor) -> Optional[Dict]:
+    """估算更新大小，调用方需持有仓库操作锁"""
+    repo = open_repo(config.git_path)
+    if repo.remotes.origin.url != config.mirror_urls[0]:
+        repo.remotes.origin.set_url(config.mirror_urls[0])
+    output = repo.git.ls_remote("origin", f"refs/heads/{config.git_branch}")
+    remote = output.split()[0] if output else ""
+    if not remote:
+        return None
+    current = repo.head.commit.hexsha
+    key = {"remote": remote, "head": current, "sparse": config.sparse_paths}
+    cached = _load_state(repo, ESTIMATE_STATE_FILE)
+    if cached.get("key") == key:
+        return cached["estimate"]
+
+    if remote == current:
+        missing, blobs = [], []
+    elif remote in (_resolve_ref(repo, STAGED_REF), _resolve_ref(repo, f"refs/remotes/origin/{config.git_branch}")):
+        # 目录树已在本地
+        missing = _list_missing_objects(repo, remote, config.sparse_paths)
+        blobs = _list_blobs(repo, remote)
+    else:
+        missing, blobs = _negotiate_tree(repo, config, monitor)
+
+    estimate = {
+        "remote": remote,
+        "objects": len(missing),
+        "bytes": _estimate_blob_bytes(repo, set(missing), blobs),
+        "exact": False
+    }
+    _save_state(repo, ESTIMATE_STATE_FILE, {"key": key, "estimate": estimate})
+    return estimate
+
+
+def _negotiate_tree(repo: Repo, config: GitConfig,
+                    monitor: GitProgressMonitor) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    在临时仓库中只下载远程版本的提交和目录树
+
+    返回:
+        本地缺少的文件对象，以及远程版本的全部 (对象, 路径)
+    """
+    temp_path = os.path.join(repo.git_dir, ESTIMATE_REPO_DIR)
+    _remove_tree(temp_path)
+    temp_config = GitConfig(config.git_url, config.git_branch, temp_path, mirror_urls=list(config.mirror_urls),
+                            stall_timeout=config.stall_timeout, on_mirror_failed=config.on_mirror_failed)
+    try:
+        temp = _open_clone_repo(temp_config)
+        with open(os.path.join(temp.git_dir, "objects", "info", "alternates"), 'w', encoding='utf-8') as f:
+            f.write(os.path.join(os.path.abspath(repo.git_dir), "objects") + "\n")
+        _run_fetch(temp, temp_config, monitor,
+                   lambda: temp.git.fetch("origin", config.git_branch, progress=True, depth=1, no_tags=True,
+                                          filter=RESUMABLE_CLONE_FILTER, as_process=True, with_stdout=False))
+        # ls-remote 之后远程可能又有新版本，按实际下载的版本估算
+        fetched = temp.git.rev_parse(f"refs/remotes/origin/{config.git_branch}")
+        return _list_missing_objects(temp, fetched, config.sparse_paths), _list_blobs(temp, fetched)
+    finally:
+        _remove_tree(temp_path)
+
+
+def _list_blobs(repo: Repo, commit: str) -> List[Tuple[str, str]]:
+    """列出提交中的全部文件，返回 (对象, 路径)，只读取目录树"""
+    output = repo.git.ls_tree("-r", "-z", "--full-tree", commit, strip_newline_in_stdout=False)
+    blobs = []
+    for entry in output.split("\0"):
+        info, _, path = entry.partition("\t")
+        fields = info.split()
+        if len(fields) == 3 and fields[1] == "blob":
+            blobs.append((fields[2], path))
+    return blobs
+
+
+def _estimate_blob_bytes(repo: Repo, missing: set, blobs: List[Tuple[str, str]]) -> int:
+    """按游戏目录中同一路径旧文件的大小估算缺少的对象的总大小，没有旧文件的按平均大小估算"""
+    sizes = {}
+    for object_id, path in blobs:
+        try:
+            sizes[path] = os.path.getsize(os.path.join(repo.working_tree_dir, path))
+        except OSError:
+            continue
+    average = sum(sizes.values()) / len(sizes) if sizes else 0
+    total = 0
+    counted = set()
+    for object_id, path in blobs:
+        if object_id in missing and object_id not in counted:
+            counted.add(object_id)
+            total += sizes.get(path, average)
+    return int(total)
+
+
+def _remove_tree(path: str):
+    """删除目录，包括 Git 设为只读的对象文件"""
+    def on_error(func, target, _):
+        os.chmod(target, stat.S_IWRITE)
+        func(target)
+
+    if os.path.exists(path):
+        shutil.rmtree(path, onerror=on_error)
+
+
+def _resolve_ref(repo: Repo, ref: str) -> str:
+    """读取引用指向的提交，引用不存在时返回空字符串"""
+    try:
+        return repo.git.rev_parse("--verify", "--quiet", ref)
+    except Exception:
+        return ""
+
+
+def has_staged_update(git_path: str) -> bool:
+    """
+    是否有已预下载、尚未切换的新版本。
+
+    参数:
+        git_path (str): 仓库路径。
+
+    返回:
+        bool: 暂存引用存在且不同于当前版本时返回 True。
+    """
+    try:
+        repo = open_repo(git_path)
+        staged = _resolve_ref(repo, STAGED_REF)
+        return bool(staged) and staged != repo.head.commit.hexsha
+    except Exception:
+        return False
+
+
 def get_git_progress() -> Dict:
     """
     获取Git操作的当前进度
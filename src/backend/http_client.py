@@ -0,0 +1,465 @@
+"""
+共享的 HTTP 客户端
+
+后端所有 HTTP 请求都通过这里的 HttpClient 发出：
+- 使用同一个 requests 会话，按主机复用连接（keep-alive），避免每次请求都重新建立 TCP/TLS 连接；
+- 所有请求都有默认超时；GET/HEAD 请求在连接失败或服务器返回 429/5xx 时按指数退避重试；
+- get_cached 对小文件（版本号、索引等）使用磁盘缓存，遵循 Cache-Control/Expires 判断是否新鲜，
+  过期后用 ETag/Last-Modified 条件请求验证，未变化时服务器只返回 304；
+  在 stale-while-revalidate 期间直接返回旧内容并在后台验证，网络不可用时返回旧内容；
+- 同时发出的相同请求只发送一次，其他调用方等待并共享结果（single-flight）；
+- 按主机熔断：连续因网络错误失败后，熔断期间的请求直接失败，不再等待超时；
+  按关键地址（版本文件的各镜像）所在主机的状态判断是否离线，供界面提示和跳过不必要的网络操作，
+  镜像测速等其他请求失败不影响网络状态。
+"""
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 磁盘缓存目录
+HTTP_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.minemcupdater', 'http-cache')
+# 默认超时(秒)：连接超时和读取超时；网络不通时由连接超时决定多快失败
+DEFAULT_TIMEOUT = (3, 30)
+# GET/HEAD 请求的重试次数和退避系数（等待 0.5、1、2 秒...）
+DEFAULT_RETRIES = 3
+# 连接失败的重试次数，少于其他错误，网络不通时尽快失败
+CONNECT_RETRIES = 1
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# 每个主机保持的连接数
+POOL_SIZE = 10
+# 同一主机连续因网络错误失败该次数后熔断
+BREAKER_THRESHOLD = 2
+# 熔断时间(秒)，试探请求失败后加倍，不超过上限
+BREAKER_COOLDOWN = 10
+BREAKER_MAX_COOLDOWN = 300
+# 只缓存不超过该大小的响应
+MAX_CACHED_BYTES = 1024 * 1024
+# 缓存中保存的响应头
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date")
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """解析 Cache-Control 头，返回指令名（小写）到值的字典，没有值的指令值为 None"""
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """主机已熔断，请求没有发出"""
+
+
+class CircuitBreaker:
+    """
+    按主机的熔断器
+
+    同一主机的请求连续因网络错误（连接失败、超时）失败 threshold 次后熔断，熔断期间的请求直接抛出
+    CircuitOpenError；熔断时间过后放行一个试探请求，成功则恢复，失败则熔断时间加倍。
+    服务器返回错误状态码说明网络是通的，不计为失败。
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN,
+                 max_cooldown: float = BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        # 主机 -> {failures, cooldown, open_until, probing}，只记录最近失败过的主机
+        self._hosts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host: str):
+        """
+        请求前检查主机是否可用
+        Raises:
+            CircuitOpenError: 主机已熔断，或熔断后的试探请求尚未完成
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state["open_until"] is None:
+                return
+            remaining = state["open_until"] - time.monotonic()
+            if remaining > 0 or state["probing"]:
+                raise CircuitOpenError(f"{host} 暂时无法连接，{max(remaining, 0):.0f} 秒后重试")
+            state["probing"] = True
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str):
+        with self._lock:
+            state = self._hosts.setdefault(host, {"failures": 0, "cooldown": 0, "open_until": None,
+                                                  "probing": False})
+            state["failures"] += 1
+            probing, state["probing"] = state["probing"], False
+            if probing or state["failures"] >= self.threshold:
+                state["cooldown"] = min(state["cooldown"] * 2, self.max_cooldown) if state["cooldown"] \
+                    else self.cooldown
+                state["open_until"] = time.monotonic() + state["cooldown"]
+                logger.warning(f"{host} 连续 {state['failures']} 次连接失败，{state['cooldown']:.0f} 秒内不再请求")
+
+    def is_failing(self, host: str) -> bool:
+        """主机最近的请求是否因网络错误失败（之后还没有成功的请求）"""
+        with self._lock:
+            return host in self._hosts
+
+    def open_hosts(self) -> List[str]:
+        """正在熔断的主机"""
+        now = time.monotonic()
+        with self._lock:
+            return [host for host, state in self._hosts.items()
+                    if state["open_until"] is not None and state["open_until"] > now]
+
+
+class ConnectivityMonitor:
+    """网络状态，由 HttpClient.update_connectivity 按关键地址所在主机的状态更新"""
+
+    def __init__(self):
+        self.online = True
+        # 状态变化的时间
+        self.since = time.time()
+
+    def record(self, ok: bool):
+        if ok != self.online:
+            self.online = ok
+            self.since = time.time()
+            logger.info("网络已恢复" if ok else "网络不可用，进入离线模式")
+
+
+class _Flight:
+    """一次进行中的请求，等待者共享其结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class HttpCache:
+    """
+    HTTP 响应的磁盘缓存，每个地址保存为元数据（.json）和内容（.body）两个文件
+
+    元数据包含状态码、部分响应头、保存时间、新鲜期(秒)和 stale-while-revalidate 期(秒)。
+    """
+
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def load(self, url: str) -> Optional[Dict]:
+        """读取缓存的响应，不存在或损坏时返回 None"""
+        path = self._path(url)
+        try:
+            with open(path + ".json", 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(path + ".body", 'rb') as f:
+                entry["content"] = f.read()
+            return entry if entry.get("url") == url else None
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url: str, entry: Dict):
+        """原子地保存响应，先写内容再写元数据，元数据存在时内容一定完整"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(url)
+        metadata = {key: value for key, value in entry.items() if key != "content"}
+        try:
+            if "content" in entry:
+                with open(path + ".body.tmp", 'wb') as f:
+                    f.write(entry["content"])
+                os.replace(path + ".body.tmp", path + ".body")
+            with open(path + ".json.tmp", 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, ensure_ascii=False)
+            os.replace(path + ".json.tmp", path + ".json")
+        except OSError as e:
+            logger.warning(f"保存 HTTP 缓存失败: {e}")
+
+    def remove(self, url: str):
+        path = self._path(url)
+        for suffix in (".json", ".body"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+
+class HttpClient:
+    """
+    共享的 HTTP 客户端
+
+    Attributes:
+        session: 带重试的会话，GET/HEAD 请求失败时自动重试
+        cache: 磁盘缓存
+        breaker: 按主机的熔断器
+        connectivity: 网络状态
+    """
+
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, timeout=DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                 pool_size: int = POOL_SIZE):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录
+            timeout: 未指定超时的请求使用的超时(秒)，可以是 (连接超时, 读取超时)
+            retries: GET/HEAD 请求的最大重试次数
+            pool_size: 每个主机保持的连接数
+        """
+        self.timeout = timeout
+        self.cache = HttpCache(cache_dir)
+        retry = Retry(total=retries, connect=min(retries, CONNECT_RETRIES), read=retries, status=retries, backoff_factor=RETRY_BACKOFF,
+                      status_forcelist=RETRY_STATUS, allowed_methods=frozenset({"GET", "HEAD"}),
+                      respect_retry_after_header=True, raise_on_status=False)
+        self.session = self._create_session(retry, pool_size)
+        # 不重试的会话，用于测速等需要立即得到结果的请求
+        self._single_try = self._create_session(Retry(total=0, raise_on_status=False), pool_size)
+        self.breaker = CircuitBreaker()
+        self.connectivity = ConnectivityMonitor()
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+
+    @staticmethod
+    def _create_session(retry: Retry, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, method: str, url: str, retry: bool = True, **kwargs) -> requests.Response:
+        """
+        发送请求，参数与 requests.request 相同，未指定 timeout 时使用默认超时
+        Args:
+            retry: 失败时是否重试（只对 GET/HEAD 有效）
+        Raises:
+            CircuitOpenError: 主机已熔断，请求没有发出（是 requests.ConnectionError 的子类）
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        host = urllib.parse.urlsplit(url).netloc
+        self.breaker.before_request(host)
+        try:
+            response = (self.session if retry else self._single_try).request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.breaker.record_failure(host)
+            raise
+        except Exception:
+            # 其他错误（重定向过多、地址无效等）与网络是否可用无关，结束可能进行中的试探
+            self.breaker.record_success(host)
+            raise
+        self.breaker.record_success(host)
+        return response
+
+    @property
+    def online(self) -> bool:
+        """网络是否可用"""
+        return self.connectivity.online
+
+    def update_connectivity(self, urls: List[str]) -> bool:
+        """
+        按关键地址所在主机的状态更新网络状态：任一主机最近的请求没有因网络错误失败时视为在线。
+        只看这些主机，其他主机（如失效的镜像）不可用不会进入离线模式；
+        地址的内容来自新鲜的缓存时，说明最近的请求成功，也视为在线
+        Args:
+            urls: 关键地址，如版本文件的各镜像地址
+        Returns:
+            是否在线
+        """
+        hosts = {urllib.parse.urlsplit(url).netloc for url in urls}
+        if hosts:
+            self.connectivity.record(any(not self.breaker.is_failing(host) for host in hosts))
+        return self.connectivity.online
+
+    def network_status(self) -> Dict:
+        """
+        网络状态
+        Returns:
+            包含 online（是否在线）、since（状态变化的时间戳）和 unavailableHosts（正在熔断的主机）的字典
+        """
+        return {"online": self.connectivity.online, "since": self.connectivity.since,
+                "unavailableHosts": self.breaker.open_hosts()}
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def single_flight(self, key: str, function: Callable[[], object]):
+        """
+        同一时刻相同 key 的调用只执行一次 function，其他调用方等待并得到相同的结果或异常
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = function()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def get_cached(self, url: str, ttl: float = 0, stale_while_revalidate: float = 0, **kwargs) -> requests.Response:
+        """
+        带磁盘缓存的 GET 请求，用于版本号、索引等小文件
+
+        服务器的 Cache-Control（max-age、no-cache、no-store、stale-while-revalidate）和 Expires 优先，
+        没有这些信息时新鲜期为 ttl 秒。新鲜的缓存直接返回；过期后发送条件请求，
+        未变化时只更新缓存的时间；在 stale-while-revalidate 期间先返回旧内容，后台验证。
+        请求失败时有缓存则返回旧内容。同时发出的相同请求只发送一次。
+
+        Args:
+            url: 地址
+            ttl: 服务器未指定时的新鲜期(秒)，0 表示每次都验证
+            stale_while_revalidate: 服务器未指定时，过期后仍可直接返回旧内容的时间(秒)
+            **kwargs: 传给 requests 的其他参数，如 headers、timeout
+        Returns:
+            响应，来自缓存时 from_cache 属性为 True，因请求失败返回旧内容时 stale 属性也为 True
+        Raises:
+            requests.RequestException: 请求失败且没有缓存
+        """
+        entry = self.cache.load(url)
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age < entry["max_age"]:
+                return self._cached_response(entry)
+            if age < entry["max_age"] + entry["stale_while_revalidate"]:
+                threading.Thread(target=self._revalidate_quietly, args=(url, ttl, stale_while_revalidate, kwargs),
+                                 name="http-revalidate", daemon=True).start()
+                return self._cached_response(entry)
+        return self.single_flight("GET " + url, lambda: self._fetch_cached(url, ttl, stale_while_revalidate, kwargs))
+
+    def _revalidate_quietly(self, url: str, ttl: float, stale_while_revalidate: float, kwargs: Dict):
+        try:
+            self.single_flight("GET " + url, lambda: self._fetch_cached(url, ttl, stale_while_revalidate, kwargs))
+        except Exception as e:
+            logger.info(f"后台验证 {url} 失败: {e}")
+
+    def _fetch_cached(self, url: str, ttl: float, stale_while_revalidate: float, kwargs: Dict) -> requests.Response:
+        """发送（条件）请求并更新缓存"""
+        entry = self.cache.load(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        try:
+            # 有缓存可以返回时不重试，网络不可用时尽快返回缓存的内容
+            response = self.get(url, headers=headers, retry=entry is None, **kwargs)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            logger.warning(f"请求 {url} 失败，使用缓存的内容: {e}")
+            return self._cached_response(entry, stale=True)
+
+        if response.status_code == 304 and entry is not None:
+            # 未变化，按新的响应头更新新鲜期
+            entry["headers"].update({name: response.headers[name] for name in CACHED_HEADERS
+                                     if name in response.headers})
+            entry.update(stored_at=time.time(),
+                         **self._freshness(entry["headers"], ttl, stale_while_revalidate))
+            content = entry.pop("content")
+            self.cache.store(url, entry)
+            entry["content"] = content
+            return self._cached_response(entry)
+        if response.status_code >= 500 and entry is not None:
+            logger.warning(f"请求 {url} 返回 {response.status_code}，使用缓存的内容")
+            return self._cached_response(entry, stale=True)
+
+        response.from_cache = False
+        response.stale = False
+        directives = _parse_cache_control(response.headers.get("Cache-Control", ""))
+        if response.status_code == 200 and "no-store" not in directives and \
+                response.headers.get("Vary", "") != "*" and len(response.content) <= MAX_CACHED_BYTES:
+            kept = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            self.cache.store(url, {"url": url, "status": 200, "headers": kept, "stored_at": time.time(),
+                                   "content": response.content,
+                                   **self._freshness(kept, ttl, stale_while_revalidate)})
+        return response
+
+    @staticmethod
+    def _freshness(headers: Dict[str, str], ttl: float, stale_while_revalidate: float) -> Dict[str, float]:
+        """按响应头计算新鲜期和 stale-while-revalidate 期(秒)"""
+        directives = _parse_cache_control(headers.get("Cache-Control", ""))
+        max_age = _seconds(directives.get("max-age"))
+        if max_age is None and headers.get("Expires"):
+            try:
+                expires = email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+                date = email.utils.parsedate_to_datetime(headers["Date"]).timestamp() \
+                    if headers.get("Date") else time.time()
+                max_age = max(expires - date, 0.0)
+            except (TypeError, ValueError):
+                # 无效的 Expires 视为已过期
+                max_age = 0.0
+        if max_age is None:
+            max_age = ttl
+        if "no-cache" in directives:
+            max_age = 0.0
+        swr = _seconds(directives.get("stale-while-revalidate"))
+        return {"max_age": max_age, "stale_while_revalidate": stale_while_revalidate if swr is None else swr}
+
+    @staticmethod
+    def _cached_response(entry: Dict, stale: bool = False) -> requests.Response:
+        """由缓存构造响应对象，stale 表示因请求失败而返回的旧内容"""
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.url = entry["url"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = entry["content"]
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+        response.from_cache = True
+        response.stale = stale
+        return response
+
+
+# 全局客户端实例
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """
+    获取共享的 HTTP 客户端（单例模式）
+    Returns:
+        HTTP 客户端
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
@@ -0,0 +1,258 @@
+"""
+游戏文件完整性校验与修复
+
+按 HEAD 中记录的 blob 哈希并行校验工作区文件，只恢复不一致的文件。
+文件的 stat 信息（大小、修改时间、inode）与上次校验通过时相同则跳过哈希计算，
+结果缓存在 .git 目录中，多次校验时只需计算变化过的文件。
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from git import Repo
+
+from git_handler import (GitConfig, GitProgressMonitor, OperationCancelled, open_repo, repo_lock,
+                         sparse_checkout_enabled)
+
+# stat 缓存文件，位于 .git 目录下
+STAT_CACHE_FILE = "minemc-stat-cache.json"
+# 读取文件的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+# 校验开始前多少秒内修改过的文件不写入缓存(秒)
+RACY_WINDOW = 2
+# 每校验多少个文件更新一次进度
+PROGRESS_STEP = 64
+
+# 符号链接和子模块在树中的模式
+_SYMLINK_MODE = "120000"
+_GITLINK_MODE = "160000"
+
+
+def _list_tree(repo: Repo) -> List[Tuple[str, str, str]]:
+    """
+    列出 HEAD 中的文件，稀疏检出时不含安装范围外的文件
+
+    返回:
+        List[Tuple[str, str, str]]: 每项为 (模式, blob 哈希, 路径)，不含子模块
+    """
+    output = repo.git.ls_tree("-r", "-z", "--full-tree", "HEAD", strip_newline_in_stdout=False)
+    skipped = _list_skipped(repo)
+    entries = []
+    for record in output.split("\0"):
+        if not record:
+            continue
+        info, path = record.split("\t", 1)
+        mode, _, sha = info.split(" ")
+        if mode != _GITLINK_MODE and path not in skipped:
+            entries.append((mode, sha, path))
+    return entries
+
+
+def _list_skipped(repo: Repo) -> Set[str]:
+    """列出稀疏检出范围外（标记为 skip-worktree）的文件"""
+    if not sparse_checkout_enabled(repo):
+        return set()
+    output = repo.git.ls_files("-t", "-z", strip_newline_in_stdout=False)
+    return {record[2:] for record in output.split("\0") if record.startswith("S ")}
+
+
+def _hash_blob(full_path: str, mode: str) -> str:
+    """
+    按 Git 的 blob 格式计算文件哈希
+
+    参数:
+        full_path: 文件路径
+        mode: 文件在树中的模式
+
+    返回:
+        str: blob 哈希，文件不存在时返回空字符串
+    """
+    try:
+        if mode == _SYMLINK_MODE and os.path.islink(full_path):
+            data = os.fsencode(os.readlink(full_path))
+            return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+        size = os.path.getsize(full_path)
+        digest = hashlib.sha1(b"blob %d\0" % size)
+        with open(full_path, "rb") as f:
+            # 大于 2KB 的数据块计算哈希时会释放 GIL，多个线程可并行计算
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return ""
+
+
+def _stat_key(full_path: str) -> Optional[List[int]]:
+    """文件的 stat 信息，文件不存在时返回 None"""
+    try:
+        st = os.lstat(full_path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _is_cacheable(stat: Optional[List[int]], started: float) -> bool:
+    """
+    校验开始前不久被修改的文件不写入缓存：之后在同一时间戳内再次修改时
+    stat 信息可能不变，缓存会掩盖这次修改
+    """
+    return stat is not None and stat[1] / 1e9 < started - RACY_WINDOW
+
+
+def _load_stat_cache(repo: Repo) -> Dict[str, List]:
+    """读取 stat 缓存，每项为 [大小, 修改时间, inode, blob 哈希]"""
+    try:
+        with open(os.path.join(repo.git_dir, STAT_CACHE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_stat_cache(repo: Repo, cache: Dict[str, List]):
+    """原子地写入 stat 缓存"""
+    path = os.path.join(repo.git_dir, STAT_CACHE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(path + ".tmp", path)
+
+
+def _confirm_with_filters(repo: Repo, paths: List[str], expected: Dict[str, str]) -> List[str]:
+    """
+    对哈希不一致的文件用 git hash-object 重新计算，应用换行符转换等过滤器，
+    排除 autocrlf 等设置造成的误报
+
+    返回:
+        List[str]: 仍然不一致的路径
+    """
+    existing = [path for path in paths if os.path.isfile(os.path.join(repo.working_tree_dir, path))]
+    if not existing:
+        return paths
+    with tempfile.TemporaryFile() as stdin:
+        stdin.write("\n".join(existing).encode("utf-8") + b"\n")
+        stdin.seek(0)
+        output = repo.git.hash_object("--stdin-paths", istream=stdin)
+    hashes = dict(zip(existing, output.split()))
+    return [path for path in paths if hashes.get(path) != expected[path]]
+
+
+def _restore_files(repo: Repo, paths: List[str]):
+    """从 HEAD 恢复指定文件，不触碰其他文件"""
+    with tempfile.NamedTemporaryFile("wb", delete=False) as f:
+        f.write(b"\0".join(path.encode("utf-8") for path in paths))
+        pathspec_file = f.name
+    try:
+        repo.git.checkout("-f", "HEAD", f"--pathspec-from-file={pathspec_file}", "--pathspec-file-nul")
+    finally:
+        os.remove(pathspec_file)
+
+
+def verify_git_repo(config: GitConfig, monitor: Optional[GitProgressMonitor] = None,
+                    repair: bool = True, full: bool = False, workers: int = 0) -> Optional[Dict]:
+    """
+    校验工作区文件与 HEAD 一致，并修复不一致的文件。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+        monitor (GitProgressMonitor): 进度监视器，为 None 时新建。
+        repair (bool): 是否从 HEAD 恢复不一致的文件。
+        full (bool): 忽略 stat 缓存，重新计算所有文件的哈希。
+        workers (int): 计算哈希的线程数，为 0 时按 CPU 核数。
+
+    返回:
+        Optional[Dict]: 校验结果，包含 checked（文件数）、hashed（计算了哈希的文件数）、
+        mismatched（不一致的路径）、repaired（已修复的路径）和 failed（修复失败的路径）；
+        取消或出错时返回 None。
+    """
+    monitor = monitor or GitProgressMonitor()
+    try:
+        with repo_lock(config.git_path):
+            return _verify_git_repo(config, monitor, repair, full, workers)
+    except OperationCancelled:
+        print("校验已取消")
+        return None
+    except Exception as e:
+        print(f"校验游戏文件失败。错误: {e}")
+        return None
+
+
+def _verify_git_repo(config: GitConfig, monitor: GitProgressMonitor, repair: bool,
+                     full: bool, workers: int) -> Dict:
+    """校验并修复仓库，调用方需持有仓库操作锁"""
+    repo = open_repo(config.git_path)
+    monitor.set_stage("校验文件")
+    started = time.time()
+    entries = _list_tree(repo)
+    total = len(entries)
+    cache = {} if full else _load_stat_cache(repo)
+    new_cache: Dict[str, List] = {}
+    expected = {path: sha for _, sha, path in entries}
+    modes = {path: mode for mode, _, path in entries}
+
+    # 先用 stat 缓存过滤未变化的文件
+    pending = []
+    for mode, sha, path in entries:
+        stat = _stat_key(os.path.join(repo.working_tree_dir, path))
+        cached = cache.get(path)
+        if stat is not None and cached is not None and cached[:3] == stat and cached[3] == sha:
+            new_cache[path] = cached
+        else:
+            pending.append((mode, sha, path, stat))
+
+    done = total - len(pending)
+    monitor.set_count(done, total)
+    print(f"需要校验 {len(pending)}/{total} 个文件")
+
+    mismatched = []
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as executor:
+        hashes = executor.map(lambda item: _hash_blob(os.path.join(repo.working_tree_dir, item[2]), item[0]),
+                              pending)
+        try:
+            for index, ((mode, sha, path, stat), actual) in enumerate(zip(pending, hashes), 1):
+                if actual == sha:
+                    if _is_cacheable(stat, started):
+                        new_cache[path] = stat + [sha]
+                else:
+                    mismatched.append(path)
+                if index % PROGRESS_STEP == 0:
+                    monitor.check_cancelled()
+                    monitor.set_count(done + index, total)
+        except OperationCancelled:
+            # 保留已校验的结果，下次校验时跳过
+            executor.shutdown(wait=True, cancel_futures=True)
+            _save_stat_cache(repo, new_cache)
+            raise
+
+    if mismatched:
+        mismatched = _confirm_with_filters(repo, mismatched, expected)
+    print(f"校验完成，{len(mismatched)} 个文件不一致")
+
+    repaired, failed = [], []
+    if mismatched and repair:
+        monitor.check_cancelled()
+        monitor.set_stage("修复文件")
+        _restore_files(repo, mismatched)
+        for path in mismatched:
+            full_path = os.path.join(repo.working_tree_dir, path)
+            if _hash_blob(full_path, modes[path]) == expected[path] or not _confirm_with_filters(repo, [path], expected):
+                repaired.append(path)
+                stat = _stat_key(full_path)
+                if _is_cacheable(stat, started):
+                    new_cache[path] = stat + [expected[path]]
+            else:
+                failed.append(path)
+
+    _save_stat_cache(repo, new_cache)
+    monitor.mark_complete()
+    return {
+        "checked": total,
+        "hashed": len(pending),
+        "mismatched": mismatched,
+        "repaired": repaired,
+        "failed": failed
+    }
@@ -0,0 +1,237 @@
+"""
+后台任务管理
+
+克隆、更新等耗时操作在有限大小的线程池中执行，每个任务拥有独立的进度监视器，
+请求处理线程只负责提交任务并立即返回任务 ID。
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import get_game_config
+from git_handler import GitProgressMonitor
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# 保留的已结束任务数量
+MAX_FINISHED_JOBS = 20
+
+
+class Job:
+    """
+    后台任务
+
+    Attributes:
+        id (str): 任务 ID
+        kind (str): 任务类型，如 clone、update
+        resource (str): 任务操作的资源，同一资源同时只允许一个任务运行
+        state (str): 任务状态
+        progress (GitProgressMonitor): 任务独立的进度监视器
+        result (dict): 任务函数的返回结果
+    """
+
+    def __init__(self, kind: str, resource: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.resource = resource
+        self.state = JOB_PENDING
+        self.progress = GitProgressMonitor()
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def is_active(self) -> bool:
+        """
+        任务是否仍在等待或运行
+        Returns:
+            是否未结束
+        """
+        return self.state in (JOB_PENDING, JOB_RUNNING)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为可序列化的字典
+        Returns:
+            任务信息字典
+        """
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "result": self.result,
+            "progress": self.progress.get_progress_data(),
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at
+        }
+
+    def to_summary(self) -> Dict[str, Any]:
+        """
+        转换为不含进度的字典，用于进度推送的结束事件
+        Returns:
+            任务信息字典
+        """
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "result": self.result
+        }
+
+
+class JobManager:
+    """后台任务管理器"""
+
+    def __init__(self, max_workers: int = 2):
+        """
+        初始化任务管理器
+        Args:
+            max_workers: 同时运行的最大任务数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[[GitProgressMonitor], Dict[str, Any]],
+               resource: str = "game") -> Job:
+        """
+        提交任务
+        Args:
+            kind: 任务类型
+            func: 任务函数，接收任务的进度监视器，返回带 status 字段的结果字典
+            resource: 任务操作的资源
+        Returns:
+            新建的任务
+        Raises:
+            RuntimeError: 同一资源已有任务在运行
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.resource == resource and job.is_active():
+                    raise RuntimeError("已有任务正在进行，请等待其完成")
+
+            job = Job(kind, resource)
+            self._jobs[job.id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, func)
+        logger.info(f"已提交任务 {job.kind} ({job.id})")
+        return job
+
+    def _run(self, job: Job, func: Callable[[GitProgressMonitor], Dict[str, Any]]):
+        """在工作线程中执行任务"""
+        if job.progress.is_cancelled():
+            job.state = JOB_CANCELLED
+            job.finished_at = time.time()
+            job.progress.notify_listeners()
+            return
+
+        job.state = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = func(job.progress)
+        except Exception as e:
+            logger.error(f"任务 {job.kind} ({job.id}) 执行出错: {e}")
+            job.result = {"status": "error", "message": str(e)}
+
+        if job.progress.is_cancelled():
+            job.state = JOB_CANCELLED
+        elif job.result and job.result.get("status") == "ok":
+            job.state = JOB_SUCCEEDED
+        else:
+            job.state = JOB_FAILED
+        job.finished_at = time.time()
+        logger.info(f"任务 {job.kind} ({job.id}) 结束，状态: {job.state}")
+        # 唤醒等待进度推送的连接，使其发送结束事件
+        job.progress.notify_listeners()
+
+    def _prune(self):
+        """丢弃最早的已结束任务，调用方需持有锁"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        获取任务
+        Args:
+            job_id: 任务 ID
+        Returns:
+            任务，不存在时返回 None
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self) -> Optional[Job]:
+        """
+        获取最近提交的任务
+        Returns:
+            任务，没有任务时返回 None
+        """
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def list(self) -> List[Job]:
+        """
+        获取全部任务
+        Returns:
+            按提交顺序排列的任务列表
+        """
+        with self._lock:
+            return list(self._jobs.values())
+
+    def has_active(self, resource: str = "game") -> bool:
+        """
+        资源上是否有未结束的任务
+        Args:
+            resource: 任务操作的资源
+        Returns:
+            有等待或运行中的任务时返回 True
+        """
+        with self._lock:
+            return any(job.resource == resource and job.is_active() for job in self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务，运行中的 Git 进程会被终止
+        Args:
+            job_id: 任务 ID
+        Returns:
+            任务存在且尚未结束时返回 True
+        """
+        job = self.get(job_id)
+        if job is None or not job.is_active():
+            return False
+        job.progress.cancel()
+        logger.info(f"已请求取消任务 {job.kind} ({job.id})")
+        return True
+
+
+# 全局任务管理器实例
+_job_manager = None
+
+
+def get_job_manager() -> JobManager:
+    """
+    获取任务管理器实例（单例模式）
+    Returns:
+        任务管理器实例
+    """
+    global _job_manager
+    if _job_manager is None:
+        max_workers = get_game_config().get("jobs", {}).get("max_workers", 2)
+        _job_manager = JobManager(max_workers=max_workers)
+    return _job_manager
@@ -3,6 +3,7 @@ import os
 from contextlib import redirect_stdout
 from io import StringIO
 
+from serving import is_debug, start_app_server
 from server import server
 
 import webview
@@ -16,14 +17,17 @@ if __name__ == '__main__':
         with redirect_stdout(stream):
             # 定义窗口图标路径，使用 os.path.join 提高跨平台兼容性
             icon_path = os.path.join(os.path.dirname(__file__), 'app.ico')
+            debug = is_debug()
+            # 调试模式下由 pywebview 自带的服务器运行界面，否则启动正式运行的服务器并打开其地址
+            url = server if debug else start_app_server(server).url
             # 创建桌面窗口
             window = webview.create_window(
                 '不为人知的小世界', 
-                server, 
+                url, 
                 min_size=(1200, 700), 
                 frameless=True,
             )
             # 启动窗口应用程序
-            webview.start(debug=True, icon=icon_path)
+            webview.start(debug=debug, icon=icon_path)
     except Exception as e:
         logger.error(f"启动窗口应用程序时出错: {e}")
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""
+仓库维护
+
+反复更新会在 .git 中留下大量松散对象和小包，中断的下载还会留下临时包和 .keep 文件，
+时间长了状态检查和下载协商都会变慢，.git 目录也会不断变大。
+这里在空闲时检查仓库状态，超过阈值时进行增量打包、写入提交图和清理，
+定期进行一次完整的 gc；每次维护记录各步骤的耗时和回收的空间。
+
+维护使用仓库操作锁的后台模式：仓库忙时跳过，克隆、更新等前台操作开始时会取消维护。
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from git import Repo
+
+from git_handler import GitConfig, GitProgressMonitor, OperationCancelled, open_repo, repo_lock, run_git_command
+
+# 维护记录文件，位于 .git 目录下
+MAINTENANCE_STATE_FILE = "minemc-maintenance.json"
+# 保留的维护记录数
+HISTORY_SIZE = 20
+# 默认检查间隔(秒)
+DEFAULT_MAINTENANCE_INTERVAL = 3600
+# 松散对象超过该数量时打包
+DEFAULT_LOOSE_OBJECTS_LIMIT = 500
+# 包超过该数量时合并
+DEFAULT_PACKS_LIMIT = 10
+# 完整 gc 的间隔(秒)
+DEFAULT_FULL_INTERVAL = 7 * 24 * 3600
+# 修剪多久以前的不可达对象，与 git gc 的默认值相同
+PRUNE_EXPIRE = "2.weeks.ago"
+# 中断的下载留下的临时文件超过该时间(秒)才删除，避免删除其他进程正在写入的文件
+STALE_FILE_AGE = 3600
+
+
+def _dir_size(path: str) -> int:
+    """目录中所有文件的总大小(字节)"""
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def get_repo_stats(repo: Repo) -> Dict[str, int]:
+    """
+    统计对象库状态
+
+    返回:
+        Dict[str, int]: loose_objects（松散对象数）、loose_bytes、packs（包数）、pack_bytes、
+        garbage_bytes（无法识别的文件）和 git_bytes（整个 .git 目录的大小）
+    """
+    counts = {}
+    for line in repo.git.count_objects("-v").splitlines():
+        key, _, value = line.partition(":")
+        counts[key.strip()] = int(value.strip() or 0)
+    return {
+        "loose_objects": counts.get("count", 0),
+        "loose_bytes": counts.get("size", 0) * 1024,
+        "packs": counts.get("packs", 0),
+        "pack_bytes": counts.get("size-pack", 0) * 1024,
+        "garbage_bytes": counts.get("size-garbage", 0) * 1024,
+        "git_bytes": _dir_size(repo.git_dir)
+    }
+
+
+def load_maintenance_history(git_path: str) -> List[Dict]:
+    """
+    读取维护记录
+
+    参数:
+        git_path (str): 仓库路径。
+
+    返回:
+        List[Dict]: 维护记录，最近的在前；没有记录时返回空列表。
+    """
+    try:
+        with open(os.path.join(git_path, ".git", MAINTENANCE_STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _save_history(repo: Repo, history: List[Dict]):
+    """原子地保存维护记录"""
+    path = os.path.join(repo.git_dir, MAINTENANCE_STATE_FILE)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(history[:HISTORY_SIZE], f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _stale_files(repo: Repo) -> List[str]:
+    """
+    中断的下载留下的文件：临时包、临时索引，以及 fetch 时创建但未删除的 .keep 文件。
+    .keep 文件会让对应的包永远不被合并。
+    """
+    pack_dir = os.path.join(repo.git_dir, "objects", "pack")
+    now = time.time()
+    stale = []
+    for directory in (pack_dir, os.path.join(repo.git_dir, "objects")):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if not os.path.isfile(path) or now - os.path.getmtime(path) < STALE_FILE_AGE:
+                    continue
+                if name.startswith(("tmp_pack_", "tmp_idx_", "tmp_rev_", "tmp_obj_")):
+                    stale.append(path)
+                elif name.endswith(".keep") and directory == pack_dir:
+                    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                        if f.read().startswith(("fetch-pack", "index-pack")):
+                            stale.append(path)
+            except OSError:
+                continue
+    return stale
+
+
+def _install_time(repo: Repo) -> float:
+    """
+    仓库的创建时间，取 git init 时写入的文件中最早的修改时间（description 创建后不再修改）；
+    都不存在时返回 0
+    """
+    times = []
+    for name in ("description", "HEAD", "config"):
+        try:
+            times.append(os.path.getmtime(os.path.join(repo.git_dir, name)))
+        except OSError:
+            pass
+    return min(times, default=0)
+
+
+def _due_reason(stats: Dict[str, int], history: List[Dict], loose_objects_limit: int,
+                packs_limit: int, full_interval: float, install_time: float = 0) -> Optional[str]:
+    """
+    判断是否需要维护，返回原因，不需要时返回 None。
+    还没有完整维护过时从安装时间开始计算间隔，刚安装的仓库不会立即 gc
+    """
+    last_full = next((entry["started"] for entry in history if entry.get("full")), install_time)
+    if time.time() - last_full > full_interval:
+        return "full"
+    if stats["loose_objects"] > loose_objects_limit:
+        return "loose_objects"
+    if stats["packs"] > packs_limit:
+        return "packs"
+    if stats["garbage_bytes"]:
+        return "garbage"
+    return None
+
+
+def run_maintenance(config: GitConfig, monitor: Optional[GitProgressMonitor] = None, force: bool = False,
+                    loose_objects_limit: int = DEFAULT_LOOSE_OBJECTS_LIMIT, packs_limit: int = DEFAULT_PACKS_LIMIT,
+                    full_interval: float = DEFAULT_FULL_INTERVAL) -> Optional[Dict]:
+    """
+    检查仓库状态，需要时进行维护。
+
+    未提供监视器时在后台运行：Git 进程以较低优先级运行，仓库忙时跳过，前台操作开始时被取消。
+
+    参数:
+        config (GitConfig): Git 配置对象。
+        monitor (GitProgressMonitor): 进度监视器，提供时作为前台操作运行。
+        force (bool): 不检查阈值，立即进行完整维护。
+        loose_objects_limit (int): 松散对象超过该数量时打包。
+        packs_limit (int): 包超过该数量时合并。
+        full_interval (float): 完整 gc 的间隔(秒)。
+
+    返回:
+        Optional[Dict]: 本次维护的记录，包含 started、reason、full、steps（各步骤的 name 和 seconds）、
+        before、after（见 get_repo_stats）和 reclaimed_bytes；无需维护时 steps 为空；
+        仓库忙、被取消或失败时返回 None。
+    """
+    background = monitor is None
+    if background:
+        monitor = GitProgressMonitor()
+        monitor.low_priority = True
+    try:
+        with repo_lock(config.git_path, background=monitor if background else None) as acquired:
+            if not acquired:
+                print("仓库正被其他操作使用，跳过维护")
+                return None
+            return _run_maintenance(config, monitor, force, loose_objects_limit, packs_limit, full_interval)
+    except OperationCancelled:
+        print("维护已取消")
+        return None
+    except Exception as e:
+        print(f"维护仓库失败。错误: {e}")
+        return None
+
+
+def _run_maintenance(config: GitConfig, monitor: GitProgressMonitor, force: bool, loose_objects_limit: int,
+                     packs_limit: int, full_interval: float) -> Dict:
+    """维护仓库，调用方需持有仓库操作锁"""
+    repo = open_repo(config.git_path)
+    history = load_maintenance_history(config.git_path)
+    before = get_repo_stats(repo)
+    stale = _stale_files(repo)
+    reason = "manual" if force else _due_reason(before, history, loose_objects_limit, packs_limit, full_interval,
+                                                _install_time(repo))
+    record = {"started": time.time(), "reason": reason, "full": False, "steps": [],
+              "before": before, "after": before, "reclaimed_bytes": 0}
+    if reason is None and not stale:
+        return record
+
+    full = reason in ("full", "manual")
+    steps = []
+    if stale:
+        steps.append(("清理中断的下载", None))
+    if full:
+        # gc 包括过期引用日志、打包引用、合并所有包、修剪不可达对象和写入提交图
+        steps.append(("完整维护", ["gc", "--quiet", f"--prune={PRUNE_EXPIRE}"]))
+    elif reason is not None:
+        if before["packs"] > packs_limit:
+            steps.append(("合并对象包", ["repack", "-a", "-d", "-l"]))
+        else:
+            steps.append(("打包松散对象", ["repack", "-d", "-l"]))
+        steps.append(("清理已打包的对象", ["prune-packed"]))
+        steps.append(("写入提交图", ["commit-graph", "write", "--reachable", "--split"]))
+
+    print(f"开始维护仓库（{reason or 'stale'}）: {before}")
+    for index, (name, command) in enumerate(steps):
+        monitor.check_cancelled()
+        monitor.set_stage(name)
+        monitor.set_count(index, len(steps))
+        started = time.perf_counter()
+        if command is None:
+            for path in stale:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"删除 {path} 失败: {e}")
+        else:
+            run_git_command(repo, monitor, *command)
+        record["steps"].append({"name": name, "seconds": round(time.perf_counter() - started, 3)})
+
+    after = get_repo_stats(repo)
+    record.update(full=full, after=after, reclaimed_bytes=before["git_bytes"] - after["git_bytes"])
+    _save_history(repo, [record] + history)
+    monitor.mark_complete()
+    print(f"仓库维护完成，回收 {record['reclaimed_bytes']} 字节，耗时 "
+          f"{sum(step['seconds'] for step in record['steps']):.1f} 秒")
+    return record
@@ -0,0 +1,689 @@
+"""
+基于文件清单的 HTTP 增量更新
+
+Git 之外的另一种更新方式：发布端为每个版本生成文件清单（路径、大小、SHA-256），
+文件内容按哈希存放在静态服务器上；客户端对比已安装的清单，只下载变化的文件。
+客户端不保存 Git 对象库，磁盘占用约为 Git 方式的一半。
+
+服务器目录结构:
+    manifest.json                 文件清单
+    objects/<哈希前两位>/<哈希>    文件内容
+    chunks/<哈希前两位>/<哈希>     大文件的分块（见 chunk_store）
+
+大文件（jar、资源包等）按内容分块发布，清单中记录各块的哈希和大小。更新时客户端
+从已安装的旧文件中读取未变化的块，只下载新出现的块，再在暂存目录中拼出新文件。
+
+下载并发进行，支持 Range 断点续传，每个文件和块下载后校验哈希；
+全部下载完成后才替换游戏文件，替换中断时下次更新会继续完成替换。
+清单中的路径和哈希在使用前都要检查，路径不在游戏目录内或哈希格式不对时整个更新失败。
+
+生成清单:
+    python manifest_updater.py <游戏目录> <输出目录> [版本号] [--full-objects]
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+from bandwidth import get_transfer_scheduler
+from chunk_store import CHUNK_THRESHOLD, ChunkStore
+from git_handler import GitProgressMonitor, OperationCancelled
+from http_client import get_http_client
+
+# 客户端状态目录，位于游戏目录下
+STATE_DIR = ".minemc"
+# 已安装版本的清单
+INSTALLED_MANIFEST = "manifest.json"
+# 正在替换文件的清单，存在时说明上次替换中断
+PENDING_MANIFEST = "pending.json"
+# 更新大小估算的缓存
+ESTIMATE_FILE = "estimate.json"
+# 下载暂存目录
+STAGING_DIR = "staging"
+# 暂存目录中存放下载的块的子目录
+STAGING_CHUNKS_DIR = "chunks"
+# 默认并发下载数
+DEFAULT_DOWNLOAD_WORKERS = 4
+# 请求超时(秒)
+REQUEST_TIMEOUT = 30
+# 读取文件的块大小
+CHUNK_SIZE = 256 * 1024
+# 下载的块大小，较小的块使限速更平滑
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# 单个文件的最大重试次数
+MAX_ATTEMPTS = 3
+# 生成清单时忽略的目录
+IGNORED_DIRS = {".git", STATE_DIR}
+# 清单中的哈希
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _sha256_file(path: str) -> str:
+    """计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_path(root: str, sha256: str) -> str:
+    """按哈希存放的文件路径"""
+    return os.path.join(root, sha256[:2], sha256)
+
+
+def _check_sha256(value) -> str:
+    """
+    检查清单中的哈希，哈希会用作暂存文件名和下载地址
+    Raises:
+        ValueError: 不是小写十六进制的 SHA-256
+    """
+    if not isinstance(value, str) or not _SHA256_PATTERN.match(value):
+        raise ValueError(f"清单中的哈希无效: {value!r}")
+    return value
+
+
+def _check_size(value) -> int:
+    """检查清单中的大小，必须是非负整数"""
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"清单中的大小无效: {value!r}")
+    return value
+
+
+def _check_relative_path(path) -> str:
+    """
+    检查清单中的路径：以 / 分隔的相对路径，不能是绝对路径、带盘符、包含 . 或 .. 部分，
+    也不能位于 .git 和客户端状态目录中
+    Raises:
+        ValueError: 路径无效
+    """
+    if not isinstance(path, str) or not path or "\0" in path:
+        raise ValueError(f"清单中的路径无效: {path!r}")
+    parts = re.split(r"[\\/]", path)
+    if (os.path.isabs(path) or re.match(r"^[A-Za-z]:", path) or os.path.splitdrive(path)[0]
+            or any(part in ("", ".", "..") for part in parts) or parts[0] in IGNORED_DIRS):
+        raise ValueError(f"清单中的路径不在游戏目录内: {path!r}")
+    return path
+
+
+def validate_manifest(manifest) -> Dict:
+    """
+    检查清单的结构和其中所有的路径、哈希和大小，清单中的内容在使用前都要经过检查
+    Returns:
+        清单本身
+    Raises:
+        ValueError: 清单无效
+    """
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), dict):
+        raise ValueError("清单格式无效")
+    for path, entry in manifest["files"].items():
+        _check_relative_path(path)
+        if not isinstance(entry, dict):
+            raise ValueError(f"清单中 {path} 的条目无效")
+        _check_sha256(entry.get("sha256"))
+        _check_size(entry.get("size"))
+        chunks = entry.get("chunks")
+        if chunks is None:
+            continue
+        if not isinstance(chunks, list):
+            raise ValueError(f"清单中 {path} 的分块无效")
+        for chunk in chunks:
+            if not isinstance(chunk, (list, tuple)) or len(chunk) != 2:
+                raise ValueError(f"清单中 {path} 的分块无效")
+            _check_sha256(chunk[0])
+            _check_size(chunk[1])
+    return manifest
+
+
+def _load_manifest(path: str) -> Optional[Dict]:
+    """读取清单文件，不存在或损坏时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(path: str, manifest: Dict):
+    """原子地写入清单文件"""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def generate_manifest(source_dir: str, output_dir: str, version: str = "",
+                      chunk_threshold: int = CHUNK_THRESHOLD, full_objects: bool = False) -> Dict:
+    """
+    为游戏目录生成文件清单，并把文件内容按哈希复制到输出目录。
+
+    参数:
+        source_dir (str): 游戏目录。
+        output_dir (str): 输出目录，可直接作为静态服务器的根目录；已有的对象和块会保留，
+            多个版本可共用同一目录，相同的块只保存一份。
+        version (str): 版本号。
+        chunk_threshold (int): 不小于该大小的文件分块发布，0 表示不分块。
+        full_objects (bool): 分块发布的文件同时保存完整文件，供不支持分块的旧客户端使用。
+
+    返回:
+        Dict: 生成的清单。
+    """
+    files = {}
+    chunk_store = ChunkStore(os.path.join(output_dir, "chunks"))
+    for root, dirs, names in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS)
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+            rel_path = os.path.relpath(full_path, source_dir).replace(os.sep, "/")
+            sha256 = _sha256_file(full_path)
+            size = os.path.getsize(full_path)
+            files[rel_path] = {"size": size, "sha256": sha256}
+            if chunk_threshold and size >= chunk_threshold:
+                files[rel_path]["chunks"] = [list(chunk) for chunk in chunk_store.add_file(full_path)]
+                if not full_objects:
+                    continue
+
+            target = _object_path(os.path.join(output_dir, "objects"), sha256)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(full_path, target)
+
+    manifest = {"version": version, "files": files}
+    _save_manifest(os.path.join(output_dir, "manifest.json"), manifest)
+    return manifest
+
+
+def has_interrupted_manifest_update(game_path: str) -> bool:
+    """
+    检查游戏目录是否有中断的文件替换
+
+    参数:
+        game_path (str): 游戏目录。
+
+    返回:
+        bool: 上次替换未完成（游戏文件可能不完整）时返回 True。
+    """
+    return os.path.exists(os.path.join(game_path, STATE_DIR, PENDING_MANIFEST))
+
+
+class ManifestUpdater:
+    """
+    基于文件清单的更新器
+
+    Attributes:
+        manifest_url (str): 远程清单地址，文件内容位于同目录的 objects/ 下
+        game_path (str): 游戏目录
+        workers (int): 并发下载数
+    """
+
+    def __init__(self, manifest_url: str, game_path: str, workers: int = DEFAULT_DOWNLOAD_WORKERS,
+                 session: Optional[requests.Session] = None):
+        self.manifest_url = manifest_url
+        self.objects_url = urljoin(manifest_url, "objects/")
+        self.chunks_url = urljoin(manifest_url, "chunks/")
+        self.game_path = game_path
+        self.workers = workers
+        self.session = session or get_http_client().session
+        self.state_dir = os.path.join(game_path, STATE_DIR)
+        self.staging_dir = os.path.join(self.state_dir, STAGING_DIR)
+        self.chunk_store = ChunkStore(os.path.join(self.staging_dir, STAGING_CHUNKS_DIR))
+        # 下载进度，多个下载线程共享
+        self._lock = threading.Lock()
+        self._received = 0
+        self._total = 0
+        self._done_files = 0
+        self._total_files = 0
+        self._reused = 0
+        self._stop = threading.Event()
+        # 合并文件时临时下载块的锁，同一块只下载一次
+        self._chunk_locks: Dict[str, threading.Lock] = {}
+
+    def fetch_manifest(self) -> Dict:
+        """
+        下载远程清单
+        Returns:
+            清单字典
+        Raises:
+            ValueError: 清单无效（如路径不在游戏目录内）
+        """
+        response = self.session.get(self.manifest_url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return validate_manifest(response.json())
+
+    def installed_manifest(self) -> Dict:
+        """
+        读取已安装版本的清单
+        Returns:
+            清单字典，未安装时文件列表为空
+        Raises:
+            ValueError: 清单无效
+        """
+        return validate_manifest(_load_manifest(os.path.join(self.state_dir, INSTALLED_MANIFEST))
+                                 or {"version": "", "files": {}})
+
+    def _pending_manifest(self) -> Optional[Dict]:
+        """上次中断的替换的目标清单，没有时返回 None"""
+        pending = _load_manifest(os.path.join(self.state_dir, PENDING_MANIFEST))
+        return validate_manifest(pending) if pending is not None else None
+
+    def _safe_path(self, path: str) -> str:
+        """
+        清单中的路径对应的游戏文件路径
+        Raises:
+            ValueError: 路径无效，或经过符号链接后不在游戏目录内
+        """
+        full_path = os.path.join(self.game_path, _check_relative_path(path))
+        root = os.path.realpath(self.game_path)
+        if not os.path.realpath(full_path).startswith(root.rstrip(os.sep) + os.sep):
+            raise ValueError(f"清单中的路径不在游戏目录内: {path!r}")
+        return full_path
+
+    def _needs_download(self, path: str, entry: Dict, installed: Dict) -> bool:
+        """文件内容与已安装版本不同，或本地文件缺失、大小不符时需要下载"""
+        if os.path.exists(_object_path(self.staging_dir, entry["sha256"])):
+            return False
+        full_path = self._safe_path(path)
+        old = installed["files"].get(path)
+        if old is None or old["sha256"] != entry["sha256"]:
+            return True
+        try:
+            return os.path.getsize(full_path) != entry["size"]
+        except OSError:
+            return True
+
+    def _add_progress(self, received: int, monitor: GitProgressMonitor, file_done: bool = False):
+        """累加下载进度并通知进度监视器"""
+        with self._lock:
+            self._received += received
+            if file_done:
+                self._done_files += 1
+            received, done = self._received, self._done_files
+        monitor.set_bytes(received, self._total, done, self._total_files)
+
+    def _check_stopped(self, monitor: GitProgressMonitor):
+        """已请求取消，或其他文件下载失败时停止下载"""
+        monitor.check_cancelled()
+        if self._stop.is_set():
+            raise OperationCancelled("下载已停止")
+
+    def _local_chunks(self, installed: Dict) -> Dict[str, Tuple[str, int, int]]:
+        """
+        已安装的分块文件中各块的位置，本地文件缺失或大小不符的不计入
+
+        Returns:
+            块哈希到 (文件路径, 偏移, 大小) 的字典
+        """
+        chunks = {}
+        for path, entry in installed["files"].items():
+            if not entry.get("chunks"):
+                continue
+            full_path = self._safe_path(path)
+            try:
+                if os.path.getsize(full_path) != entry["size"]:
+                    continue
+            except OSError:
+                continue
+            offset = 0
+            for sha256, size in entry["chunks"]:
+                chunks.setdefault(sha256, (full_path, offset, size))
+                offset += size
+        return chunks
+
+    def _download(self, sha256: str, size: int, monitor: GitProgressMonitor, chunk: bool = False):
+        """
+        下载单个文件或块到暂存目录，支持断点续传，完成后校验哈希
+
+        Raises:
+            OperationCancelled: 已请求取消
+            RuntimeError: 多次重试后仍下载失败或校验不通过
+        """
+        if chunk:
+            target = self.chunk_store.path(sha256)
+            url = urljoin(self.chunks_url, f"{sha256[:2]}/{sha256}")
+        else:
+            target = _object_path(self.staging_dir, sha256)
+            url = urljoin(self.objects_url, f"{sha256[:2]}/{sha256}")
+        part = target + ".part"
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 本文件已计入总进度的字节数，重试时先扣除
+        counted = 0
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self._check_stopped(monitor)
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            digest = hashlib.sha256()
+            if offset:
+                with open(part, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+            # 已下载的部分计入进度
+            self._add_progress(offset - counted, monitor)
+            counted = offset
+
+            try:
+                headers = {"Range": f"bytes={offset}-"} if 0 < offset < size else {}
+                with self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                    if response.status_code == 416 or (offset >= size and response.ok):
+                        # 已完整下载，直接校验
+                        pass
+                    elif response.status_code == 206:
+                        counted += self._write_body(response, part, "ab", digest, monitor)
+                    elif response.status_code == 200:
+                        # 服务器不支持 Range，从头下载
+                        self._add_progress(-counted, monitor)
+                        counted = 0
+                        digest = hashlib.sha256()
+                        counted += self._write_body(response, part, "wb", digest, monitor)
+                    else:
+                        response.raise_for_status()
+                        raise RuntimeError(f"HTTP 状态码 {response.status_code}")
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                print(f"下载 {sha256[:12]} 失败（第 {attempt} 次）: {e}")
+                # 中断前写入的内容已计入进度，下次从暂存文件的末尾续传
+                counted = os.path.getsize(part) if os.path.exists(part) else 0
+                continue
+
+            if digest.hexdigest() == sha256:
+                os.replace(part, target)
+                self._add_progress(0, monitor, file_done=True)
+                return
+            # 校验失败，丢弃已下载的内容重新下载
+            print(f"文件 {sha256[:12]} 校验失败，重新下载")
+            os.remove(part)
+
+        self._add_progress(-counted, monitor)
+        raise RuntimeError(f"文件 {sha256[:12]} 下载失败")
+
+    def _write_body(self, response: requests.Response, part: str, mode: str, digest,
+                    monitor: GitProgressMonitor) -> int:
+        """
+        将响应内容写入暂存文件，同时计算哈希
+        Returns:
+            写入的字节数
+        """
+        written = 0
+        scheduler = get_transfer_scheduler()
+        with open(part, mode) as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                self._check_stopped(monitor)
+                scheduler.acquire(len(chunk), monitor.priority)
+                f.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+                self._add_progress(len(chunk), monitor)
+        return written
+
+    def _read_chunk(self, sha256: str, size: int, local: Dict[str, Tuple[str, int, int]],
+                    monitor: GitProgressMonitor) -> bytes:
+        """读取块，依次尝试已下载的块和旧文件中的块，都不可用时（旧文件被修改）再下载"""
+        if self.chunk_store.has(sha256):
+            return self.chunk_store.get(sha256)
+        source = local.get(sha256)
+        if source is not None:
+            full_path, offset, _ = source
+            try:
+                with open(full_path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(size)
+                if hashlib.sha256(data).hexdigest() == sha256:
+                    with self._lock:
+                        self._reused += size
+                    return data
+            except OSError:
+                pass
+        with self._lock:
+            chunk_lock = self._chunk_locks.setdefault(sha256, threading.Lock())
+        # 多个文件需要同一块时只有一个线程下载，其他线程等待后直接读取
+        with chunk_lock:
+            if not self.chunk_store.has(sha256):
+                with self._lock:
+                    self._total += size
+                    self._total_files += 1
+                self._download(sha256, size, monitor, chunk=True)
+        return self.chunk_store.get(sha256)
+
+    def _assemble(self, entry: Dict, local: Dict[str, Tuple[str, int, int]], monitor: GitProgressMonitor):
+        """
+        用块拼出文件，写入暂存目录并校验哈希
+
+        Raises:
+            RuntimeError: 拼出的文件校验不通过
+        """
+        target = _object_path(self.staging_dir, entry["sha256"])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        digest = hashlib.sha256()
+        with open(target + ".part", "wb") as f:
+            for sha256, size in entry["chunks"]:
+                self._check_stopped(monitor)
+                data = self._read_chunk(sha256, size, local, monitor)
+                f.write(data)
+                digest.update(data)
+        if digest.hexdigest() != entry["sha256"]:
+            os.remove(target + ".part")
+            raise RuntimeError(f"文件 {entry['sha256'][:12]} 拼合后校验失败")
+        os.replace(target + ".part", target)
+
+    def _run_parallel(self, tasks: List):
+        """并发执行任务，一个任务失败或取消时停止其余任务"""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download") as executor:
+            futures = [executor.submit(task) for task in tasks]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # 已下载的部分保留供续传
+                self._stop.set()
+                raise
+
+    def _apply(self, manifest: Dict, installed: Dict):
+        """
+        用暂存目录中的文件替换游戏文件，删除新版本中不存在的文件。
+        替换前记录目标清单，中断后再次调用可继续完成。
+        """
+        # 先检查全部路径，任一路径无效时不修改任何文件
+        targets = {path: self._safe_path(path) for path in manifest["files"]}
+        removals = [self._safe_path(path) for path in installed["files"] if path not in manifest["files"]]
+        pending_path = os.path.join(self.state_dir, PENDING_MANIFEST)
+        _save_manifest(pending_path, manifest)
+
+        for path, entry in manifest["files"].items():
+            staged = _object_path(self.staging_dir, entry["sha256"])
+            if not os.path.exists(staged):
+                continue
+            full_path = targets[path]
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # 同一内容可能对应多个路径，因此复制而不是移动暂存文件
+            shutil.copyfile(staged, full_path + ".minemc-new")
+            os.replace(full_path + ".minemc-new", full_path)
+
+        for full_path in removals:
+            if os.path.exists(full_path):
+                os.remove(full_path)
+
+        _save_manifest(os.path.join(self.state_dir, INSTALLED_MANIFEST), manifest)
+        os.remove(pending_path)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def _plan(self, manifest: Dict, installed: Dict,
+              local_chunks: Dict[str, Tuple[str, int, int]]) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, Dict]]:
+        """
+        确定需要下载的内容。相同内容只下载一次；分块的文件只下载本地没有的块
+
+        Returns:
+            (需要下载的文件 {哈希: 大小}, 需要下载的块 {哈希: 大小}, 需要合并的分块文件 {哈希: 清单条目})
+        """
+        downloads: Dict[str, int] = {}
+        chunk_downloads: Dict[str, int] = {}
+        assembles: Dict[str, Dict] = {}
+        for path, entry in manifest["files"].items():
+            if not self._needs_download(path, entry, installed):
+                continue
+            if not entry.get("chunks"):
+                downloads[entry["sha256"]] = entry["size"]
+                continue
+            assembles[entry["sha256"]] = entry
+            for sha256, size in entry["chunks"]:
+                if sha256 not in local_chunks and not self.chunk_store.has(sha256):
+                    chunk_downloads[sha256] = size
+        return downloads, chunk_downloads, assembles
+
+    def estimate(self) -> Dict:
+        """
+        计算更新到远程清单的版本需要下载的文件数和字节数，只下载清单。
+
+        清单按 ETag/Last-Modified 条件请求，远程清单和已安装版本都没有变化时直接返回上次的结果。
+
+        Returns:
+            version（远程版本）、objects（需要下载的文件和块数）、bytes（需要下载的字节数）和 exact（为 True）
+        """
+        installed = self._pending_manifest() or self.installed_manifest()
+        cache_path = os.path.join(self.state_dir, ESTIMATE_FILE)
+        cached = _load_manifest(cache_path) or {}
+        headers = {}
+        if cached.get("installed") == installed.get("version"):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        response = self.session.get(self.manifest_url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and headers:
+            return cached["estimate"]
+        response.raise_for_status()
+        manifest = validate_manifest(response.json())
+
+        downloads, chunk_downloads, _ = self._plan(manifest, installed, self._local_chunks(installed))
+        estimate = {
+            "version": manifest.get("version", ""),
+            "objects": len(downloads) + len(chunk_downloads),
+            "bytes": sum(downloads.values()) + sum(chunk_downloads.values()),
+            "exact": True
+        }
+        if os.path.isdir(self.state_dir):
+            _save_manifest(cache_path, {
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+                "installed": installed.get("version"),
+                "estimate": estimate
+            })
+        return estimate
+
+    def update(self, monitor: GitProgressMonitor) -> Dict:
+        """
+        更新到远程清单的版本
+
+        Args:
+            monitor: 进度监视器
+        Returns:
+            更新结果，包含 version、downloaded（更新的文件数）、downloaded_bytes（下载的字节数）、
+            reused_bytes（从旧文件复用的字节数）和 removed（删除的文件数）
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        installed = self.installed_manifest()
+
+        # 上次替换中断时先完成替换
+        pending = self._pending_manifest()
+        if pending is not None:
+            print("继续完成上次中断的文件替换")
+            self._apply(pending, installed)
+            installed = pending
+
+        monitor.set_stage("下载清单")
+        manifest = self.fetch_manifest()
+
+        local_chunks = self._local_chunks(installed)
+        downloads, chunk_downloads, assembles = self._plan(manifest, installed, local_chunks)
+        self._received = 0
+        self._done_files = 0
+        self._reused = 0
+        self._total = sum(downloads.values()) + sum(chunk_downloads.values())
+        self._total_files = len(downloads) + len(chunk_downloads)
+        print(f"需要更新 {len(downloads) + len(assembles)} 个文件，下载 {self._total} 字节")
+        monitor.set_bytes(0, self._total, 0, self._total_files)
+
+        self._run_parallel([lambda sha256=sha256, size=size: self._download(sha256, size, monitor)
+                            for sha256, size in downloads.items()] +
+                           [lambda sha256=sha256, size=size: self._download(sha256, size, monitor, chunk=True)
+                            for sha256, size in chunk_downloads.items()])
+        if assembles:
+            monitor.check_cancelled()
+            monitor.set_stage("合并文件")
+            self._run_parallel([lambda entry=entry: self._assemble(entry, local_chunks, monitor)
+                                for entry in assembles.values()])
+
+        monitor.check_cancelled()
+        monitor.set_stage("替换文件")
+        removed = sum(1 for path in installed["files"] if path not in manifest["files"])
+        self._apply(manifest, installed)
+        monitor.mark_complete()
+        return {
+            "version": manifest.get("version", ""),
+            "downloaded": len(downloads) + len(assembles),
+            "downloaded_bytes": self._total,
+            "reused_bytes": self._reused,
+            "removed": removed
+        }
+
+
+def update_from_manifest(manifest_url: str, game_path: str, monitor: Optional[GitProgressMonitor] = None,
+                         workers: int = DEFAULT_DOWNLOAD_WORKERS) -> Optional[Dict]:
+    """
+    按远程清单更新游戏目录。
+
+    参数:
+        manifest_url (str): 远程清单地址。
+        game_path (str): 游戏目录，不存在时新建（首次安装）。
+        monitor (GitProgressMonitor): 进度监视器，为 None 时新建。
+        workers (int): 并发下载数。
+
+    返回:
+        Optional[Dict]: 更新结果，取消或失败时返回 None。
+    """
+    monitor = monitor or GitProgressMonitor()
+    try:
+        print(f"正在按清单更新: {manifest_url}")
+        result = ManifestUpdater(manifest_url, game_path, workers).update(monitor)
+        print("按清单更新成功。")
+        return result
+    except OperationCancelled:
+        print("更新已取消，已下载的文件保留供下次继续。")
+        return None
+    except Exception as e:
+        print(f"按清单更新失败。错误: {e}")
+        return None
+
+
+def estimate_manifest_update(manifest_url: str, game_path: str) -> Optional[Dict]:
+    """
+    估算按远程清单更新需要下载的文件数和字节数，见 ManifestUpdater.estimate。
+
+    参数:
+        manifest_url (str): 远程清单地址。
+        game_path (str): 游戏目录，不存在时按首次安装计算。
+
+    返回:
+        Optional[Dict]: 估算结果，失败时返回 None。
+    """
+    try:
+        return ManifestUpdater(manifest_url, game_path).estimate()
+    except Exception as e:
+        print(f"估算更新大小失败。错误: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--full-objects"]
+    if len(args) < 2:
+        print("用法: python manifest_updater.py <游戏目录> <输出目录> [版本号] [--full-objects]")
+        sys.exit(1)
+    result = generate_manifest(args[0], args[1], args[2] if len(args) > 2 else "",
+                               full_objects="--full-objects" in sys.argv)
+    print(f"已生成清单，共 {len(result['files'])} 个文件")
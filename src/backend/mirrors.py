@@ -0,0 +1,235 @@
+"""
+镜像测速与选择
+
+仓库和版本文件可以配置多个镜像。首次使用时并发测量各镜像的延迟和吞吐量，
+按估算的下载耗时排序，排序结果缓存一段时间（TTL）；下载中途某个镜像失败或卡住时
+将其降到末尾，调用方切换到下一个镜像。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from http_client import get_http_client
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 镜像类型
+MIRROR_REPO = "repo"
+MIRROR_VERSION = "version"
+
+# 排序结果的默认有效期(秒)
+DEFAULT_RANKING_TTL = 3600
+# 单个镜像测速的超时(秒)
+PROBE_TIMEOUT = 5
+# 测速时最多读取的字节数
+PROBE_SAMPLE_BYTES = 256 * 1024
+# 按下载该大小所需的估算时间排序，兼顾延迟和吞吐量
+RANKING_REFERENCE_BYTES = 4 * 1024 * 1024
+
+# 排序缓存文件
+MIRROR_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.minemcupdater', 'mirrors.json')
+
+
+def git_probe_url(url: str) -> str:
+    """
+    仓库镜像的测速地址，使用智能 HTTP 协议的引用公告
+
+    Args:
+        url: 仓库地址
+    Returns:
+        测速地址，非 HTTP 地址（本地路径等）返回空字符串
+    """
+    if not url.startswith(("http://", "https://")):
+        return ""
+    return url.rstrip("/") + "/info/refs?service=git-upload-pack"
+
+
+def probe_mirror(url: str, probe_url: str, timeout: float = PROBE_TIMEOUT,
+                 sample_bytes: int = PROBE_SAMPLE_BYTES) -> Dict:
+    """
+    测量镜像的延迟和吞吐量
+
+    Args:
+        url: 镜像地址
+        probe_url: 实际请求的测速地址，为空时视为本地镜像，不发请求
+        timeout: 超时(秒)
+        sample_bytes: 最多读取的字节数
+    Returns:
+        测速结果，包含 url、ok、latency(秒)、throughput(字节/秒) 和 score(估算耗时，越小越好)
+    """
+    result = {"url": url, "ok": False, "latency": None, "throughput": None, "score": float("inf")}
+    if not probe_url:
+        result.update(ok=True, latency=0.0, score=0.0)
+        return result
+
+    try:
+        start = time.perf_counter()
+        # 测速不重试，失败的镜像直接排到后面
+        with get_http_client().get(probe_url, stream=True, timeout=timeout, retry=False) as response:
+            latency = time.perf_counter() - start
+            response.raise_for_status()
+            received = 0
+            for chunk in response.iter_content(16 * 1024):
+                received += len(chunk)
+                if received >= sample_bytes or time.perf_counter() - start > timeout:
+                    break
+            transfer_time = max(time.perf_counter() - start - latency, 1e-3)
+        throughput = received / transfer_time
+        result.update(ok=True, latency=latency, throughput=throughput,
+                      score=latency + RANKING_REFERENCE_BYTES / max(throughput, 1.0))
+    except Exception as e:
+        logger.info(f"镜像 {url} 测速失败: {e}")
+    return result
+
+
+class MirrorSelector:
+    """镜像选择器，缓存各类镜像的排序结果"""
+
+    def __init__(self, cache_path: str = MIRROR_CACHE_FILE):
+        """
+        初始化镜像选择器
+        Args:
+            cache_path: 排序缓存文件路径
+        """
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        """读取排序缓存"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        """原子地写入排序缓存，调用方需持有锁"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f, ensure_ascii=False, indent=4)
+            os.replace(self.cache_path + ".tmp", self.cache_path)
+        except OSError as e:
+            logger.error(f"保存镜像排序失败: {e}")
+
+    def rank(self, kind: str, urls: List[str], ttl: float = DEFAULT_RANKING_TTL,
+             probe_target: Callable[[str], str] = lambda url: url) -> List[str]:
+        """
+        按速度排序镜像，排序结果在有效期内直接使用缓存
+        Args:
+            kind: 镜像类型
+            urls: 镜像地址
+            ttl: 排序结果的有效期(秒)
+            probe_target: 由镜像地址得到测速地址的函数
+        Returns:
+            由快到慢排列的镜像地址，测速失败的排在最后
+        """
+        if len(urls) <= 1:
+            return list(urls)
+
+        with self._lock:
+            cached = self._cache.get(kind)
+            if cached and sorted(cached["urls"]) == sorted(urls):
+                # 离线时测速必然失败，继续使用上次的排序
+                if time.time() - cached["probed_at"] < ttl or not get_http_client().online:
+                    return list(cached["ranking"])
+        if not get_http_client().online:
+            return list(urls)
+
+        return self.probe(kind, urls, probe_target)
+
+    def cached_ranking(self, kind: str, urls: List[str]) -> List[str]:
+        """
+        获取上次的排序，不测速，用于不需要下载的操作
+        Args:
+            kind: 镜像类型
+            urls: 镜像地址
+        Returns:
+            上次的排序（不论是否过期），镜像地址变化或没有测速过时按配置中的顺序
+        """
+        with self._lock:
+            cached = self._cache.get(kind)
+            if cached and sorted(cached["urls"]) == sorted(urls):
+                return list(cached["ranking"])
+        return list(urls)
+
+    def probe(self, kind: str, urls: List[str], probe_target: Callable[[str], str] = lambda url: url) -> List[str]:
+        """
+        并发测速并更新排序缓存
+        Args:
+            kind: 镜像类型
+            urls: 镜像地址
+            probe_target: 由镜像地址得到测速地址的函数
+        Returns:
+            由快到慢排列的镜像地址
+        """
+        with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="probe") as executor:
+            results = list(executor.map(lambda url: probe_mirror(url, probe_target(url)), urls))
+        # 按估算耗时排序，相同时保持配置中的顺序
+        results.sort(key=lambda item: item["score"])
+        ranking = [item["url"] for item in results]
+        logger.info(f"{kind} 镜像排序: {ranking}")
+        if not any(item["ok"] for item in results):
+            # 全部失败多半是网络不可用，不缓存这次的结果，网络恢复后重新测速
+            return ranking
+
+        with self._lock:
+            self._cache[kind] = {
+                "urls": list(urls),
+                "ranking": ranking,
+                "results": [{**item, "score": None if item["score"] == float("inf") else item["score"]}
+                            for item in results],
+                "probed_at": time.time()
+            }
+            self._save_cache()
+        return ranking
+
+    def report_failure(self, kind: str, url: str):
+        """
+        报告镜像在使用中失败或卡住，将其移到排序末尾
+        Args:
+            kind: 镜像类型
+            url: 失败的镜像地址
+        """
+        with self._lock:
+            cached = self._cache.get(kind)
+            if not cached or url not in cached["ranking"]:
+                return
+            cached["ranking"].remove(url)
+            cached["ranking"].append(url)
+            self._save_cache()
+        logger.info(f"{kind} 镜像 {url} 已降到末尾")
+
+    def get_status(self, kind: str) -> Optional[Dict]:
+        """
+        获取最近一次测速的结果
+        Args:
+            kind: 镜像类型
+        Returns:
+            包含 ranking、results 和 probed_at 的字典，没有测速过时返回 None
+        """
+        with self._lock:
+            cached = self._cache.get(kind)
+            return json.loads(json.dumps(cached)) if cached else None
+
+
+# 全局镜像选择器实例
+_mirror_selector = None
+
+
+def get_mirror_selector() -> MirrorSelector:
+    """
+    获取镜像选择器实例（单例模式）
+    Returns:
+        镜像选择器实例
+    """
+    global _mirror_selector
+    if _mirror_selector is None:
+        _mirror_selector = MirrorSelector()
+    return _mirror_selector
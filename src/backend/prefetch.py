@@ -0,0 +1,32 @@
+"""
+后台预下载
+
+定期在后台检查并下载远程的新版本，用户点击更新时只需在本地切换版本。
+调度（随机抖动、失败后指数退避重试）见 scheduler.BackgroundScheduler。
+"""
+from typing import Callable, Optional
+
+from scheduler import DEFAULT_RETRY_DELAY, BackgroundScheduler
+
+# 默认检查间隔(秒)
+DEFAULT_PREFETCH_INTERVAL = 1800
+
+
+class PrefetchScheduler(BackgroundScheduler):
+    """
+    预下载调度器
+
+    预下载函数返回 True 表示已下载新版本，False 表示没有新版本，None 表示被跳过或失败（稍后重试）。
+    """
+
+    def __init__(self, task: Callable[[], Optional[bool]], is_busy: Callable[[], bool],
+                 interval: float = DEFAULT_PREFETCH_INTERVAL, retry_delay: float = DEFAULT_RETRY_DELAY):
+        """
+        初始化调度器
+        Args:
+            task: 预下载函数
+            is_busy: 是否有前台任务在运行，运行时跳过本次预下载
+            interval: 检查间隔(秒)
+            retry_delay: 失败后的首次重试间隔(秒)
+        """
+        super().__init__(task, is_busy, interval, retry_delay, name="预下载")
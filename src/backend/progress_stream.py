@@ -0,0 +1,77 @@
+"""
+进度推送
+
+以 Server-Sent Events 的形式推送任务进度，取代前端每秒轮询 /game/progress。
+进度监视器每次更新都会唤醒推送连接，推送频率受帧率限制，且只发送变化的字段。
+"""
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator
+
+from job_manager import Job
+
+# 默认推送帧率（每秒最多推送次数）
+DEFAULT_STREAM_FPS = 10
+# 没有进度变化时发送心跳的间隔(秒)，避免连接被中途关闭
+HEARTBEAT_INTERVAL = 15
+
+
+def _format_event(data: Dict[str, Any], event: str = "") -> str:
+    """
+    格式化为 SSE 消息
+    Args:
+        data: 消息数据
+        event: 事件名，为空时为默认的 message 事件
+    Returns:
+        SSE 消息文本
+    """
+    lines = f"event: {event}\n" if event else ""
+    return f"{lines}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def iter_progress_events(job: Job, fps: float = DEFAULT_STREAM_FPS) -> Iterator[str]:
+    """
+    生成任务进度的 SSE 消息
+
+    首条消息包含完整进度，之后只包含变化的字段；任务结束后发送 end 事件，
+    其中包含任务结果，然后结束。
+
+    Args:
+        job: 要推送进度的任务
+        fps: 每秒最多推送次数
+    Returns:
+        SSE 消息迭代器
+    """
+    min_interval = 1.0 / fps if fps > 0 else 0
+    changed_event = threading.Event()
+    job.progress.add_listener(changed_event.set)
+    try:
+        # 断线后浏览器 3 秒后重连
+        yield "retry: 3000\n\n"
+        last_sent: Dict[str, Any] = {}
+        while True:
+            changed_event.clear()
+            active = job.is_active()
+
+            data = job.progress.get_progress_data()
+            data["status"] = "ok"
+            changes = {key: value for key, value in data.items() if last_sent.get(key, None) != value}
+            if changes:
+                last_sent.update(changes)
+                yield _format_event(changes)
+
+            if not active:
+                yield _format_event(job.to_summary(), "end")
+                return
+
+            # 限制推送频率，期间到达的更新会在下一帧合并发送
+            sent_at = time.monotonic()
+            if not changed_event.wait(HEARTBEAT_INTERVAL):
+                yield ": keep-alive\n\n"
+                continue
+            remaining = min_interval - (time.monotonic() - sent_at)
+            if remaining > 0:
+                time.sleep(remaining)
+    finally:
+        job.progress.remove_listener(changed_event.set)
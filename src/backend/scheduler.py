@@ -0,0 +1,130 @@
+"""
+定期后台任务
+
+在守护线程中定期执行后台任务（预下载、仓库维护等），有前台任务时跳过本次。
+检查间隔带随机抖动，避免大量客户端同时访问服务器；失败后按指数退避重试。
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 失败后的首次重试间隔(秒)，之后每次失败翻倍，最长不超过检查间隔
+DEFAULT_RETRY_DELAY = 60
+# 间隔的随机抖动比例
+INTERVAL_JITTER = 0.2
+# 启动后首次检查的延迟(秒)，避开启动时的前台请求
+INITIAL_DELAY = 30
+
+
+class BackgroundScheduler:
+    """
+    定期后台任务的调度器
+
+    在守护线程中定期执行任务函数。任务函数返回 True 表示已完成工作，
+    False 表示无事可做，None 表示被跳过或失败（稍后重试）。
+    """
+
+    def __init__(self, task: Callable[[], Optional[bool]], is_busy: Callable[[], bool],
+                 interval: float, retry_delay: float = DEFAULT_RETRY_DELAY, name: str = "任务"):
+        """
+        初始化调度器
+        Args:
+            task: 任务函数
+            is_busy: 是否有前台任务在运行，运行时跳过本次执行
+            interval: 检查间隔(秒)
+            retry_delay: 失败后的首次重试间隔(秒)
+            name: 任务名称，用于日志和线程名
+        """
+        self._task = task
+        self._is_busy = is_busy
+        self._interval = interval
+        self._retry_delay = retry_delay
+        self._name = name
+        self._failures = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[float] = None
+        self.last_result: Optional[bool] = None
+        self.next_run: Optional[float] = None
+
+    def start(self):
+        """启动调度线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"scheduler-{self._name}", daemon=True)
+        self._thread.start()
+        logger.info(f"后台{self._name}已启动，检查间隔 {self._interval} 秒")
+
+    def stop(self):
+        """停止调度线程，正在进行的任务会执行完本次"""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def trigger(self):
+        """立即执行一次任务"""
+        self._wakeup.set()
+
+    def _next_delay(self) -> float:
+        """
+        计算到下次执行的延迟
+        Returns:
+            延迟(秒)
+        """
+        if self._failures:
+            delay = min(self._retry_delay * (2 ** (self._failures - 1)), self._interval)
+        else:
+            delay = self._interval
+        return delay * random.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+
+    def _loop(self):
+        """调度循环"""
+        delay = INITIAL_DELAY * random.uniform(1, 1 + INTERVAL_JITTER)
+        while not self._stopped.is_set():
+            self.next_run = time.time() + delay
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            self.run_once()
+            delay = self._next_delay()
+
+    def run_once(self) -> Optional[bool]:
+        """
+        执行一次任务
+        Returns:
+            任务函数的结果，跳过时返回 None
+        """
+        if self._is_busy():
+            logger.info(f"有任务正在进行，跳过本次{self._name}")
+            return None
+
+        self.last_run = time.time()
+        try:
+            result = self._task()
+        except Exception as e:
+            logger.error(f"{self._name}出错: {e}")
+            result = None
+
+        self.last_result = result
+        self._failures = self._failures + 1 if result is None else 0
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取调度状态
+        Returns:
+            包含上次执行时间、结果和下次执行时间的字典
+        """
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "lastRun": self.last_run,
+            "lastResult": self.last_result,
+            "nextRun": self.next_run
+        }
@@ -4,10 +4,11 @@ import webbrowser
 from functools import wraps
 
 import app
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 
 import webview
 from config import get_game_config
+from serving import is_debug
 
 gui_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'gui')  # development path
 
@@ -18,7 +19,7 @@ server = Flask(__name__,
                static_folder=gui_dir,
                template_folder=gui_dir,
                static_url_path='') # Serve static files from the root URL path
-server.debug = True
+server.debug = is_debug()
 server.config['SEND_FILE_MAX_AGE_DEFAULT'] = 1  # disable caching
 
 
@@ -158,8 +159,18 @@ def check_game():
         "currentVersion": "当前游戏版本号",
         "remoteVersion": "远程游戏版本号",
         "needsUpdate": true/false,  # 是否需要更新
-        "gameExists": true/false,   # 游戏是否存在
+        "changedComponents": ["mods"],  # 新版本中变化的组件，无法判断时为 null
+        "gameExists": true/false,   # 游戏是否存在，上次更新中断时为 false
+        "updateInterrupted": true/false,  # 上次更新是否中断，此时更新或克隆会先恢复再继续
+        "updateReady": true/false,  # 新版本是否已在后台下载好
+        "download": {               # 更新需要下载的数据量，无法估算时为 null
+            "objects": "文件数",
+            "bytes": "字节数",
+            "exact": true/false,    # 字节数是精确值还是估算值
+            "seconds": "预计耗时(秒)，没有下载速度记录时为 null"
+        },
         "gamePath": "游戏路径",      # 游戏路径
+        "offline": true/false,      # 版本文件的各镜像是否都无法连接，此时版本信息来自缓存
         "checkedAt": "检查时间"      # ISO格式的检查时间
     }
     """
@@ -172,16 +183,16 @@ def check_game():
 @verify_token
 def clone_game():
     """
-    克隆游戏的API端点
+    克隆游戏的API端点，克隆在后台任务中执行，通过任务接口查询结果
     
     返回:
     {
         "status": "ok/error",
-        "message": "操作结果信息",
-        "version": "克隆的游戏版本"
+        "jobId": "任务ID",
+        "message": "错误信息"
     }
     """
-    result = app.clone_game()
+    result = app.start_clone_job()
     return jsonify(result)
 
 
@@ -190,16 +201,226 @@ def clone_game():
 @verify_token
 def update_game():
     """
-    更新游戏的API端点
+    更新游戏的API端点，更新在后台任务中执行，通过任务接口查询结果
     
     返回:
     {
         "status": "ok/error",
-        "message": "操作结果信息",
-        "version": "更新后的游戏版本"
+        "jobId": "任务ID",
+        "message": "错误信息"
+    }
+    """
+    result = app.start_update_job()
+    return jsonify(result)
+
+
+# 获取可回滚的历史版本
+@server.route('/game/versions', methods=['GET'])
+@verify_token
+def get_installed_versions():
+    """
+    获取可回滚的历史版本的API端点
+    
+    返回:
+    {
+        "status": "ok",
+        "currentVersion": "当前游戏版本号",
+        "versions": [{"commit": "提交", "version": "版本号", "replaced_at": 被替换的时间戳}]
+    }
+    """
+    result = app.get_installed_versions()
+    return jsonify(result)
+
+
+# 获取更新日志
+@server.route('/game/changelog', methods=['GET'])
+@verify_token
+def get_game_changelog():
+    """
+    获取当前版本与已下载的新版本（预下载或检查更新后）之间的更新日志的API端点
+
+    返回:
+    {
+        "status": "ok",
+        "available": 是否已下载新版本，为 false 时没有以下字段,
+        "from": "当前版本的提交",
+        "to": "新版本的提交",
+        "commits": [{"commit": "提交", "summary": "标题", "author": "作者", "time": 提交时间戳}],
+        "total_commits": 提交总数,
+        "files": [{"status": "A/M/D", "path": "文件路径"}],
+        "total_files": 变化的文件总数,
+        "truncated": 提交或文件是否只列出了一部分
+    }
+    """
+    result = app.get_game_changelog()
+    return jsonify(result)
+
+
+# 回滚到历史版本
+@server.route('/game/rollback', methods=['POST'])
+@verify_token
+def rollback_game():
+    """
+    回滚到历史版本的API端点，回滚在后台任务中执行
+    
+    请求体格式:
+    {
+        "commit": "目标历史版本的提交，可选，默认为上一个版本"
+    }
+    
+    返回:
+    {
+        "status": "ok/error",
+        "jobId": "任务ID",
+        "message": "错误信息"
+    }
+    """
+    data = json.loads(request.data) if request.data else {}
+    result = app.start_rollback_job(data.get('commit'))
+    return jsonify(result)
+
+
+# 校验并修复游戏文件
+@server.route('/game/verify', methods=['POST'])
+@verify_token
+def verify_game():
+    """
+    校验游戏文件的API端点，校验在后台任务中执行，只恢复损坏或缺失的文件
+    
+    请求体格式:
+    {
+        "repair": "是否修复不一致的文件，可选，默认为 true"
+    }
+    
+    返回:
+    {
+        "status": "ok/error",
+        "jobId": "任务ID",
+        "message": "错误信息"
+    }
+    """
+    data = json.loads(request.data) if request.data else {}
+    result = app.start_verify_job(bool(data.get('repair', True)))
+    return jsonify(result)
+
+
+# 获取安装方案
+@server.route('/game/profiles', methods=['GET'])
+@verify_token
+def get_install_profiles():
+    """
+    获取安装方案的API端点
+    
+    返回:
+    {
+        "status": "ok",
+        "profile": "当前方案名称",
+        "profiles": {"方案名称": ["稀疏检出规则"]}
+    }
+    """
+    result = app.get_install_profiles()
+    return jsonify(result)
+
+
+# 切换安装方案
+@server.route('/game/profile', methods=['POST'])
+@verify_token
+def switch_install_profile():
+    """
+    切换安装方案的API端点，切换在后台任务中执行，只增删两个方案不同的文件
+    
+    请求体格式:
+    {
+        "profile": "方案名称"
+    }
+    
+    返回:
+    {
+        "status": "ok/error",
+        "jobId": "任务ID",
+        "message": "错误信息"
+    }
+    """
+    data = json.loads(request.data) if request.data else {}
+    result = app.start_profile_job(data.get('profile', 'full'))
+    return jsonify(result)
+
+
+# 获取仓库维护记录
+@server.route('/game/maintenance', methods=['GET'])
+@verify_token
+def get_maintenance_status():
+    """
+    获取仓库维护记录的API端点
+    
+    返回:
+    {
+        "status": "ok",
+        "history": [{"started": "开始时间", "reason": "原因", "full": "是否完整维护",
+                     "steps": [{"name": "步骤", "seconds": "耗时"}], "before": {}, "after": {},
+                     "reclaimed_bytes": "回收的字节数"}],
+        "scheduler": {"running": "是否运行", "lastRun": "上次执行时间", "nextRun": "下次执行时间"}
+    }
+    """
+    result = app.get_maintenance_status()
+    return jsonify(result)
+
+
+# 立即维护仓库
+@server.route('/game/maintenance', methods=['POST'])
+@verify_token
+def maintain_game():
+    """
+    立即维护仓库的API端点，维护在后台任务中执行，会打包对象、写入提交图并清理不可达对象
+    
+    返回:
+    {
+        "status": "ok/error",
+        "jobId": "任务ID",
+        "message": "错误信息"
     }
     """
-    result = app.update_game()
+    result = app.start_maintenance_job()
+    return jsonify(result)
+
+
+# 查询后台任务
+@server.route('/game/jobs/<job_id>', methods=['GET'])
+@verify_token
+def get_job(job_id):
+    """
+    查询后台任务状态的API端点
+    
+    返回:
+    {
+        "status": "ok/error",
+        "job": {
+            "id": "任务ID",
+            "kind": "clone/update",
+            "state": "pending/running/succeeded/failed/cancelled",
+            "result": 任务结束后的结果（与原克隆/更新接口返回格式相同）,
+            "progress": 任务进度（与 /game/progress 返回格式相同）
+        }
+    }
+    """
+    result = app.get_job(job_id)
+    return jsonify(result)
+
+
+# 取消后台任务
+@server.route('/game/jobs/<job_id>/cancel', methods=['POST'])
+@verify_token
+def cancel_job(job_id):
+    """
+    取消后台任务的API端点
+    
+    返回:
+    {
+        "status": "ok/error",
+        "message": "操作结果信息"
+    }
+    """
+    result = app.cancel_job(job_id)
     return jsonify(result)
 
 
@@ -228,6 +449,9 @@ def get_game_progress():
     """
     获取游戏下载或更新进度的API端点
     
+    查询参数:
+        job: 任务ID，可选，默认为最近一个任务
+    
     返回:
     {
         "status": "ok/error",
@@ -243,10 +467,31 @@ def get_game_progress():
         "message": "进度详细信息"
     }
     """
-    result = app.get_game_progress()
+    result = app.get_game_progress(request.args.get('job'))
     return jsonify(result)
 
 
+# 推送游戏下载/更新进度
+@server.route('/game/progress/stream', methods=['GET'])
+@verify_token
+def stream_game_progress():
+    """
+    以 Server-Sent Events 推送任务进度的API端点
+    
+    查询参数:
+        job: 任务ID，可选，默认为最近一个任务
+    
+    事件:
+        message: 进度数据，首条为完整数据，之后只包含变化的字段（字段同 /game/progress）
+        end: 任务结束，数据为 {"id", "kind", "state", "result"}
+    """
+    stream = app.get_progress_stream(request.args.get('job'))
+    if stream is None:
+        return jsonify({"status": "error", "message": "任务不存在"}), 404
+
+    return Response(stream, mimetype='text/event-stream', headers={'X-Accel-Buffering': 'no'})
+
+
 @server.route('/api/announcement', methods=['GET'])
 @verify_token
 def get_announcement():
@@ -0,0 +1,128 @@
+"""
+界面的本地 HTTP 服务
+
+调试模式下把 Flask 应用交给 pywebview 自带的服务器（wsgiref，每个连接一个线程），
+并打开 Flask 调试和开发者工具，便于开发。
+
+正式运行时关闭调试，由本模块在后台线程中启动服务器，窗口直接打开服务器的地址:
+- 安装了 waitress 时使用 waitress：连接由一个事件循环线程异步收发，空闲的 keep-alive 连接不占用线程，
+  请求交给固定大小的工作线程池处理，阻塞的接口（初始化、检查版本等）不会拖慢其他请求；
+- 否则使用 Werkzeug 的多线程服务器（每个连接一个线程），不输出访问日志。
+
+工作线程数由配置 server.workers 设置。进度推送（/game/progress/stream）在推送期间占用一个工作线程，
+线程数应大于同时打开的推送数。
+
+设置环境变量 MINEMC_DEBUG=1 或配置 server.debug 为 true 时进入调试模式。
+"""
+import logging
+import os
+import threading
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from config import get_game_config
+
+try:
+    import waitress
+    from waitress import wasyncore
+except ImportError:
+    waitress = None
+
+logger = logging.getLogger(__name__)
+
+# 打开调试模式的环境变量
+DEBUG_ENV = "MINEMC_DEBUG"
+# 默认工作线程数
+DEFAULT_SERVER_WORKERS = 8
+# 只监听本机
+SERVER_HOST = "127.0.0.1"
+# 空闲连接的超时(秒)
+CHANNEL_TIMEOUT = 120
+
+
+def is_debug() -> bool:
+    """是否处于调试模式"""
+    if os.environ.get(DEBUG_ENV, "").strip().lower() in ("1", "true", "yes"):
+        return True
+    return bool(get_game_config().get("server", {}).get("debug", False))
+
+
+def server_workers() -> int:
+    """配置的工作线程数"""
+    workers = get_game_config().get("server", {}).get("workers", DEFAULT_SERVER_WORKERS)
+    return max(1, int(workers or DEFAULT_SERVER_WORKERS))
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """不输出访问日志的请求处理器"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class AppServer:
+    """在后台线程中运行的 WSGI 服务器"""
+
+    def __init__(self, app, workers: int = DEFAULT_SERVER_WORKERS, host: str = SERVER_HOST, port: int = 0,
+                 engine: str = ""):
+        """
+        初始化服务器，立即监听端口
+        Args:
+            app: WSGI 应用
+            workers: 工作线程数（waitress）
+            host: 监听地址
+            port: 端口，0 表示随机选择空闲端口
+            engine: waitress 或 werkzeug，为空时安装了 waitress 就使用 waitress
+        """
+        self.engine = engine or ("waitress" if waitress is not None else "werkzeug")
+        self.workers = workers
+        if self.engine == "waitress":
+            if waitress is None:
+                raise RuntimeError("未安装 waitress")
+            self._server = waitress.create_server(app, host=host, port=port, threads=workers,
+                                                  channel_timeout=CHANNEL_TIMEOUT, ident=None)
+            self.port = self._server.effective_port
+        else:
+            self._server = make_server(host, port, app, threaded=True, request_handler=_QuietRequestHandler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_port
+        self.url = f"http://{host}:{self.port}/"
+        self._thread = None
+
+    def start(self) -> "AppServer":
+        """在后台线程中开始处理请求"""
+        target = self._server.run if self.engine == "waitress" else self._server.serve_forever
+        self._thread = threading.Thread(target=target, name="app-server", daemon=True)
+        self._thread.start()
+        logger.info(f"界面服务已启动: {self.url}（{self.engine}，{self.workers} 个工作线程）")
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        if self.engine == "waitress":
+            # 关闭监听和所有连接后事件循环退出，run() 随后停止工作线程
+            wasyncore.close_all(self._server._map)
+        else:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def start_app_server(app, workers: int = None) -> AppServer:
+    """
+    启动正式运行的服务器
+    Args:
+        app: WSGI 应用
+        workers: 工作线程数，为None时使用配置 server.workers
+    Returns:
+        已启动的服务器，url 为窗口要打开的地址
+    """
+    return AppServer(app, workers=workers or server_workers()).start()
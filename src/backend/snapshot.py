@@ -0,0 +1,185 @@
+"""
+首次安装的快照
+
+首次安装时，按提交和目录树协商后再分批下载文件对象，需要多次请求，服务器还要为每次请求计算和压缩对象。
+发布端可以额外发布当前版本的快照：一个 tar 文件，先是 snapshot.json（提交、分支和版本），
+然后是只包含该提交全部对象的 Git 包。快照可以放在 CDN 上作为一个大文件顺序下载。
+
+客户端边下载边解压，解出的包直接交给 git index-pack（多线程解析增量和计算哈希），
+不在磁盘上保存快照文件；之后的安装步骤和普通克隆相同，从快照的提交增量下载到远程最新版本。
+
+快照使用 zstd 压缩（.tar.zst，需要安装 zstandard），也支持 .tar.gz 和未压缩的 .tar。
+包中的对象不再用 zlib 压缩，由外层的 zstd 统一压缩，解压更快，压缩率也更高。
+
+生成快照:
+    python snapshot.py <仓库目录> <输出文件.tar.zst> [分支] [版本号]
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+
+from http_client import get_http_client
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 快照中的元数据和包文件名
+SNAPSHOT_META = "snapshot.json"
+SNAPSHOT_PACK = "snapshot.pack"
+# 快照格式版本
+SNAPSHOT_FORMAT = 1
+# zstd 压缩级别，以及长距离匹配的窗口(2 的幂)，解压时使用相同的窗口上限
+ZSTD_LEVEL = 10
+ZSTD_WINDOW_LOG = 27
+# 请求超时(秒)
+REQUEST_TIMEOUT = 30
+# 每次读取的字节数
+READ_SIZE = 256 * 1024
+
+
+def zstd_available() -> bool:
+    """是否可以读写 .tar.zst 快照"""
+    return zstandard is not None
+
+
+def _tar_mode(path: str) -> str:
+    """按扩展名确定压缩方式，返回 zst、gz 或空字符串（不压缩）"""
+    if path.endswith((".tar.zst", ".tzst")):
+        return "zst"
+    if path.endswith((".tar.gz", ".tgz")):
+        return "gz"
+    return ""
+
+
+def create_snapshot(repo_path: str, output: str, branch: str = "main", version: str = "",
+                    level: int = ZSTD_LEVEL) -> Dict:
+    """
+    生成分支当前版本的快照
+
+    Args:
+        repo_path: 发布端仓库（可以是裸仓库）
+        output: 输出文件，扩展名决定压缩方式：.tar.zst、.tar.gz 或 .tar
+        branch: 分支
+        version: 版本号，写入元数据
+        level: zstd 压缩级别
+    Returns:
+        快照的元数据
+    """
+    mode = _tar_mode(output)
+    if mode == "zst" and zstandard is None:
+        raise RuntimeError("生成 .tar.zst 快照需要安装 zstandard")
+    commit = subprocess.run(["git", "rev-parse", "--verify", f"refs/heads/{branch}^{{commit}}"], cwd=repo_path,
+                            check=True, capture_output=True, text=True).stdout.strip()
+    meta = {"format": SNAPSHOT_FORMAT, "commit": commit, "branch": branch, "version": version,
+            "created": time.time()}
+
+    with tempfile.TemporaryFile() as pack:
+        # 只打包该提交及其目录树中的对象；对象不做 zlib 压缩，交给外层的 zstd
+        objects = subprocess.run(["git", "rev-list", "--objects", "--no-object-names", "--no-walk", commit],
+                                 cwd=repo_path, check=True, capture_output=True).stdout
+        subprocess.run(["git", "-c", "pack.compression=0", "pack-objects", "--stdout", "-q"], cwd=repo_path,
+                       input=objects, stdout=pack, check=True)
+        meta["pack_bytes"] = pack.tell()
+        pack.seek(0)
+
+        with open(output + ".tmp", "wb") as raw:
+            if mode == "zst":
+                params = zstandard.ZstdCompressionParameters.from_level(
+                    level, window_log=ZSTD_WINDOW_LOG, enable_ldm=True, threads=-1)
+                stream = zstandard.ZstdCompressor(compression_params=params).stream_writer(raw, closefd=False)
+            else:
+                stream = raw
+            with tarfile.open(fileobj=stream, mode="w|gz" if mode == "gz" else "w|") as archive:
+                content = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+                info = tarfile.TarInfo(SNAPSHOT_META)
+                info.size = len(content)
+                info.mtime = int(meta["created"])
+                archive.addfile(info, io.BytesIO(content))
+                info = tarfile.TarInfo(SNAPSHOT_PACK)
+                info.size = meta["pack_bytes"]
+                info.mtime = int(meta["created"])
+                archive.addfile(info, pack)
+            if stream is not raw:
+                stream.close()
+        os.replace(output + ".tmp", output)
+    return meta
+
+
+class _CountingReader(io.RawIOBase):
+    """读取 HTTP 响应，统计已下载的字节数并回调，用于限速和检查取消"""
+
+    def __init__(self, response: requests.Response, on_read: Callable[[int], None]):
+        self._raw = response.raw
+        self._on_read = on_read
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        if data:
+            self._on_read(len(data))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def open_snapshot(url: str, on_read: Callable[[int], None],
+                  session: Optional[requests.Session] = None) -> Iterator[Tuple[Dict, BinaryIO]]:
+    """
+    边下载边解压快照
+
+    Args:
+        url: 快照地址
+        on_read: 每读取一段压缩数据后调用，参数为字节数，可以在其中限速或抛出异常中止下载
+        session: 使用的 HTTP 会话，默认使用共享的 HTTP 客户端
+    Yields:
+        (元数据, 包数据流)，包数据流只能顺序读取一次
+    Raises:
+        RuntimeError: 快照格式不正确，或缺少解压所需的模块
+    """
+    mode = _tar_mode(url.split("?")[0])
+    if mode == "zst" and zstandard is None:
+        raise RuntimeError("读取 .tar.zst 快照需要安装 zstandard")
+    response = (session or get_http_client().session).get(url, stream=True, timeout=REQUEST_TIMEOUT)
+    try:
+        response.raise_for_status()
+        # 由 urllib3 解开 Content-Encoding（如 CDN 额外压缩），不影响 tar 外层的压缩
+        response.raw.decode_content = True
+        stream: BinaryIO = io.BufferedReader(_CountingReader(response, on_read), READ_SIZE)
+        if mode == "zst":
+            stream = zstandard.ZstdDecompressor(max_window_size=1 << ZSTD_WINDOW_LOG).stream_reader(stream)
+        with tarfile.open(fileobj=stream, mode="r|gz" if mode == "gz" else "r|") as archive:
+            member = archive.next()
+            if member is None or member.name != SNAPSHOT_META:
+                raise RuntimeError("快照格式不正确：缺少元数据")
+            meta = json.load(archive.extractfile(member))
+            if meta.get("format") != SNAPSHOT_FORMAT:
+                raise RuntimeError(f"不支持的快照格式: {meta.get('format')}")
+            member = archive.next()
+            if member is None or member.name != SNAPSHOT_PACK:
+                raise RuntimeError("快照格式不正确：缺少对象包")
+            yield meta, archive.extractfile(member)
+    finally:
+        response.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法: python snapshot.py <仓库目录> <输出文件.tar.zst> [分支] [版本号]")
+        sys.exit(1)
+    result = create_snapshot(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "main",
+                             sys.argv[4] if len(sys.argv) > 4 else "")
+    print(f"已生成快照 {sys.argv[2]}: 提交 {result['commit'][:8]}，包 {result['pack_bytes']} 字节，"
+          f"快照 {os.path.getsize(sys.argv[2])} 字节")
@@ -0,0 +1,209 @@
+"""
+远程版本清单
+
+version.txt 只有一个版本号，客户端只能判断"不同"，无法知道新版本是否更新、变化了哪些内容。
+版本清单（version.json）在版本号之外记录目标提交和各组件的标识:
+
+    {
+        "format": 1,
+        "version": "1.4.0",
+        "commit": "<提交>",
+        "components": {
+            "mods": {"paths": [".minecraft/mods"], "id": "<标识>"},
+            ...
+        }
+    }
+
+组件标识由组件各路径在该提交中的 Git 对象 ID 计算，组件内任一文件变化时标识随之变化；
+不属于任何组件的文件归入 other 组件，因此没有组件变化就说明游戏文件没有变化。
+客户端保存已安装版本的组件标识，与远程清单比较得到变化的组件，没有组件变化时不需要下载。
+版本号按语义化版本比较，远程版本不比本地新时不提示更新。仍兼容只有版本号的 version.txt。
+
+生成版本清单（每次发布后运行）:
+    python version_manifest.py <仓库目录> <输出文件> <版本号> [分支]
+"""
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 清单格式版本
+VERSION_MANIFEST_FORMAT = 1
+# 默认的组件及其在游戏目录中的路径
+DEFAULT_COMPONENTS = {
+    "mods": [".minecraft/mods"],
+    "config": [".minecraft/config"],
+    "resourcepacks": [".minecraft/resourcepacks"],
+    "launcher": ["Plain Craft Launcher 2.exe"],
+}
+# 不属于其他组件的文件
+OTHER_COMPONENT = "other"
+# 路径在提交中不存在时的对象 ID
+MISSING_OBJECT = "-"
+
+# 语义化版本，允许 v 前缀和省略次版本号、修订号
+_SEMVER_PATTERN = re.compile(r"[vV]?(\d+)(?:\.(\d+))?(?:\.(\d+))?"
+                             r"(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?(?:\+[0-9A-Za-z.-]+)?")
+
+
+def parse_semver(version: str) -> Optional[Tuple[Tuple[int, int, int], Tuple]]:
+    """
+    解析语义化版本号
+    Args:
+        version: 版本号，如 1.4.0、v1.4.0-beta.2、1.4.0+build.5
+    Returns:
+        ((主版本号, 次版本号, 修订号), 先行版本标识)，不是语义化版本时返回 None；构建元数据不参与比较
+    """
+    match = _SEMVER_PATTERN.fullmatch(version.strip())
+    if match is None:
+        return None
+    core = tuple(int(part or 0) for part in match.group(1, 2, 3))
+    prerelease = tuple(int(part) if part.isdigit() else part for part in match.group(4).split(".")) \
+        if match.group(4) else ()
+    return core, prerelease
+
+
+def _prerelease_key(prerelease: Tuple) -> Tuple:
+    """先行版本的排序键：正式版最大；数字标识按数值比较且小于字母标识；前缀相同时标识少的较小"""
+    if not prerelease:
+        return (1,)
+    return (0, tuple((0, part, "") if isinstance(part, int) else (1, 0, part) for part in prerelease))
+
+
+def compare_versions(a: str, b: str) -> Optional[int]:
+    """
+    按语义化版本比较两个版本号
+    Returns:
+        a 较新返回 1，相同返回 0，较旧返回 -1；任一不是语义化版本时返回 None
+    """
+    parsed_a, parsed_b = parse_semver(a), parse_semver(b)
+    if parsed_a is None or parsed_b is None:
+        return None
+    key_a = (parsed_a[0], _prerelease_key(parsed_a[1]))
+    key_b = (parsed_b[0], _prerelease_key(parsed_b[1]))
+    return (key_a > key_b) - (key_a < key_b)
+
+
+def is_newer_version(remote: str, current: str) -> bool:
+    """远程版本是否比当前版本新，不是语义化版本时只要不同就视为新版本"""
+    order = compare_versions(remote, current)
+    return remote.strip() != current.strip() if order is None else order > 0
+
+
+def parse_version_manifest(text: str) -> Dict:
+    """
+    解析远程版本信息，支持版本清单（JSON）和只有版本号的文本
+    Returns:
+        包含 version、commit 和 components 的字典；只有版本号时 commit 为空，components 为 None
+    Raises:
+        ValueError: 清单格式不正确
+    """
+    text = text.strip()
+    if not text.startswith("{"):
+        return {"version": text, "commit": "", "components": None}
+    manifest = json.loads(text)
+    if manifest.get("format") != VERSION_MANIFEST_FORMAT:
+        raise ValueError(f"不支持的版本清单格式: {manifest.get('format')}")
+    if not manifest.get("version"):
+        raise ValueError("版本清单缺少版本号")
+    components = manifest.get("components")
+    return {
+        "version": str(manifest["version"]).strip(),
+        "commit": manifest.get("commit", ""),
+        "components": {name: dict(info) for name, info in components.items()} if components else None
+    }
+
+
+def changed_components(remote: Dict, installed: Optional[Dict[str, str]]) -> Optional[List[str]]:
+    """
+    比较远程版本清单与已安装版本的组件标识
+    Args:
+        remote: parse_version_manifest 的结果
+        installed: 已安装版本的 {组件: 标识}
+    Returns:
+        变化的组件（按清单中的顺序），无法判断（任一方没有组件信息）时返回 None
+    """
+    if not remote.get("components") or not installed:
+        return None
+    return [name for name, info in remote["components"].items() if installed.get(name) != info.get("id")]
+
+
+def component_ids(remote: Dict) -> Optional[Dict[str, str]]:
+    """远程版本清单中的 {组件: 标识}，安装成功后保存"""
+    components = remote.get("components")
+    return {name: info.get("id", "") for name, info in components.items()} if components else None
+
+
+def _object_ids(repo_path: str, commit: str, paths: List[str]) -> List[str]:
+    """路径在提交中对应的 Git 对象 ID，不存在的路径为 MISSING_OBJECT"""
+    paths = [path.strip("/") for path in paths]
+    output = subprocess.run(["git", "ls-tree", "-z", commit, "--", *paths], cwd=repo_path,
+                            check=True, capture_output=True, text=True).stdout
+    found = {}
+    for record in filter(None, output.split("\0")):
+        info, path = record.split("\t", 1)
+        found[path] = info.split()[2]
+    return [found.get(path, MISSING_OBJECT) for path in paths]
+
+
+def _other_id(repo_path: str, commit: str, covered: List[str]) -> str:
+    """不属于任何组件的文件的标识"""
+    output = subprocess.run(["git", "ls-tree", "-r", "-z", commit], cwd=repo_path,
+                            check=True, capture_output=True, text=True).stdout
+    prefixes = tuple(path.strip("/") + "/" for path in covered)
+    digest = hashlib.sha256()
+    for record in filter(None, output.split("\0")):
+        path = record.split("\t", 1)[1]
+        if path.strip("/") not in covered and not path.startswith(prefixes):
+            digest.update(record.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def create_version_manifest(repo_path: str, output: str, version: str, branch: str = "main",
+                            components: Optional[Dict[str, List[str]]] = None) -> Dict:
+    """
+    为分支的当前版本生成版本清单
+    Args:
+        repo_path: 发布端仓库（可以是裸仓库）
+        output: 输出文件
+        version: 版本号
+        branch: 分支
+        components: {组件: 路径列表}，默认为 DEFAULT_COMPONENTS；其余文件归入 other 组件
+    Returns:
+        版本清单
+    Raises:
+        ValueError: 版本号不是语义化版本
+    """
+    if parse_semver(version) is None:
+        raise ValueError(f"版本号不是语义化版本: {version}")
+    commit = subprocess.run(["git", "rev-parse", "--verify", f"refs/heads/{branch}^{{commit}}"], cwd=repo_path,
+                            check=True, capture_output=True, text=True).stdout.strip()
+    manifest = {"format": VERSION_MANIFEST_FORMAT, "version": version, "commit": commit, "branch": branch,
+                "created": time.time(), "components": {}}
+    components = components or DEFAULT_COMPONENTS
+    for name, paths in components.items():
+        ids = _object_ids(repo_path, commit, paths)
+        manifest["components"][name] = {
+            "paths": paths,
+            "id": hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()
+        }
+    covered = [path.strip("/") for paths in components.values() for path in paths]
+    manifest["components"][OTHER_COMPONENT] = {"paths": [], "id": _other_id(repo_path, commit, covered)}
+
+    with open(output + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(output + ".tmp", output)
+    return manifest
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("用法: python version_manifest.py <仓库目录> <输出文件> <版本号> [分支]")
+        sys.exit(1)
+    result = create_version_manifest(sys.argv[1], sys.argv[2], sys.argv[3],
+                                     sys.argv[4] if len(sys.argv) > 4 else "main")
+    print(f"版本 {result['version']}，提交 {result['commit'][:8]}，组件: {', '.join(result['components'])}")